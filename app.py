@@ -1,7 +1,6 @@
+import itertools
 import os
-import re
 import subprocess
-import sys
 from enum import Enum
 
 import objc
@@ -19,12 +18,26 @@ from Cocoa import (
     NSFontAttributeName, NSMutableParagraphStyle, NSParagraphStyleAttributeName, NSTextAlignmentCenter,
     NSForegroundColorAttributeName, NSColor, NSOnState, NSOffState,
     NSSegmentedControl, NSSegmentSwitchTrackingSelectOne, NSRegularControlSize, NSImageScaleProportionallyDown,
-    NSSwitchButton, NSPopUpButton, NSComboBox, NSMenu, NSMenuItem
+    NSSwitchButton, NSPopUpButton, NSComboBox, NSMenu, NSMenuItem, NSScrollView, NSTextView, NSOpenPanel,
+    NSSearchField, NSTableView, NSTableColumn, NSIndexSet
 )
 from Foundation import NSBundle, NSData, NSDictionary
-
+from PyObjCTools import AppHelper
+
+from core.config import ConfigHelper, resource_path
+from core.controller import Event, SusOpsController
+from core.executor import CommandExecutor
+from core.launch import LaunchCache, trace
+from core.model import ConfigModel
+from core.search import DEFAULT_LIMIT, SearchIndex
+from core.state import ProcessState
 from version import VERSION
 
+# core.tester, core.pac_server, core.pac_compiler and core.ssh_config pull in asyncio and friends,
+# they are imported where first used to keep them off the launch path
+
+trace.mark("imported")
+
 
 class FieldType(Enum):
     TEXT = "text"
@@ -36,14 +49,6 @@ class Appearance(Enum):
     DARK = "DARK"
 
 
-class ProcessState(Enum):
-    INITIAL = "INITIAL"
-    RUNNING = "RUNNING"
-    STOPPED_PARTIALLY = "STOPPED_PARTIALLY"
-    STOPPED = "STOPPED"
-    ERROR = "ERROR"
-
-
 class LogoStyle(Enum):
     GEAR = "GEAR"
     COLORED_GLASSES = "COLORED_GLASSES"
@@ -77,16 +82,6 @@ def bring_app_to_front(self: NSPanel):
     self.makeKeyAndOrderFront_(None)
 
 
-def resource_path(rel_path):
-    # on macOS bundle, resources are in Contents/Resources
-    if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
-        base = sys._MEIPASS
-    else:
-        # running normally: project root
-        base = os.path.dirname(os.path.abspath(__file__))
-    return os.path.join(base, rel_path)
-
-
 class FormValidator:
     @staticmethod
     # def validate_ip(ip: str) -> bool:
@@ -117,90 +112,19 @@ class FormValidator:
         return True
 
 
-class ConfigHelper:
-    yq_path = resource_path(os.path.join('bin', 'yq'))
-    workspace_path = os.path.expanduser("~/.susops")
-    config_path = os.path.join(workspace_path, "config.yaml")
-
-    @staticmethod
-    def get_connection_tags():
-        result = ConfigHelper.read_config(".connections[].tag", [])
-        return result.splitlines()
-
-    @staticmethod
-    def get_domains():
-        result = ConfigHelper.read_config(".connections[].pac_hosts[]", [])
-        split_result = result.splitlines()
-        return split_result
-
-    @staticmethod
-    def get_local_forwards():
-        result = ConfigHelper.read_config(".connections[].forwards.local[] | \"\\(.tag) (\\((.src_port // .src)) → \\((.dst_port // .dst)))\"", [])
-        # filter result items, remove all items equal to "( → )" (this is the case when no remote forwards are set)
-        result = [item for item in result.splitlines() if not item == "( → )"]
-        return result
-
-    @staticmethod
-    def get_remote_forwards():
-        result = ConfigHelper.read_config(".connections[].forwards.remote[] | \"\\(.tag) (\\((.src_port // .src)) → \\((.dst_port // .dst)))\"", [])
-        # filter result items, remove all items equal to "( → )" (this is the case when no remote forwards are set)
-        result = [item for item in result.splitlines() if not item == "( → )"]
-        return result
-
-    @staticmethod
-    def read_config(query: str, default):
-        try:
-            result = subprocess.check_output([ConfigHelper.yq_path, "e", query, ConfigHelper.config_path], encoding="utf-8").strip()
-            if result == "null":
-                result = default
-        except subprocess.CalledProcessError:
-            result = default
-        return result
-
-    @staticmethod
-    def update_config(query: str):
-        subprocess.run([ConfigHelper.yq_path, "e", "-i", query, ConfigHelper.config_path, ], check=True)
-
-
 def add_bin_to_path():
     os.environ['PATH'] = resource_path('bin') + os.pathsep + os.environ.get('PATH', '')
 
 
-from pathlib import Path
-from typing import List
-
-def get_ssh_hosts(config_path: Path = None) -> List[str]:
-    if config_path is None:
-        config_path = Path(os.path.expanduser("~/.ssh/config"))
-
-    host_pattern = re.compile(r'^\s*Host\s+(.*)$', re.IGNORECASE)
-    hosts = []
+def run_susops_async(command, callback=None, show_alert=True, timeout=None, label=None):
+    """Run a susops command on the executor, alert if it failed and call callback(output, returncode) on the main thread."""
+    def done(result):
+        if result.returncode != 0 and show_alert and not result.cancelled:
+            alert_foreground("Error", result.output)
+        if callback:
+            callback(result.output, result.returncode)
 
-    try:
-        with config_path.open('r') as f:
-            for raw in f:
-                line = raw.strip()
-                # skip blanks and comments
-                if not line or line.startswith('#'):
-                    continue
-                m = host_pattern.match(line)
-                if m:
-                    # a Host line can list multiple names/patterns
-                    for h in m.group(1).split():
-                        hosts.append(h)
-    except FileNotFoundError:
-        raise FileNotFoundError(f"SSH config not found: {config_path!s}")
-
-    return hosts
-
-
-def run_susops(command, show_alert=True):
-    susops_path = resource_path(os.path.join('bin', 'susops'))
-    result = subprocess.run(f"{susops_path} {command}", shell=True, capture_output=True, encoding="utf-8",
-                            errors="ignore")
-    if result.returncode != 0 and show_alert:
-        alert_foreground("Error", result.stdout.strip())
-    return result.stdout.strip(), result.returncode
+    return susops_app.executor.submit(command, done, timeout=timeout, label=label)
 
 
 # Global instance of the app
@@ -234,10 +158,35 @@ def add_edit_menu_item():
 
     main_menu.addItem_(edit_item)
 
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    if days:
+        return f"{days}d {hours}h"
+    if hours:
+        return f"{hours}h {minutes}m"
+    return f"{minutes}m {seconds}s" if minutes else f"{seconds}s"
+
+
+def connection_details(conn) -> list:
+    """Lines of a tunnel's Status submenu, see core.state.ConnectionState."""
+    uptime = conn.uptime()
+    return [
+        f"SOCKS port: {conn.socks_port or '-'}",
+        f"PID: {conn.pid or '-'}",
+        f"Uptime: {format_duration(uptime) if uptime is not None else '-'}",
+        f"Latency: {f'{conn.latency * 1000:.1f} ms' if conn.latency is not None else '-'}",
+        f"Failures: {conn.failures}",
+    ]
+
+
 def get_bind_addresses():
     return ["localhost", "172.17.0.1", "0.0.0.0"]
 
 class SusOpsApp(rumps.App):
+    """Menu-bar view on top of SusOpsController, which owns state, config, commands and polling."""
+
     def __init__(self, icon_dir=None):
         global susops_app
         susops_app = self
@@ -245,7 +194,6 @@ class SusOpsApp(rumps.App):
 
         self.base_dir = os.path.dirname(os.path.abspath(__file__))
         self.images_dir = icon_dir or os.path.join(self.base_dir, 'images')
-        self.process_state = ProcessState.INITIAL
 
         super(SusOpsApp, self).__init__(name="SO", icon=None, quit_button=None)
 
@@ -263,29 +211,41 @@ class SusOpsApp(rumps.App):
             None
         )
 
-        # Set initial icon based on current appearance
-        self.config = self.load_config()
-        self.update_icon()
+        # draw the last known icon right away, config and state are loaded in the background
+        self.launch_cache = LaunchCache()
+        launch = self.launch_cache.load()
+        self.controller = SusOpsController(AppHelper.callAfter, AppHelper.callLater, config=launch.config)
+        if self.config['logo_style'] not in LogoStyle.__members__:
+            self.config['logo_style'] = DEFAULT_LOGO_STYLE.value
+        self.update_icon(state=launch.process_state)
+        self.controller.subscribe(self.controller_event)
 
         self._settings_panel = None
         self._connection_panel = None
         self._remove_connection_panel = None
         self._add_host_panel = None
+        self._import_hosts_panel = None
         self._remove_host_panel = None
         self._add_local_forward_panel = None
         self._remove_local_forward_panel = None
         self._add_remote_forward_panel = None
         self._remove_remote_forward_panel = None
         self._about_panel = None
+        # tag -> (submenu item, detail items) in the Status menu
+        self._connection_items = {}
+        self._pac_item = None
 
         self.menu = [
-            rumps.MenuItem("Status", callback=self.check_status),
+            (rumps.MenuItem("Status"), [
+                rumps.MenuItem("Details…", callback=self.check_status),
+            ]),
             None,
             rumps.MenuItem("Settings…", callback=self.open_settings, key=","),
             None,
             (rumps.MenuItem("Add"), [
                 rumps.MenuItem("Add Connection", callback=self.add_connection),
                 rumps.MenuItem("Add Domain / IP / CIDR", callback=self.add_host),
+                rumps.MenuItem("Import Domains / IPs / CIDRs…", callback=self.import_hosts),
                 rumps.MenuItem("Add Local Forward", callback=self.add_local_forward),
                 rumps.MenuItem("Add Remote Forward", callback=self.add_remote_forward),
             ]),
@@ -322,52 +282,77 @@ class SusOpsApp(rumps.App):
             rumps.MenuItem("Quit", callback=self.quit_app, key="q")
         ]
 
-        self._check_timer = rumps.Timer(self.check_state_and_update_menu, 5)
+        # runs as soon as the event loop has drawn the menu bar item
+        AppHelper.callAfter(self.async_startup_check)
+
+    @property
+    def config(self) -> dict:
+        return self.controller.config
+
+    @property
+    def process_state(self) -> ProcessState:
+        return self.controller.process_state
+
+    @property
+    def executor(self) -> CommandExecutor:
+        return self.controller.executor
 
-        self._startup_check_timer = rumps.Timer(self.async_startup_check, 0.1)
-        self._startup_check_timer.start()
+    @property
+    def pac_server(self):
+        return self.controller.pac_server
 
-    def async_startup_check(self, _):
+    def async_startup_check(self):
         add_edit_menu_item()
-        status, output, returncode = self.check_state_and_update_menu()
+        trace.mark("menu")
+        self.controller.start()
+
+    def controller_event(self, event, payload):
+        match event:
+            case Event.CONFIG:
+                self.config_loaded(payload)
+            case Event.CONFIG_CHANGED:
+                # edited outside the settings panel, e.g. through "Open Config File" or the CLI
+                self.update_icon()
+            case Event.STATE:
+                self.update_menu()
+            case Event.CONNECTIONS:
+                self.update_connections(payload)
+            case Event.ACTION if payload:
+                self.show_pending_action(payload)
+            case Event.ERROR:
+                alert_foreground("Error", payload)
+            case Event.STARTED:
+                self.started(payload)
+
+    @staticmethod
+    def config_loaded(config):
+        # check if logo_style is valid
+        if config['logo_style'] not in LogoStyle.__members__:
+            config['logo_style'] = DEFAULT_LOGO_STYLE.value
+            with ConfigHelper.transaction() as tx:
+                tx.set(".susops_app.logo_style", config['logo_style'])
+
+    def started(self, result):
+        trace.mark("state")
+        if trace.enabled:
+            # launch benchmark run, see benchmarks/bench_launch.py
+            self.controller.shutdown(stop_proxy=False)
+            rumps.quit_application()
+            return
+
         # check if output has "no default connection found"
-        if status == ProcessState.ERROR and "no default connection found" in output:
+        if result.state == ProcessState.ERROR and "no default connection found" in result.output:
             # show welcome dialog for connection setup
             alert_foreground("🎉 Welcome to SusOps 🎉",
                              "To get started, please follow these steps:\n\n"
                              "1. Add a connection\n"
                              "2. Start the proxy\n\n"
                              "If you need help, please check the documentation in 'About' → 'Github'.", )
-        self._startup_check_timer.stop()
-        self._check_timer.start()
-
-    def check_state_and_update_menu(self, _=None):
-        # runs every 5s
-        try:
-            output, returncode = run_susops("ps", False)
-        except subprocess.CalledProcessError:
-            output, returncode = "Error running command", -1
-
-        if not output:
-            returncode = -1
-
-        match returncode:
-            case 0:
-                new_state = ProcessState.RUNNING
-            case 2:
-                new_state = ProcessState.STOPPED_PARTIALLY
-            case 3:
-                new_state = ProcessState.STOPPED
-            case _:
-                new_state = ProcessState.ERROR
-
-        if new_state == self.process_state:
-            return
 
-        self.process_state = new_state
+    def update_menu(self):
         self.update_icon()
 
-        self.menu["Status"].title = f"Status: {self.process_state.value.lower().replace("_", " ")}"
+        self.menu["Status"].title = f"Status: {self.process_state.value.lower().replace('_', ' ')}"
         self.menu["Status"].icon = os.path.join(self.images_dir, "status", self.process_state.value.lower() + ".svg")
 
         match self.process_state:
@@ -396,7 +381,37 @@ class SusOpsApp(rumps.App):
                 self.menu["Test"]["Test Any"].set_callback(None)
                 self.menu["Test"]["Test All"].set_callback(None)
 
-        return self.process_state, output, returncode
+    def update_connections(self, connections):
+        """One Status submenu per tunnel with its SOCKS port, PID, uptime, latency and failure count."""
+        status = self.menu["Status"]
+        if [c.tag for c in connections] != list(self._connection_items):
+            status.clear()
+            status.add(rumps.MenuItem("Details…", callback=self.check_status))
+            status.add(rumps.separator)
+            self._connection_items = {}
+            for conn in connections:
+                item = rumps.MenuItem(conn.tag)
+                details = [rumps.MenuItem(line) for line in connection_details(conn)]
+                for detail in details:
+                    item.add(detail)
+                status.add(item)
+                self._connection_items[conn.tag] = (item, details)
+            self._pac_item = rumps.MenuItem("PAC server")
+            status.add(self._pac_item)
+
+        for conn in connections:
+            item, details = self._connection_items[conn.tag]
+            item.title = f"{conn.tag}: {conn.state.value.lower().replace('_', ' ')}"
+            item.icon = os.path.join(self.images_dir, "status", conn.state.value.lower() + ".svg")
+            for detail, line in zip(details, connection_details(conn)):
+                detail.title = line
+        self._pac_item.title = f"PAC server: {'running' if connections.pac_running else 'stopped'}"
+
+    def show_pending_action(self, label):
+        self.menu["Status"].title = f"Status: {label}…"
+        self.menu["Start Proxy"].set_callback(None)
+        self.menu["Stop Proxy"].set_callback(None)
+        self.menu["Restart Proxy"].set_callback(None)
 
     def appearanceChanged_(self, _):
         # Called when user switches between light/dark mode
@@ -404,25 +419,11 @@ class SusOpsApp(rumps.App):
         if self._settings_panel:
             self._settings_panel.update_appearance()
 
-    def update_icon(self, logo_style: LogoStyle = None):
+    def update_icon(self, logo_style: LogoStyle = None, state: ProcessState = None):
         logo_style = logo_style or LogoStyle[self.config['logo_style'].upper()]
-        state = ProcessState.STOPPED if self.process_state == ProcessState.INITIAL else self.process_state
+        state = state or (ProcessState.STOPPED if self.process_state == ProcessState.INITIAL else self.process_state)
         self.icon = get_logo_style_image(logo_style, state)
-
-    @staticmethod
-    def load_config():
-        configs = {
-            "pac_server_port": ConfigHelper.read_config(".pac_server_port", "1081"),
-            "logo_style": ConfigHelper.read_config(".susops_app.logo_style", DEFAULT_LOGO_STYLE.value),
-            "stop_on_quit": ConfigHelper.read_config(".susops_app.stop_on_quit", '1') == '1',
-            "ephemeral_ports": ConfigHelper.read_config(".susops_app.ephemeral_ports", '1') == '1'
-        }
-
-        # check if logo_style is valid
-        if configs['logo_style'] not in LogoStyle.__members__:
-            configs['logo_style'] = DEFAULT_LOGO_STYLE.value
-            ConfigHelper.update_config(f".susops_app.logo_style = \"{configs['logo_style']}\"")
-        return configs
+        self.launch_cache.save(self.process_state, self.config)
 
     def open_settings(self, _):
         if self._settings_panel is None:
@@ -431,7 +432,7 @@ class SusOpsApp(rumps.App):
             self._settings_panel = SettingsPanel.alloc().initWithContentRect_styleMask_backing_defer_(
                 frame, style, NSBackingStoreBuffered, False
             )
-        self.config = self.load_config()
+        self.controller.refresh_config()
         self._settings_panel.pac_port_field.setStringValue_(self.config['pac_server_port'])
 
         app_path = os.path.basename(NSBundle.mainBundle().bundlePath())
@@ -467,6 +468,21 @@ class SusOpsApp(rumps.App):
         if restart == 1:
             self.restart_proxy(None)
 
+    def forward_added(self, connection, flag, spec, output):
+        """Apply a new forward through the connection's ssh master if possible, otherwise offer a restart."""
+        if not self.controller.forwards_live:
+            self.show_restart_dialog("Success", output)
+            return
+
+        def applied(result):
+            if isinstance(result, Exception) or result[1] != 0:
+                error = result if isinstance(result, Exception) else result[0]
+                self.show_restart_dialog("Success", f"{output}\n\nCould not apply it live: {error}")
+            else:
+                alert_foreground("Success", f"{output}\n\nThe forward is active now.")
+
+        self.controller.apply_forward(connection, flag, spec, applied)
+
     def add_connection(self, sender, default_text=''):
         frame_width = 440
         frame_height = 195
@@ -502,6 +518,17 @@ class SusOpsApp(rumps.App):
                                                 "* IP address (CIDR notation supported)", frame_width, frame_height)
         self._add_host_panel.run()
 
+    def import_hosts(self, _):
+        if not self._import_hosts_panel:
+            frame = NSMakeRect(0, 0, 420, 400)
+            style = (NSWindowStyleMaskTitled | NSWindowStyleMaskClosable)
+            self._import_hosts_panel = ImportHostsPanel.alloc().initWithContentRect_styleMask_backing_defer_(
+                frame, style, NSBackingStoreBuffered, False
+            )
+            self._import_hosts_panel.setTitle_("Import Domains / IPs / CIDRs")
+            self._import_hosts_panel.configure(420, 400)
+        self._import_hosts_panel.run()
+
     def add_local_forward(self, _):
         if not self._add_local_forward_panel:
             frame = NSMakeRect(0, 0, 340, 310)
@@ -538,97 +565,121 @@ class SusOpsApp(rumps.App):
 
     def remove_connection(self, _):
         if not self._remove_connection_panel:
-            frame = NSMakeRect(0, 0, 300, 105)
+            frame = NSMakeRect(0, 0, 380, 320)
             style = (NSWindowStyleMaskTitled | NSWindowStyleMaskClosable)
             self._remove_connection_panel = RemoveConnectionPanel.alloc().initWithContentRect_styleMask_backing_defer_(
                 frame, style, NSBackingStoreBuffered, False
             )
             self._remove_connection_panel.setTitle_("Remove Connection")
             self._remove_connection_panel.configure_field("Connection Tag:", label_width = 100, input_start_x = 120)
-        self._remove_connection_panel.update_items(ConfigHelper.get_connection_tags())
+        self._remove_connection_panel.update_items(ConfigModel.current().connections)
         self._remove_connection_panel.run()
 
     def remove_host(self, _):
         if not self._remove_host_panel:
-            frame = NSMakeRect(0, 0, 255, 105)
+            frame = NSMakeRect(0, 0, 380, 360)
             style = (NSWindowStyleMaskTitled | NSWindowStyleMaskClosable)
             self._remove_host_panel = RemoveDomainPanel.alloc().initWithContentRect_styleMask_backing_defer_(
                 frame, style, NSBackingStoreBuffered, False
             )
             self._remove_host_panel.setTitle_("Remove Domain / IP / CIDR")
             self._remove_host_panel.configure_field("Host:", label_width = 55, input_start_x = 75)
-        self._remove_host_panel.update_items(ConfigHelper.get_domains())
+        self._remove_host_panel.update_items(ConfigModel.current().hosts)
         self._remove_host_panel.run()
 
     def remove_local_forward(self, sender, default_text=''):
         if not self._remove_local_forward_panel:
-            frame = NSMakeRect(0, 0, 290, 105)
+            frame = NSMakeRect(0, 0, 380, 320)
             style = (NSWindowStyleMaskTitled | NSWindowStyleMaskClosable)
             self._remove_local_forward_panel = RemoveLocalForwardPanel.alloc().initWithContentRect_styleMask_backing_defer_(
                 frame, style, NSBackingStoreBuffered, False
             )
             self._remove_local_forward_panel.setTitle_("Remove Local Forward")
             self._remove_local_forward_panel.configure_field("Local Forward:", label_width=90, input_start_x=110)
-        self._remove_local_forward_panel.update_items(ConfigHelper.get_local_forwards())
+        self._remove_local_forward_panel.update_items(ConfigModel.current().local_forwards)
         self._remove_local_forward_panel.run()
 
     def remove_remote_forward(self, sender, default_text=''):
         if not self._remove_remote_forward_panel:
-            frame = NSMakeRect(0, 0, 310, 105)
+            frame = NSMakeRect(0, 0, 380, 320)
             style = (NSWindowStyleMaskTitled | NSWindowStyleMaskClosable)
             self._remove_remote_forward_panel = RemoveRemoteForwardPanel.alloc().initWithContentRect_styleMask_backing_defer_(
                 frame, style, NSBackingStoreBuffered, False
             )
             self._remove_remote_forward_panel.setTitle_("Remove Remote Forward")
             self._remove_remote_forward_panel.configure_field("Remote Forward:", label_width=110, input_start_x=130)
-        self._remove_remote_forward_panel.update_items(ConfigHelper.get_remote_forwards())
+        self._remove_remote_forward_panel.update_items(ConfigModel.current().remote_forwards)
         self._remove_remote_forward_panel.run()
 
     def list_config(self, _):
-        output, _ = run_susops("ls")
-        alert_foreground("Domains & Forwards", output)
+        def done(output, returncode):
+            if returncode == 0:
+                alert_foreground("Domains & Forwards", output)
+
+        run_susops_async("ls", done)
 
     def open_config_file(self, _):
-        run_susops("config")
+        run_susops_async("config")
 
     def start_proxy(self, _):
-        output, _ = run_susops("start")
-        self.check_state_and_update_menu()
+        self.controller.start_proxy()
 
     def stop_proxy(self, _):
-        ports_flag = "--keep-ports" if not self.config['ephemeral_ports'] else ""
-
-        output, _ = run_susops(f"stop {ports_flag}")
-        self.check_state_and_update_menu()
+        self.controller.stop_proxy()
 
     def restart_proxy(self, _):
-        self.config = self.load_config()
-        output, _ = run_susops("restart")
-        self.check_state_and_update_menu()
+        self.controller.restart_proxy()
 
     def check_status(self, _):
-        output, _ = run_susops("ps", False)
-        alert_foreground("SusOps Status", output)
+        if self.controller.pending_handle:
+            cancel = alert_foreground(
+                "SusOps Status",
+                f"Proxy is {self.controller.pending_action}…",
+                ok="Keep Waiting", cancel="Cancel Command"
+            )
+            if cancel == 0:
+                self.controller.cancel_action()
+            return
+
+        run_susops_async("ps", lambda output, _: alert_foreground("SusOps Status", output), show_alert=False)
 
     def test_any(self, _):
         host = rumps.Window("Enter domain or port to test: ", "Test Any",
                             ok="Test", cancel="Cancel", dimensions=(220, 20)).run().text
         if host:
-            output, _ = run_susops(f"test {host}", False)
-            alert_foreground("SusOps Test", output)
+            run_susops_async(f"test {host}", lambda output, _: alert_foreground("SusOps Test", output),
+                             show_alert=False, timeout=30)
 
     def test_all(self, _):
-        output, _ = run_susops("test --all", False)
-        alert_foreground("SusOps Test All", output)
+        if not ConfigHelper.use_cache:
+            run_susops_async("test --all", lambda output, _: alert_foreground("SusOps Test All", output),
+                             show_alert=False, timeout=300)
+            return
+
+        from core import tester
+
+        def run_tests():
+            results = tester.test_all(pool=self.controller.ssh_pool)
+            tester.save_results(results)
+            return results
+
+        def done(results):
+            if isinstance(results, Exception):
+                alert_foreground("Error", str(results))
+                return
+            path = os.path.join(ConfigHelper.workspace_path, "test-results.json")
+            alert_foreground("SusOps Test All", f"{tester.format_table(results, limit=30)}\n\nFull results: {path}")
+
+        self.executor.call(run_tests, callback=done, label="testing")
 
     def launch_chrome(self, _):
-        output, _ = run_susops("chrome", False)
+        run_susops_async("chrome", show_alert=False)
 
     def launch_chrome_proxy_settings(self, _):
-        output, _ = run_susops("chrome-proxy-settings", False)
+        run_susops_async("chrome-proxy-settings", show_alert=False)
 
     def launch_firefox(self, _):
-        output, _ = run_susops("firefox", False)
+        run_susops_async("firefox", show_alert=False)
 
     def reset(self, _):
         result = alert_foreground(
@@ -638,9 +689,11 @@ class SusOpsApp(rumps.App):
         )
 
         if result == 1:
-            run_susops("reset --force", False)
-            self.config = self.load_config()
-            self.update_icon()
+            def done(*_):
+                self.controller.refresh_config()
+                self.update_icon()
+
+            run_susops_async("reset --force", done, show_alert=False, label="reset")
 
     def open_about(self, _):
         if self._about_panel is None:
@@ -652,8 +705,7 @@ class SusOpsApp(rumps.App):
         self._about_panel.run()
 
     def quit_app(self, _):
-        if self.config['stop_on_quit']:
-            run_susops("stop --keep-ports", False)
+        self.controller.shutdown()
         rumps.quit_application()
 
 
@@ -783,23 +835,26 @@ class SettingsPanel(NSPanel):
         pac_server_port = self.pac_port_field.stringValue().strip()
         if not FormValidator.validate_port_with_alert(pac_server_port, self.pac_label.stringValue().rstrip(':')):
             return
-        ConfigHelper.update_config(f".pac_server_port = {pac_server_port}")
 
         stop_on_quit = self.stop_on_quit_checkbox.stringValue().strip()
         if not FormValidator.validate_empty_with_alert(stop_on_quit, self.stop_on_quit_checkbox.stringValue().rstrip(':')):
             return
-        ConfigHelper.update_config(f".susops_app.stop_on_quit = \"{stop_on_quit}\"")
 
         ephemeral_ports = self.ephemeral_ports_checkbox.stringValue().strip()
         if not FormValidator.validate_empty_with_alert(ephemeral_ports, self.ephemeral_ports_checkbox.stringValue().rstrip(':')):
             return
-        ConfigHelper.update_config(f".susops_app.ephemeral_ports = \"{ephemeral_ports}\"")
 
         selected_index = self.segmented_icons.selectedSegment()
         selected_style = list(LogoStyle)[selected_index]
-        ConfigHelper.update_config(f".susops_app.logo_style = \"{selected_style.value}\"")
 
-        susops_app.config = susops_app.load_config()
+        # single locked, atomic write instead of one yq rewrite per setting
+        with ConfigHelper.transaction() as tx:
+            tx.set(".pac_server_port", int(pac_server_port))
+            tx.set(".susops_app.stop_on_quit", stop_on_quit)
+            tx.set(".susops_app.ephemeral_ports", ephemeral_ports)
+            tx.set(".susops_app.logo_style", selected_style.value)
+
+        susops_app.controller.reload_config()
         susops_app.update_icon()
 
         self.close()
@@ -836,7 +891,7 @@ class SettingsPanel(NSPanel):
 
     def cancelSettings_(self, _):
         # reset the logo style to the saved one
-        susops_app.config = susops_app.load_config()
+        susops_app.controller.reload_config()
         susops_app.update_icon()
         self.close()
 
@@ -883,7 +938,7 @@ class GenericFieldPanel(NSPanel):
 
             self.connection = NSPopUpButton.alloc().initWithFrame_(NSMakeRect(input_start_x, y, input_width, 24))
             self.connection.setPullsDown_(False)
-            self.connection.addItemsWithTitles_(ConfigHelper.get_connection_tags())
+            self.connection.addItemsWithTitles_(list(ConfigModel.current().connections))
             self.connection.selectItemAtIndex_(0)
             content.addSubview_(self.connection)
         y -= 40
@@ -921,20 +976,33 @@ class GenericFieldPanel(NSPanel):
         add_btn.setTarget_(self)
         add_btn.setAction_("add:")
         content.addSubview_(add_btn)
+        self.add_btn = add_btn
 
     def run(self):
         bring_app_to_front(self)
         # reload connection tags
         if hasattr(self, 'connection'):
             self.connection.removeAllItems()
-            self.connection.addItemsWithTitles_(ConfigHelper.get_connection_tags())
+            self.connection.addItemsWithTitles_(list(ConfigModel.current().connections))
+
+    def run_command(self, cmd, on_success):
+        """Runs cmd in the background, the Add button stays disabled until it completes."""
+        self.add_btn.setEnabled_(False)
+
+        def done(output, returncode):
+            self.add_btn.setEnabled_(True)
+            if returncode == 0:
+                susops_app.controller.notify_state_action()
+                on_success(output)
+
+        run_susops_async(cmd, done)
 
     def cancel_(self, _):
         self.close()
 
 
 class GenericSelectPanel(NSPanel):
-    """A simple panel with a label, a dropdown, and Save/Cancel buttons."""
+    """A panel with a search field over a filter-as-you-type list, and Remove/Cancel buttons."""
 
     def initWithContentRect_styleMask_backing_defer_(
             self, frame, style, backing, defer
@@ -947,21 +1015,25 @@ class GenericSelectPanel(NSPanel):
 
         self.setHidesOnDeactivate_(False)
         self.setLevel_(NSFloatingWindowLevel)
+        self.source = None
+        self.items = ()
+        self.index = None
+        self.matches = []
 
         return self
 
-    def configure_field(self, label_text: str, label_width: int = 100, input_start_x: int = 120, input_width: int = 150, save_button_text: str = "Remove"):
+    def configure_field(self, label_text: str, label_width: int = 100, input_start_x: int = 120, save_button_text: str = "Remove"):
         """
-        Configures the panel with a single label and NSPopUpButton.
+        Configures the panel with a label and search field on top, the matching items below.
         :param label_text: The text for the label.
         :param label_width: Width of the label.
-        :param input_start_x: X-coordinate for the NSPopUpButton.
-        :param input_width: Width of the NSPopUpButton.
+        :param input_start_x: X-coordinate for the search field.
         """
         content = self.contentView()
+        size = content.frame().size
 
         # Label
-        y = 40 + 16
+        y = size.height - 40
         label = NSTextField.alloc().initWithFrame_(NSMakeRect(15, y - 2, label_width, 24))
         label.setStringValue_(label_text)
         label.setAlignment_(2)
@@ -971,16 +1043,41 @@ class GenericSelectPanel(NSPanel):
         content.addSubview_(label)
         self.label = label
 
-        # NSPopUpButton
-        select = NSPopUpButton.alloc().initWithFrame_(NSMakeRect(input_start_x, y, input_width + 10, 24))
-        select.setPullsDown_(False)
-        # select.addItemsWithTitles_(options)
-        select.selectItemAtIndex_(0)
-        content.addSubview_(select)
-        self.select = select
+        # NSSearchField, filters on every keystroke
+        search = NSSearchField.alloc().initWithFrame_(NSMakeRect(input_start_x, y, size.width - input_start_x - 15, 24))
+        search.setSendsSearchStringImmediately_(True)
+        search.setTarget_(self)
+        search.setAction_("filter:")
+        content.addSubview_(search)
+        self.search = search
+
+        # matches, double-click removes
+        scroll = NSScrollView.alloc().initWithFrame_(NSMakeRect(15, 60, size.width - 30, y - 70))
+        scroll.setHasVerticalScroller_(True)
+        scroll.setBorderType_(2)
+        table = NSTableView.alloc().initWithFrame_(scroll.contentView().bounds())
+        column = NSTableColumn.alloc().initWithIdentifier_("item")
+        column.setWidth_(size.width - 50)
+        column.setEditable_(False)
+        table.addTableColumn_(column)
+        table.setHeaderView_(None)
+        table.setDataSource_(self)
+        table.setTarget_(self)
+        table.setDoubleAction_("save:")
+        scroll.setDocumentView_(table)
+        content.addSubview_(scroll)
+        self.table = table
+
+        count = NSTextField.alloc().initWithFrame_(NSMakeRect(15, 22, size.width - 210, 18))
+        count.setFont_(NSFont.systemFontOfSize_(11))
+        count.setBezeled_(False)
+        count.setDrawsBackground_(False)
+        count.setEditable_(False)
+        content.addSubview_(count)
+        self.count = count
 
         # Save/Cancel Buttons
-        x = input_start_x - 5
+        x = size.width - 185
         cancel_btn = NSButton.alloc().initWithFrame_(NSMakeRect(x, 18, 80, 30))
         cancel_btn.setTitle_("Cancel")
         cancel_btn.setBezelStyle_(1)
@@ -995,12 +1092,51 @@ class GenericSelectPanel(NSPanel):
         save_btn.setTarget_(self)
         save_btn.setAction_("save:")
         content.addSubview_(save_btn)
+        self.save_btn = save_btn
 
-    def update_items(self, items: list):
-        """Update the items in the NSPopUpButton."""
-        self.select.removeAllItems()
-        self.select.addItemsWithTitles_(items)
-        self.select.selectItemAtIndex_(0)
+    def update_items(self, items):
+        """
+        Show model objects (core.model), titled by str(item). `items` is a ConfigModel list or mapping, the search
+        index is only rebuilt, off the main thread, when it is a different one.
+        """
+        if items is not self.source:
+            self.source = items
+            self.items = tuple(items.values()) if hasattr(items, "values") else tuple(items)
+            self.index = None
+
+            def built(index, items=self.items):
+                if isinstance(index, SearchIndex) and items is self.items:
+                    self.index = index
+                    self.filter_(None)
+
+            susops_app.controller.executor.call(SearchIndex, self.items, callback=built, label="search")
+        self.search.setStringValue_("")
+        self.filter_(None)
+
+    def filter_(self, _):
+        query = self.search.stringValue()
+        if self.index is not None:
+            self.matches = self.index.search(query)
+        else:
+            # until the index is built
+            query = query.strip().lower()
+            self.matches = list(itertools.islice((item for item in self.items if query in str(item).lower()),
+                                                 DEFAULT_LIMIT))
+        self.table.reloadData()
+        if self.matches:
+            self.table.selectRowIndexes_byExtendingSelection_(NSIndexSet.indexSetWithIndex_(0), False)
+        more = "+" if len(self.matches) >= DEFAULT_LIMIT else ""
+        self.count.setStringValue_(f"{len(self.matches)}{more} of {len(self.items)}")
+
+    def numberOfRowsInTableView_(self, table):
+        return len(self.matches)
+
+    def tableView_objectValueForTableColumn_row_(self, table, column, row):
+        return str(self.matches[row]) if 0 <= row < len(self.matches) else ""
+
+    def selected(self):
+        row = self.table.selectedRow()
+        return self.matches[row] if 0 <= row < len(self.matches) else None
 
     def run(self):
         bring_app_to_front(self)
@@ -1008,47 +1144,71 @@ class GenericSelectPanel(NSPanel):
     def cancel_(self, _):
         self.close()
 
-    def get_command(self, value: str):
+    def get_command(self, item):
         raise NotImplementedError("Subclasses must implement this method.")
 
     def save_(self, _):
-        selectedItem = self.select.selectedItem()
-        value = selectedItem.title() if selectedItem else None
-        if not FormValidator.validate_empty_with_alert(value, self.label.stringValue().rstrip(':')):
+        item = self.selected()
+        if not FormValidator.validate_empty_with_alert(item and str(item), self.label.stringValue().rstrip(':')):
             return
 
-        output, returncode = run_susops(self.get_command(value))
-        if returncode == 0:
-            alert_foreground("Success", output)
-            self.close()
+        self.save_btn.setEnabled_(False)
+
+        def done(output, returncode):
+            self.save_btn.setEnabled_(True)
+            if returncode == 0:
+                susops_app.controller.notify_state_action()
+                alert_foreground("Success", output)
+                self.close()
+
+        run_susops_async(self.get_command(item), done)
 
 
 class RemoveConnectionPanel(GenericSelectPanel):
-    def get_command(self, value: str):
-        return f"rm-connection {value}"
+    def get_command(self, item):
+        return f"rm-connection {item.tag}"
 
 
 class RemoveDomainPanel(GenericSelectPanel):
-    def get_command(self, value: str):
-        return f"rm {value}"
+    def get_command(self, item):
+        return f"rm {item.host}"
+
+    def save_(self, _):
+        if not susops_app.controller.patches_pac:
+            return objc.super(RemoveDomainPanel, self).save_(_)
+
+        item = self.selected()
+        if not FormValidator.validate_empty_with_alert(item and item.host, self.label.stringValue().rstrip(':')):
+            return
+        value = item.host
+
+        self.save_btn.setEnabled_(False)
+
+        def removed(tx):
+            self.save_btn.setEnabled_(True)
+            if isinstance(tx, Exception):
+                return
+            if not tx.removed:
+                alert_foreground("Error", f"{value} not found")
+                return
+            alert_foreground("Success", f"Removed {value} from {', '.join(tx.removed)}")
+            self.close()
+
+        susops_app.controller.edit_pac_hosts(None, removed=[value], callback=removed)
+
 
+class RemoveForwardPanel(GenericSelectPanel):
+    def get_command(self, item):
+        # the CLI removes forwards by source port
+        return f"rm {item.flag} {item.src_port}"
 
-class RemoveLocalForwardPanel(GenericSelectPanel):
-    def get_command(self, value: str):
-        # match by src
-        pattern = r"\((\d+)\s"
-        match = re.search(pattern, value)
-        src = match.groups(1)[0]
-        return f"rm -l {src}"
 
+class RemoveLocalForwardPanel(RemoveForwardPanel):
+    pass
 
-class RemoveRemoteForwardPanel(GenericSelectPanel):
-    def get_command(self, value: str):
-        # match by src
-        pattern = r"\((\d+)\s"
-        match = re.search(pattern, value)
-        src = match.groups(1)[0]
-        return f"rm -r {src}"
+
+class RemoveRemoteForwardPanel(RemoveForwardPanel):
+    pass
 
 
 class AboutPanel(NSPanel):
@@ -1179,10 +1339,9 @@ class AddConnectionPanel(GenericFieldPanel):
     def run(self):
         objc.super(AddConnectionPanel, self).run()
 
-        try:
-            ssh_hosts = get_ssh_hosts()
-        except Exception as e:
-            ssh_hosts = []
+        # cached until ~/.ssh/config or one of its includes changes
+        from core.ssh_config import ssh_config
+        ssh_hosts = ssh_config().aliases
 
         self.host.removeAllItems()
         self.host.addItemsWithObjectValues_(ssh_hosts)
@@ -1203,14 +1362,16 @@ class AddConnectionPanel(GenericFieldPanel):
             return
 
         cmd = f"add-connection \"{tag}\" {host} {socks_proxy_port}"
-        output, returncode = run_susops(cmd)
-        if returncode == 0:
+
+        def added(output):
             alert_foreground("Success", output)
             self.close()
             self.tag.setStringValue_("")
             self.host.setStringValue_("")
             self.socks_proxy_port.setStringValue_("")
 
+        self.run_command(cmd, added)
+
 
 class AddHostPanel(GenericFieldPanel):
 
@@ -1238,12 +1399,129 @@ class AddHostPanel(GenericFieldPanel):
             return
 
         cmd = f"-c \"{connection}\" add {host}"
-        output, returncode = run_susops(cmd)
-        if returncode == 0:
+
+        def added(output):
             alert_foreground("Success", output)
             self.close()
             self.host.setStringValue_("")
 
+        if not susops_app.controller.patches_pac:
+            self.run_command(cmd, added)
+            return
+        from core.pac_compiler import classify, normalize_entry
+        if classify(normalize_entry(host)) is None:
+            alert_foreground("Error", f"{host} is not a valid domain, IP or CIDR")
+            return
+
+        self.add_btn.setEnabled_(False)
+
+        def patched(tx):
+            self.add_btn.setEnabled_(True)
+            if isinstance(tx, Exception):
+                return
+            if not tx.added:
+                alert_foreground("Error", f"{host} is already in {connection}")
+                return
+            added(f"Added {host} to {connection}, the PAC file is updated")
+
+        susops_app.controller.edit_pac_hosts(connection, added=[host], callback=patched)
+
+
+class ImportHostsPanel(GenericFieldPanel):
+    """Paste a list or load a file, imported into one connection's pac_hosts in a single config write."""
+
+    def configure(self, frame_width, frame_height):
+        content = self.contentView()
+        y = frame_height - 40
+        lbl = NSTextField.alloc().initWithFrame_(NSMakeRect(15, y - 2, 90, 24))
+        lbl.setStringValue_("Connection:")
+        lbl.setBezeled_(False)
+        lbl.setDrawsBackground_(False)
+        lbl.setEditable_(False)
+        content.addSubview_(lbl)
+        self.connection = NSPopUpButton.alloc().initWithFrame_(NSMakeRect(105, y, frame_width - 120, 24))
+        self.connection.setPullsDown_(False)
+        content.addSubview_(self.connection)
+
+        hint = NSTextField.alloc().initWithFrame_(NSMakeRect(15, y - 36, frame_width - 30, 28))
+        hint.setStringValue_("One per line or comma separated, # comments and URLs are fine. "
+                             "Duplicates and covered hosts are skipped, CIDRs merged.")
+        hint.setFont_(NSFont.systemFontOfSize_(11))
+        hint.setBezeled_(False)
+        hint.setDrawsBackground_(False)
+        hint.setEditable_(False)
+        content.addSubview_(hint)
+
+        scroll = NSScrollView.alloc().initWithFrame_(NSMakeRect(15, 60, frame_width - 30, y - 106))
+        scroll.setHasVerticalScroller_(True)
+        scroll.setBorderType_(2)
+        self.text = NSTextView.alloc().initWithFrame_(scroll.contentView().bounds())
+        self.text.setRichText_(False)
+        self.text.setAutomaticQuoteSubstitutionEnabled_(False)
+        self.text.setFont_(NSFont.userFixedPitchFontOfSize_(12))
+        scroll.setDocumentView_(self.text)
+        content.addSubview_(scroll)
+
+        file_btn = NSButton.alloc().initWithFrame_(NSMakeRect(10, 16, 110, 30))
+        file_btn.setTitle_("From File…")
+        file_btn.setBezelStyle_(1)
+        file_btn.setTarget_(self)
+        file_btn.setAction_("openFile:")
+        content.addSubview_(file_btn)
+
+        cancel_btn = NSButton.alloc().initWithFrame_(NSMakeRect(frame_width - 185, 16, 80, 30))
+        cancel_btn.setTitle_("Cancel")
+        cancel_btn.setBezelStyle_(1)
+        cancel_btn.setTarget_(self)
+        cancel_btn.setAction_("cancel:")
+        content.addSubview_(cancel_btn)
+
+        self.add_btn = NSButton.alloc().initWithFrame_(NSMakeRect(frame_width - 98, 16, 88, 30))
+        self.add_btn.setTitle_("Import")
+        self.add_btn.setBezelStyle_(1)
+        self.add_btn.setTarget_(self)
+        self.add_btn.setAction_("add:")
+        content.addSubview_(self.add_btn)
+
+    def openFile_(self, _):
+        panel = NSOpenPanel.openPanel()
+        panel.setCanChooseDirectories_(False)
+        panel.setAllowsMultipleSelection_(False)
+        if panel.runModal() != 1:
+            return
+        try:
+            with open(panel.URLs()[0].path(), "r", encoding="utf-8", errors="replace") as f:
+                self.text.setString_(f.read())
+        except OSError as e:
+            alert_foreground("Error", f"Could not read the file: {e}")
+
+    def add_(self, _):
+        from core.host_import import parse_entries
+        connection_item = self.connection.selectedItem()
+        connection = connection_item.title() if connection_item else None
+        if not FormValidator.validate_empty_with_alert(connection, "Connection"):
+            return
+        entries = parse_entries(self.text.string())
+        if not entries:
+            alert_foreground("Error", "There is nothing to import")
+            return
+
+        self.add_btn.setEnabled_(False)
+
+        def imported(tx):
+            self.add_btn.setEnabled_(True)
+            if isinstance(tx, Exception):
+                return
+            plan = tx.imports.get(connection)
+            summary = plan.summary() if plan else f"{len(entries)} entries imported"
+            if not susops_app.controller.patches_pac:
+                summary += "\n\nRestart the proxy to update the PAC file."
+            alert_foreground(f"Imported into {connection}", summary)
+            self.close()
+            self.text.setString_("")
+
+        susops_app.controller.import_pac_hosts(connection, entries, callback=imported)
+
 
 class LocalForwardPanel(GenericFieldPanel):
     def run(self):
@@ -1273,13 +1551,16 @@ class LocalForwardPanel(GenericFieldPanel):
             return
 
         cmd = f"-c \"{connection}\" add -l {local_port} {remote_port} \"{tag}\" \"{local_addr}\" \"{remote_addr}\""
-        output, returncode = run_susops(cmd)
-        if returncode == 0:
-            susops_app.show_restart_dialog("Success", output)
+        spec = f"{local_addr or 'localhost'}:{local_port}:{remote_addr or 'localhost'}:{remote_port}"
+
+        def added(output):
             self.close()
             self.tag.setStringValue_("")
             self.remote_port_field.setStringValue_("")
             self.local_port_field.setStringValue_("")
+            susops_app.forward_added(connection, "-L", spec, output)
+
+        self.run_command(cmd, added)
 
 
 class RemoteForwardPanel(GenericFieldPanel):
@@ -1307,13 +1588,16 @@ class RemoteForwardPanel(GenericFieldPanel):
             return
 
         cmd = f"-c \"{connection}\" add -r {remote_port} {local_port} \"{tag}\" \"{remote_addr}\" \"{local_addr}\""
-        output, returncode = run_susops(cmd)
-        if returncode == 0:
-            susops_app.show_restart_dialog("Success", output)
+        spec = f"{remote_addr or 'localhost'}:{remote_port}:{local_addr or 'localhost'}:{local_port}"
+
+        def added(output):
             self.close()
             self.tag.setStringValue_("")
             self.local_port_field.setStringValue_("")
             self.remote_port_field.setStringValue_("")
+            susops_app.forward_added(connection, "-R", spec, output)
+
+        self.run_command(cmd, added)
 
 
 if __name__ == "__main__":
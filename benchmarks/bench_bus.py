@@ -0,0 +1,153 @@
+"""
+Event-to-icon latency: a stand-in publisher reports a tunnel down/up on the event bus (core/bus.py), measured until
+the app has redrawn its icon. Compared with polling-only detection of the same change.
+
+    python benchmarks/bench_bus.py [--events 100] [--poll-samples 3] [--max-p95-ms 50]
+
+Runs app.py headless against benchmarks/stubs in a scratch HOME, with SOCKS5 stand-ins as the tunnels. Polling-only
+samples kill a tunnel by removing its pidfile and take up to the poll interval each. Exits with 1 if the bus p95
+exceeds --max-p95-ms.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME = tempfile.mkdtemp(prefix="susops-bus-")
+os.environ["HOME"] = HOME
+os.environ["SUSOPS_BIN"] = os.path.join(BENCH_DIR, "bin", "susops")
+sys.path[:0] = [os.path.join(BENCH_DIR, "stubs"), os.path.dirname(BENCH_DIR)]
+
+import app  # noqa: E402
+import rumps  # noqa: E402
+from benchmarks.standins import Socks5StandInProcess, write_workspace  # noqa: E402
+from core.bus import TUNNEL_DOWN, TUNNEL_UP, publish  # noqa: E402
+from core.config import ConfigHelper  # noqa: E402
+from core.controller import Event  # noqa: E402
+from core.state import ProcessState  # noqa: E402
+
+
+class IconWatch:
+    """Records when the app's icon changed. Subscribed after the app, so the app has drawn it by then."""
+
+    def __init__(self, instance):
+        self.instance = instance
+        self.changed = threading.Condition()
+        self.changes = []
+        instance.controller.subscribe(self.event)
+
+    def event(self, event, payload):
+        if event == Event.STATE:
+            with self.changed:
+                self.changes.append((time.perf_counter(), payload.state, self.instance.icon))
+                self.changed.notify_all()
+
+    def wait(self, state: ProcessState, timeout: float) -> float:
+        with self.changed:
+            if not self.changed.wait_for(lambda: self.changes and self.changes[-1][1] == state, timeout):
+                raise RuntimeError(f"no {state.value} within {timeout:g}s")
+            return self.changes[-1][0]
+
+
+def start_app():
+    instance = app.SusOpsApp()
+    watch = IconWatch(instance)
+    instance.controller.startup_loaded(instance.controller.load_startup())
+    return instance, watch
+
+
+def run_loop(fn):
+    """Runs fn on a thread while the stub main loop runs here, like the real app's run loop."""
+    result = {}
+
+    def target():
+        try:
+            result["value"] = fn()
+        except BaseException as e:
+            result["error"] = e
+        finally:
+            rumps.loop.stop()
+
+    threading.Thread(target=target, daemon=True).start()
+    rumps.loop.run()
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
+
+
+def percentile(samples: list, p: float) -> float:
+    return sorted(samples)[max(int(len(samples) * p) - 1, 0)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connections", type=int, default=4)
+    parser.add_argument("--events", type=int, default=100)
+    parser.add_argument("--poll-samples", type=int, default=3)
+    parser.add_argument("--max-p95-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    servers = Socks5StandInProcess(args.connections)
+    try:
+        workspace = ConfigHelper.workspace_path
+        pids = {f"susops-ssh-conn{i}.pid": os.getpid() for i in range(args.connections)}
+        pids["susops-pac.pid"] = os.getpid()
+        connections = [{"tag": f"conn{i}", "socks_proxy_port": port} for i, port in enumerate(servers.ports)]
+        write_workspace(workspace, connections, pids=pids)
+
+        instance, watch = start_app()
+        assert instance.controller.bus is not None, "the event bus did not start"
+        assert instance.process_state == ProcessState.RUNNING, instance.process_state
+
+        def bus_samples():
+            samples = []
+            for i in range(args.events):
+                for event, state in ((TUNNEL_DOWN, ProcessState.STOPPED_PARTIALLY), (TUNNEL_UP, ProcessState.RUNNING)):
+                    start = time.perf_counter()
+                    if not publish(event, "conn0", pid=os.getpid()):
+                        raise RuntimeError("publish failed")
+                    samples.append((watch.wait(state, 5) - start) * 1000)
+            return samples
+
+        bus = run_loop(bus_samples)
+        instance.controller.shutdown(stop_proxy=False)
+
+        with ConfigHelper.transaction() as tx:
+            tx.set(".susops_app.event_bus", "0")
+        instance, watch = start_app()
+        pidfile = os.path.join(workspace, "pids", "susops-ssh-conn0.pid")
+
+        def poll_samples():
+            samples = []
+            for i in range(args.poll_samples):
+                # let the poll interval settle into its backoff, as it would while idle
+                time.sleep(1 + i)
+                start = time.perf_counter()
+                os.rename(pidfile, pidfile + ".down")
+                samples.append((watch.wait(ProcessState.STOPPED_PARTIALLY, 120) - start) * 1000)
+                os.rename(pidfile + ".down", pidfile)
+                watch.wait(ProcessState.RUNNING, 120)
+            return samples
+
+        polled = run_loop(poll_samples) if args.poll_samples else []
+        instance.controller.shutdown(stop_proxy=False)
+    finally:
+        servers.close()
+
+    print(f"{args.connections} tunnels, {len(bus)} bus events, {len(polled)} polling samples (ms to redrawn icon)")
+    print(f"{'source':<14}{'p50':>10}{'p95':>10}{'max':>10}")
+    for name, samples in (("event bus", bus), ("polling only", polled)):
+        if samples:
+            print(f"{name:<14}{statistics.median(samples):>10.2f}{percentile(samples, 0.95):>10.2f}"
+                  f"{max(samples):>10.2f}")
+    if percentile(bus, 0.95) > args.max_p95_ms:
+        print(f"\nevent bus p95 over budget ({args.max_p95_ms:g} ms)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Cold vs. warm query latency of the in-memory ConfigHelper backend against the yq subprocess path.
+
+    python benchmarks/bench_config.py [--hosts 2000] [--yq /path/to/yq] [--rounds 20]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yaml
+
+from core.config import ConfigHelper
+
+QUERIES = [
+    ("pac_server_port", lambda: ConfigHelper.read_config(".pac_server_port", "1081")),
+    ("logo_style", lambda: ConfigHelper.read_config(".susops_app.logo_style", "COLORED_GLASSES")),
+    ("connection_tags", ConfigHelper.get_connection_tags),
+    ("domains", ConfigHelper.get_domains),
+    ("local_forwards", ConfigHelper.get_local_forwards),
+]
+
+
+def write_config(path, connections, hosts):
+    config = {
+        "pac_server_port": 1081,
+        "susops_app": {"logo_style": "COLORED_GLASSES", "stop_on_quit": "1", "ephemeral_ports": "1"},
+        "connections": [
+            {
+                "tag": f"conn{c}",
+                "ssh_host": f"bastion{c}",
+                "socks_proxy_port": 1080 + c,
+                "forwards": {
+                    "local": [{"tag": f"l{c}-{i}", "src_port": 20000 + c * 10 + i, "dst_port": 80 + i} for i in range(5)],
+                    "remote": [],
+                },
+                "pac_hosts": [f"host{i}.conn{c}.example.com" for i in range(hosts // connections)],
+            }
+            for c in range(connections)
+        ],
+    }
+    with open(path, "w") as f:
+        yaml.safe_dump(config, f, sort_keys=False)
+
+
+def measure(fn, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connections", type=int, default=10)
+    parser.add_argument("--hosts", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--yq", default=ConfigHelper.yq_path, help="mikefarah yq binary for the subprocess baseline")
+    args = parser.parse_args()
+
+    workspace = tempfile.mkdtemp(prefix="susops-bench-")
+    try:
+        ConfigHelper.config_path = os.path.join(workspace, "config.yaml")
+        ConfigHelper.yq_path = args.yq
+        write_config(ConfigHelper.config_path, args.connections, args.hosts)
+
+        have_yq = os.access(args.yq, os.X_OK)
+        print(f"{args.connections} connections, {args.hosts} pac_hosts, median of {args.rounds} rounds (ms)")
+        print(f"{'query':<18}{'cold':>10}{'warm':>10}{'yq':>10}")
+        for name, fn in QUERIES:
+            ConfigHelper.use_cache = True
+
+            def cold():
+                ConfigHelper.cache().invalidate()
+                fn()
+
+            cold_ms = measure(cold, args.rounds)
+            warm_ms = measure(fn, args.rounds)
+            yq_ms = float("nan")
+            if have_yq:
+                ConfigHelper.use_cache = False
+                yq_ms = measure(fn, max(3, args.rounds // 4))
+            print(f"{name:<18}{cold_ms:>10.3f}{warm_ms:>10.3f}{yq_ms:>10.3f}")
+
+        if not have_yq:
+            print(f"\nyq not found at {args.yq}, subprocess baseline skipped")
+    finally:
+        shutil.rmtree(workspace)
+
+
+if __name__ == "__main__":
+    main()
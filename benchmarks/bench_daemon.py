@@ -0,0 +1,98 @@
+"""
+Headless daemon budget: resident memory and CPU while idle, and that no GUI module gets imported.
+
+    python benchmarks/bench_daemon.py [--size medium] [--idle 30] [--max-rss-mb 40] [--max-idle-cpu 0.5]
+
+Starts `python -m core.daemon` in a scratch HOME with a generated config and the stand-in susops, waits for it to
+start polling and samples its CPU time and RSS over the idle period. Exits with 1 when a budget is exceeded.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fixtures import SIZES, generate_config, write_config
+
+GUI_MODULES = ("rumps", "AppKit", "Cocoa", "Foundation", "objc", "PyObjCTools")
+
+
+def process_usage(pid: int) -> tuple[float, float]:
+    """CPU seconds (user + system) and RSS in MB of a running process."""
+    if os.path.exists(f"/proc/{pid}/stat"):
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        with open(f"/proc/{pid}/status") as f:
+            rss_kb = int(re.search(r"VmRSS:\s+(\d+)", f.read()).group(1))
+        return cpu, rss_kb / 1024
+    # macOS: ps reports cputime as [[dd-]hh:]mm:ss.cc and rss in KB
+    cputime, rss_kb = subprocess.check_output(["ps", "-o", "time=,rss=", "-p", str(pid)], text=True).split()
+    seconds = 0.0
+    for part in cputime.replace("-", ":").split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds, int(rss_kb) / 1024
+
+
+def gui_imports(env: dict) -> list:
+    code = "import sys, core.daemon; print(' '.join(sys.modules))"
+    modules = subprocess.check_output([sys.executable, "-c", code], cwd=ROOT, env=env, text=True).split()
+    return [m for m in modules if m.split(".")[0] in GUI_MODULES]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", default="medium", choices=list(SIZES))
+    parser.add_argument("--idle", type=float, default=30, help="seconds to sample while idle")
+    parser.add_argument("--max-rss-mb", type=float, default=40)
+    parser.add_argument("--max-idle-cpu", type=float, default=0.5, help="percent of one core")
+    args = parser.parse_args()
+
+    home = tempfile.mkdtemp(prefix="susops-daemon-")
+    env = {**os.environ, "HOME": home, "SUSOPS_BIN": os.path.join(ROOT, "benchmarks", "bin", "susops"),
+           "SUSOPS_STANDIN_STATE": "stopped", "PYTHONUNBUFFERED": "1"}
+    connections, pac_hosts, forwards, _ = SIZES[args.size]
+    write_config(os.path.join(home, ".susops", "config.yaml"), generate_config(connections, pac_hosts, forwards))
+
+    failures = [f"imports {name}" for name in gui_imports(env)]
+
+    started = time.perf_counter()
+    daemon = subprocess.Popen([sys.executable, "-m", "core.daemon"], cwd=ROOT, env=env,
+                              stdout=subprocess.PIPE, text=True)
+    try:
+        for line in daemon.stdout:
+            if " started " in line:
+                break
+        else:
+            print("daemon exited before it started")
+            sys.exit(2)
+        ready = (time.perf_counter() - started) * 1000
+        cpu_start, _ = process_usage(daemon.pid)
+        time.sleep(args.idle)
+        cpu_end, rss = process_usage(daemon.pid)
+    finally:
+        daemon.terminate()
+        daemon.wait(10)
+
+    idle_cpu = (cpu_end - cpu_start) / args.idle * 100
+    print(f"config {args.size} {SIZES[args.size][:3]}, idle {args.idle:g}s")
+    print(f"startup      {ready:8.1f} ms")
+    print(f"rss          {rss:8.1f} MB   (budget {args.max_rss_mb:g})")
+    print(f"idle cpu     {idle_cpu:8.3f} %    (budget {args.max_idle_cpu:g})")
+
+    if rss > args.max_rss_mb:
+        failures.append(f"rss {rss:.1f} MB over {args.max_rss_mb:g} MB")
+    if idle_cpu > args.max_idle_cpu:
+        failures.append(f"idle cpu {idle_cpu:.3f}% over {args.max_idle_cpu:g}%")
+    for failure in failures:
+        print(f"BUDGET {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
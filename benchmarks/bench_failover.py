@@ -0,0 +1,171 @@
+"""
+Failover groups (core/failover.py): request latency through the served PAC's chain vs. a PAC that ties the hosts to
+one connection, while the first connection of the group is healthy, slow and hung, plus PAC churn under jitter.
+
+    python benchmarks/bench_failover.py [--requests 20] [--interval 0.5] [--jitter-rounds 40]
+
+Three SOCKS5 stand-ins are the group's tunnels, their CONNECT delay is the round trip to the bastion (5, 20 and
+40 ms). "slow" raises the first one's to 300 ms, "hung" makes it accept and never answer, which is what stalls a
+browser. Requests follow the PAC return value like a browser: the next entry once one fails, each capped at
+--request-timeout. "reorder" is the time from the change until the served PAC puts another tunnel first. Under
+jitter all three are equally fast with +-50% noise: PAC versions published vs. order changes of a plain sort.
+"""
+import argparse
+import os
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME = tempfile.mkdtemp(prefix="susops-failover-")
+os.environ["HOME"] = HOME
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import asyncio  # noqa: E402
+
+from benchmarks.standins import HttpStandIn, Socks5StandIn, write_workspace  # noqa: E402
+from core.config import ConfigHelper  # noqa: E402
+from core.failover import GroupMonitor  # noqa: E402
+from core.pac_compiler import PacCompiler  # noqa: E402
+from core.pac_server import PacServer  # noqa: E402
+from core.tester import ProbeKind, TestTarget, run_tests  # noqa: E402
+
+HOST = "app.example.com"
+
+
+def fetch(proxy_value: str, target: tuple, timeout: float) -> tuple:
+    """Connect like a browser following a PAC return value. (seconds, entry used or None if all failed)."""
+    start = time.perf_counter()
+    for entry in (e.strip() for e in proxy_value.split(";")):
+        try:
+            if entry == "DIRECT":
+                socket.create_connection(target, timeout=timeout).close()
+            else:
+                host, port = entry.split()[1].rsplit(":", 1)
+                with socket.create_connection((host, int(port)), timeout=timeout) as sock:
+                    sock.settimeout(timeout)
+                    sock.sendall(b"\x05\x01\x00")
+                    if sock.recv(2) != b"\x05\x00":
+                        raise ConnectionError("rejected")
+                    sock.sendall(b"\x05\x01\x00\x01" + socket.inet_aton(target[0]) + target[1].to_bytes(2, "big"))
+                    if sock.recv(10)[1:2] != b"\x00":
+                        raise ConnectionError("connect failed")
+            return time.perf_counter() - start, entry
+        except OSError:
+            continue
+    return time.perf_counter() - start, None
+
+
+def requests(pac_value, target, args) -> tuple:
+    samples, failed = [], 0
+    for _ in range(args.requests):
+        elapsed, used = fetch(pac_value(), target, args.request_timeout)
+        samples.append(elapsed * 1000)
+        failed += used is None
+    return statistics.median(samples), max(samples), failed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.5, help="measurement interval, the app's default is 5 s")
+    parser.add_argument("--request-timeout", type=float, default=5.0)
+    parser.add_argument("--jitter-rounds", type=int, default=40)
+    args = parser.parse_args()
+
+    upstream = HttpStandIn()
+    target = ("127.0.0.1", upstream.port)
+    delays = [0.005, 0.02, 0.04]
+    tunnels = [Socks5StandIn(connect_delay=d, upstream=target) for d in delays]
+    connections = [{"tag": f"eu-{i}", "group": "eu", "socks_proxy_port": t.port, "pac_hosts": [HOST] if i == 0 else []}
+                   for i, t in enumerate(tunnels)]
+    write_workspace(ConfigHelper.workspace_path, connections)
+    data = ConfigHelper.load()
+
+    pac = PacServer(0).start()
+    pac.refresh()
+    changed = threading.Condition()
+
+    def on_change(chains):
+        with changed:
+            pac.failover(chains)
+            changed.notify_all()
+
+    monitor = GroupMonitor(on_change, interval=args.interval, target=target, timeout=1.0)
+    monitor.sync(data)
+    monitor.start()
+    static = PacCompiler(data).find_proxy(HOST)
+
+    def served():
+        return pac.compiler.find_proxy(HOST)
+
+    def wait_first(predicate, timeout=30.0) -> float:
+        start = time.perf_counter()
+        with changed:
+            if not changed.wait_for(lambda: predicate(served().split(";")[0]), timeout):
+                raise RuntimeError(f"no reorder within {timeout:g}s: {served()}")
+        return (time.perf_counter() - start) * 1000
+
+    first = f"SOCKS5 127.0.0.1:{tunnels[0].port}"
+    rows = []
+    try:
+        wait_first(lambda entry: monitor.rounds >= 2)
+        rows.append(("healthy", None, requests(lambda: static, target, args), requests(served, target, args)))
+
+        tunnels[0].connect_delay = 0.3
+        reorder = wait_first(lambda entry: entry != first)
+        rows.append(("slow", reorder, requests(lambda: static, target, args), requests(served, target, args)))
+
+        tunnels[0].connect_delay = 0.005
+        wait_first(lambda entry: entry == first, timeout=60)
+        tunnels[0].greeting_delay = 3600
+        reorder = wait_first(lambda entry: entry != first)
+        rows.append(("hung", reorder, requests(lambda: static, target, args), requests(served, target, args)))
+        tunnels[0].greeting_delay = 0
+
+        # equally fast tunnels with noise: how often would the PAC change?
+        stop = threading.Event()
+
+        def noise():
+            while not stop.is_set():
+                for t in tunnels:
+                    t.connect_delay = 0.02 * random.uniform(0.5, 1.5)
+                stop.wait(0.01)
+
+        threading.Thread(target=noise, daemon=True).start()
+        time.sleep(args.interval * 4)
+        versions, rounds = pac.document.version, monitor.rounds
+        naive_changes, last = 0, None
+        probes = [TestTarget(ProbeKind.RTT, t.port, "", *target, t.port) for t in tunnels]
+        while monitor.rounds - rounds < args.jitter_rounds:
+            results = asyncio.run(run_tests(probes, timeout=1.0))
+            order = sorted(range(len(tunnels)), key=lambda i: results[i].connect_ms or 1e9)
+            naive_changes += last is not None and order != last
+            last = order
+            time.sleep(args.interval)
+        stop.set()
+        jitter = (monitor.rounds - rounds, pac.document.version - versions, naive_changes)
+    finally:
+        monitor.stop()
+        pac.stop()
+        for t in tunnels:
+            t.close()
+        upstream.close()
+
+    print(f"3 tunnels in one group ({', '.join(f'{d * 1000:g}' for d in delays)} ms), {args.requests} requests each, "
+          f"measured every {args.interval:g} s")
+    print(f"{'first tunnel':<14}{'reorder ms':>12}{'one-port p50':>14}{'max':>8}{'failed':>8}"
+          f"{'chain p50':>12}{'max':>8}{'failed':>8}")
+    for name, reorder, (s50, smax, sfail), (c50, cmax, cfail) in rows:
+        print(f"{name:<14}{'-' if reorder is None else f'{reorder:.0f}':>12}{s50:>14.1f}{smax:>8.0f}{sfail:>8}"
+              f"{c50:>12.1f}{cmax:>8.0f}{cfail:>8}")
+    rounds, published, naive = jitter
+    print(f"\njitter: {rounds} rounds, {published} PAC versions published, {naive} order changes with a plain sort")
+
+
+if __name__ == "__main__":
+    main()
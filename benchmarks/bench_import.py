@@ -0,0 +1,118 @@
+"""
+Bulk host import (core/host_import.py): one normalized write of a team's host list against adding the hosts one at
+a time, each with its own config rewrite, like one `susops add` per host.
+
+    python benchmarks/bench_import.py [--hosts 2000] [--size medium] [--per-host 200]
+
+The list has the mess a pasted inventory has: duplicates, hosts under a wildcard that is also in the list, runs of
+adjacent /26 networks and IPs inside them. The bulk import plans against the connection's hosts, writes the config
+once and patches a running PacServer like the app does. The one-at-a-time path is timed for --per-host hosts and
+extrapolated, with the interpreter start-up of the stand-in CLI measured on its own as the spawn cost per host.
+"""
+import argparse
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME = tempfile.mkdtemp(prefix="susops-import-")
+os.environ["HOME"] = HOME
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from benchmarks.fixtures import SIZES, generate_config, write_config  # noqa: E402
+from core.config import ConfigHelper  # noqa: E402
+from core.host_import import plan_import  # noqa: E402
+from core.pac_server import PacServer  # noqa: E402
+
+TAG = "conn0"
+
+
+def host_list(count: int, seed: int = 0) -> list:
+    """`count` entries: ~70% names, 10% duplicates, 5% wildcards with hosts under them, 15% networks and IPs."""
+    rnd = random.Random(seed)
+    entries = []
+    while len(entries) < count:
+        r = rnd.random()
+        n = len(entries)
+        if r < 0.7:
+            entries.append(f"app{n}.team{n % 40}.intra.example")
+        elif r < 0.8 and entries:
+            entries.append(rnd.choice(entries).upper())
+        elif r < 0.85:
+            entries += [f"*.zone{n}.intra.example", f"api.zone{n}.intra.example", f"*.eu.zone{n}.intra.example"]
+        elif r < 0.95:
+            base = rnd.randrange(0, 256)
+            entries += [f"172.16.{base}.{q * 64}/26" for q in range(4)]
+        else:
+            entries.append(f"172.16.{rnd.randrange(0, 256)}.{rnd.randrange(1, 255)}")
+    return entries[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hosts", type=int, default=2000)
+    parser.add_argument("--size", choices=SIZES, default="medium", help="config the hosts are imported into")
+    parser.add_argument("--per-host", type=int, default=200, help="hosts timed one at a time, then extrapolated")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    connections, pac_hosts, forwards, _ = SIZES[args.size]
+    data = generate_config(connections, pac_hosts, forwards)
+    entries = host_list(args.hosts)
+
+    # bulk: plan + one write + PAC patch
+    bulk, plans = [], []
+    pac = PacServer(0).start()
+    try:
+        for _ in range(args.rounds):
+            write_config(ConfigHelper.config_path, data)
+            pac._source = None
+            pac.refresh()
+            start = time.perf_counter()
+            with ConfigHelper.transaction() as tx:
+                tx.import_pac_hosts(TAG, entries)
+            pac.update(TAG, tx.added.get(TAG, ()), tx.removed.get(TAG, ()), source=tx.result)
+            bulk.append((time.perf_counter() - start) * 1000)
+            plans.append(tx.imports[TAG])
+        sample = next(e for e in entries if e.startswith("app"))
+        served = pac.compiler.find_proxy(sample)
+    finally:
+        pac.stop()
+    plan = plans[-1]
+    start = time.perf_counter()
+    plan_import(data["connections"][0]["pac_hosts"], entries)
+    planning = (time.perf_counter() - start) * 1000
+
+    # one at a time
+    write_config(ConfigHelper.config_path, data)
+    start = time.perf_counter()
+    for host in entries[:args.per_host]:
+        with ConfigHelper.transaction() as tx:
+            tx.add_pac_hosts(TAG, [host])
+    rewrite = (time.perf_counter() - start) * 1000 / args.per_host
+    spawns = []
+    env = {**os.environ, "SUSOPS_STANDIN_LATENCY": "0"}
+    for _ in range(20):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(BENCH_DIR, "bin", "susops"), "add", "x"], env=env,
+                       stdout=subprocess.DEVNULL, check=True)
+        spawns.append((time.perf_counter() - start) * 1000)
+    spawn = statistics.median(spawns)
+
+    print(f"{args.hosts} entries into {TAG} of a {args.size} config ({len(data['connections'][0]['pac_hosts'])} hosts)")
+    print(f"  {plan.summary().replace(chr(10), chr(10) + '  ')}")
+    print(f"  PAC after import: {sample} -> {served}\n")
+    print(f"{'path':<34}{'ms':>12}")
+    print(f"{'bulk import, planning only':<34}{planning:>12.1f}")
+    print(f"{'bulk import, write + PAC patch':<34}{statistics.median(bulk):>12.1f}   (p50 of {args.rounds})")
+    print(f"{'one at a time, rewrites':<34}{rewrite * args.hosts:>12.0f}   ({rewrite:.1f} ms x {args.hosts})")
+    print(f"{'one at a time, + process spawns':<34}{(rewrite + spawn) * args.hosts:>12.0f}   "
+          f"(+{spawn:.1f} ms interpreter start-up x {args.hosts})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Launch benchmark: time from process start to the menu bar item being drawn and to the first probed state.
+
+    python benchmarks/bench_launch.py [--runs 5] [--max-menu-ms 800] [--max-state-ms 2000] [--stubs]
+                                      [--baseline benchmarks/launch_baseline.json] [--tolerance 0.25] [--save-baseline]
+
+Starts app.py with $SUSOPS_LAUNCH_TRACE set, which makes it record milestones and quit after the first state.
+--stubs runs it headless against benchmarks/stubs and the stand-in susops in a scratch HOME, e.g. on Linux.
+Exits with 1 when a median exceeds its budget or the stored baseline by more than the tolerance.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from core.launch import TRACE_ENV
+
+MARKS = ("imported", "menu", "state")
+
+
+def launch(env: dict, timeout: float) -> dict:
+    """Milestones of one launch in ms after spawning the process."""
+    with tempfile.TemporaryDirectory() as tmp:
+        trace_path = os.path.join(tmp, "trace.ndjson")
+        start = time.time()
+        subprocess.run([sys.executable, os.path.join(ROOT, "app.py")], cwd=ROOT, timeout=timeout, check=True,
+                       env={**env, TRACE_ENV: trace_path}, stdout=subprocess.DEVNULL)
+        with open(trace_path) as f:
+            marks = {line["mark"]: line["time"] for line in map(json.loads, f)}
+    return {name: (marks[name] - start) * 1000 for name in MARKS if name in marks}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--max-menu-ms", type=float, default=800)
+    parser.add_argument("--max-state-ms", type=float, default=2000)
+    parser.add_argument("--baseline", default=os.path.join(ROOT, "benchmarks", "launch_baseline.json"))
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown against the baseline")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--stubs", action="store_true", help="use the stub rumps/PyObjC modules")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if args.stubs:
+        bench_dir = os.path.join(ROOT, "benchmarks")
+        env.update(HOME=tempfile.mkdtemp(prefix="susops-launch-"),
+                   PYTHONPATH=os.pathsep.join(filter(None, [os.path.join(bench_dir, "stubs"), env.get("PYTHONPATH")])),
+                   SUSOPS_BIN=os.path.join(bench_dir, "bin", "susops"))
+    try:
+        runs = [launch(env, args.timeout) for _ in range(args.runs)]
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        print(f"launch failed: {e}")
+        sys.exit(2)
+    medians = {name: statistics.median(run[name] for run in runs) for name in MARKS if all(name in run for run in runs)}
+
+    print(f"{args.runs} launches, ms after process start")
+    print(f"{'milestone':<10}{'median':>10}{'min':>10}{'max':>10}")
+    for name, median in medians.items():
+        values = [run[name] for run in runs]
+        print(f"{name:<10}{median:>10.1f}{min(values):>10.1f}{max(values):>10.1f}")
+
+    failures = []
+    for name, budget in (("menu", args.max_menu_ms), ("state", args.max_state_ms)):
+        if name not in medians:
+            failures.append(f"{name}: never reached")
+        elif medians[name] > budget:
+            failures.append(f"{name}: {medians[name]:.1f} ms over the {budget:.0f} ms budget")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({name: round(value, 1) for name, value in medians.items()}, f, indent=2)
+        print(f"baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for name, value in baseline.items():
+            limit = value * (1 + args.tolerance)
+            if name in medians and medians[name] > limit:
+                failures.append(f"{name}: {medians[name]:.1f} ms, baseline {value:.1f} ms (+{args.tolerance:.0%})")
+
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Forward and host lookups on the typed model (core/model.py) against the display-string round trip it replaced.
+
+    python benchmarks/bench_model.py [--size xl] [--lookups 1000]
+
+"strings" formats every forward with ConfigHelper.get_local_forwards(), finds the wanted one by scanning the list
+and parses its source port back out with a regex, which is what the Remove panels used to do.
+"""
+import argparse
+import os
+import random
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import SIZES, generate_config, write_config
+from core.config import ConfigHelper
+from core.model import ConfigModel, host_key
+
+# source port of "tag (src → dst)"
+SRC = re.compile(r"\((\d+)\s")
+
+
+def measure(fn, rounds: int) -> float:
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", default="xl", choices=list(SIZES))
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    connections, pac_hosts, forwards, _ = SIZES[args.size]
+    data = generate_config(connections, pac_hosts, forwards)
+    workspace = tempfile.mkdtemp(prefix="susops-bench-")
+    try:
+        ConfigHelper.config_path = os.path.join(workspace, "config.yaml")
+        write_config(ConfigHelper.config_path, data)
+        ConfigHelper.load()
+
+        model = ConfigModel.current()
+        rnd = random.Random(0)
+        ports = rnd.choices(list(model.local_forwards), k=args.lookups)
+        hosts = rnd.choices(list(model.pac_hosts), k=args.lookups)
+
+        def strings():
+            items = ConfigHelper.get_local_forwards()
+            for port in ports:
+                item = next(i for i in items if SRC.search(i).group(1) == str(port))
+                assert int(SRC.search(item).group(1)) == port
+
+        def typed():
+            model = ConfigModel.current()
+            for port in ports:
+                assert model.local_forwards[port].src_port == port
+
+        def host_scan():
+            domains = ConfigHelper.get_domains()
+            for host in hosts:
+                assert any(host_key(d) == host for d in domains)
+
+        def host_index():
+            model = ConfigModel.current()
+            for host in hosts:
+                assert model.pac_hosts[host]
+
+        print(f"{args.size}: {len(model.local_forwards)} local forwards, {len(model.pac_hosts)} hosts, "
+              f"{args.lookups} lookups, median of {args.rounds} rounds (ms)")
+        print(f"{'operation':<26}{'total':>10}{'per lookup':>12}")
+        build = measure(lambda: ConfigModel(data), args.rounds)
+        print(f"{'model build':<26}{build:>10.3f}{'':>12}")
+        for name, fn in (("forwards, strings + regex", strings), ("forwards, model", typed),
+                         ("hosts, list scan", host_scan), ("hosts, model", host_index)):
+            ms = measure(fn, args.rounds)
+            print(f"{name:<26}{ms:>10.3f}{ms / args.lookups * 1000:>10.2f}µs")
+    finally:
+        shutil.rmtree(workspace)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+FindProxyForURL lookup time of the linear PAC against the compiled one, as the host list grows, and the cost of
+publishing a host change incrementally against a full rebuild.
+
+    python benchmarks/bench_pac_compiler.py [--sizes 100,1000,10000] [--lookups 2000] [--changes 50]
+
+Uses the Python reference evaluators; if `node` is on PATH the generated JavaScript is timed as well.
+"""
+import argparse
+import ipaddress
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.pac import render_pac
+from core.pac_compiler import PacCompiler
+from core.pac_server import PacDocument
+
+# minimal PAC runtime for node
+JS_RUNTIME = r"""
+function shExpMatch(s, p) {
+  return new RegExp("^" + p.replace(/[.+^${}()|[\]\\]/g, "\\$&").replace(/\*/g, ".*").replace(/\?/g, ".") + "$").test(s);
+}
+function dnsDomainIs(host, domain) { return host.length >= domain.length && host.substring(host.length - domain.length) === domain; }
+function dnsResolve(host) { return null; }
+function isInNet(ip, base, mask) {
+  function n(a) { var o = a.split("."); return ((+o[0]) * 16777216) + ((+o[1]) << 16) + ((+o[2]) << 8) + (+o[3]); }
+  var m = n(mask); return (n(ip) & m) >>> 0 === (n(base) & m) >>> 0;
+}
+function isInNetEx(ip, cidr) { return false; }
+"""
+
+JS_HARNESS = r"""
+var hosts = JSON.parse(require("fs").readFileSync(process.argv[2], "utf8"));
+for (var w = 0; w < 200; w++) FindProxyForURL("", hosts[w % hosts.length]);
+var start = process.hrtime.bigint();
+for (var i = 0; i < hosts.length; i++) FindProxyForURL("", hosts[i]);
+console.log(Number(process.hrtime.bigint() - start) / hosts.length / 1000);
+"""
+
+
+def generate_config(size: int, connections: int = 5) -> dict:
+    rnd = random.Random(size)
+    conns = []
+    for c in range(connections):
+        hosts = []
+        for i in range(size // connections):
+            r = rnd.random()
+            if r < 0.7:
+                hosts.append(f"svc{i}.team{c}.corp.example")
+            elif r < 0.85:
+                hosts.append(f"*.zone{i}.corp.example")
+            else:
+                hosts.append(f"10.{c}.{rnd.randint(0, 255)}.0/{rnd.choice([24, 26, 28])}")
+        conns.append({"tag": f"c{c}", "socks_proxy_port": 1080 + c, "pac_hosts": hosts})
+    return {"connections": conns}
+
+
+def lookup_hosts(size: int, count: int) -> list:
+    rnd = random.Random(-size)
+    hosts = []
+    for _ in range(count):
+        r = rnd.random()
+        if r < 0.4:
+            hosts.append(f"svc{rnd.randint(0, size)}.team{rnd.randint(0, 4)}.corp.example")
+        elif r < 0.6:
+            hosts.append(f"a.zone{rnd.randint(0, size)}.corp.example")
+        elif r < 0.8:
+            hosts.append(f"10.{rnd.randint(0, 4)}.{rnd.randint(0, 255)}.{rnd.randint(1, 254)}")
+        else:
+            hosts.append(f"www.unrelated{rnd.randint(0, 999)}.com")
+    return hosts
+
+
+def linear_lookup(data: dict, host: str) -> str:
+    """Python model of the linear PAC: check every entry in order."""
+    for conn in data["connections"]:
+        for entry in conn["pac_hosts"]:
+            if "/" in entry:
+                try:
+                    if ipaddress.ip_address(host) in ipaddress.ip_network(entry, strict=False):
+                        return conn["socks_proxy_port"]
+                except ValueError:
+                    pass
+            elif entry.startswith("*."):
+                if host.endswith(entry[1:]):
+                    return conn["socks_proxy_port"]
+            elif host == entry or host.endswith("." + entry):
+                return conn["socks_proxy_port"]
+    return None
+
+
+def time_python(fn, hosts) -> float:
+    start = time.perf_counter()
+    for host in hosts:
+        fn(host)
+    return (time.perf_counter() - start) / len(hosts) * 1e6
+
+
+def time_node(pac: str, hosts: list) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        script, data = os.path.join(tmp, "pac.js"), os.path.join(tmp, "hosts.json")
+        with open(script, "w") as f:
+            f.write(JS_RUNTIME + pac + JS_HARNESS)
+        with open(data, "w") as f:
+            json.dump(hosts, f)
+        return float(subprocess.check_output(["node", script, data]).strip())
+
+
+def time_updates(data: dict, changes: int) -> tuple:
+    """ms per host add+remove: incremental patch + publish, against full rebuild + publish."""
+    compiler = PacCompiler(data)
+    tag = data["connections"][-1]["tag"]
+    start = time.perf_counter()
+    for i in range(changes):
+        compiler.add_hosts(tag, [f"new{i}.bench.example"])
+        PacDocument.build(compiler.render(), i)
+        compiler.remove_hosts(tag, [f"new{i}.bench.example"])
+        PacDocument.build(compiler.render(), i)
+    incremental = (time.perf_counter() - start) / changes / 2 * 1000
+
+    hosts = data["connections"][-1]["pac_hosts"]
+    start = time.perf_counter()
+    for i in range(changes):
+        hosts.append(f"new{i}.bench.example")
+        PacDocument.build(PacCompiler(data).render(), i)
+        hosts.pop()
+        PacDocument.build(PacCompiler(data).render(), i)
+    full = (time.perf_counter() - start) / changes / 2 * 1000
+    return incremental, full
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="100,1000,10000")
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--changes", type=int, default=50)
+    args = parser.parse_args()
+    node = shutil.which("node")
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    header = f"{'hosts':>7}{'py linear':>12}{'py compiled':>13}"
+    if node:
+        header += f"{'js linear':>12}{'js compiled':>13}"
+    print("µs per FindProxyForURL lookup")
+    print(header)
+    for size in sizes:
+        data = generate_config(size)
+        compiler = PacCompiler(data)
+        hosts = lookup_hosts(size, args.lookups)
+        linear_hosts = hosts[:max(50, args.lookups // max(1, size // 100))]
+
+        row = f"{size:>7}{time_python(lambda h: linear_lookup(data, h), linear_hosts):>12.2f}"
+        row += f"{time_python(compiler.find_proxy, hosts):>13.2f}"
+        if node:
+            row += f"{time_node(render_pac(data), hosts):>12.2f}{time_node(compiler.render(), hosts):>13.2f}"
+        print(row)
+
+    print("\nms per published host change (render, hash, gzip)")
+    print(f"{'hosts':>7}{'incremental':>13}{'full rebuild':>14}")
+    for size in sizes:
+        incremental, full = time_updates(generate_config(size), args.changes)
+        print(f"{size:>7}{incremental:>13.2f}{full:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
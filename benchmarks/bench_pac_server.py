@@ -0,0 +1,92 @@
+"""
+Load test of the in-process PAC server: keep-alive clients fetching the PAC, full and conditional.
+
+    python benchmarks/bench_pac_server.py [--clients 50] [--requests 200] [--hosts 2000]
+
+The server runs in a child process so client and server don't share a GIL.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def serve(hosts, port_queue, stop):
+    from core.pac import render_pac
+    from core.pac_server import PacServer
+
+    server = PacServer(0).start()
+    server.publish(render_pac({"connections": [
+        {"tag": "bench", "socks_proxy_port": 1080, "pac_hosts": [f"host{i}.example.com" for i in range(hosts)]},
+    ]}))
+    port_queue.put(server.port)
+    stop.wait()
+    server.stop()
+
+
+async def client(port, requests, etag, latencies):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    conditional = f"If-None-Match: {etag}\r\n" if etag else ""
+    request = f"GET /susops.pac HTTP/1.1\r\nHost: localhost\r\nAccept-Encoding: gzip\r\n{conditional}\r\n".encode()
+    for _ in range(requests):
+        start = time.perf_counter()
+        writer.write(request)
+        head = await reader.readuntil(b"\r\n\r\n")
+        length = 0
+        for line in head.split(b"\r\n"):
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":")[1])
+        if length and not head.startswith(b"HTTP/1.1 304"):
+            await reader.readexactly(length)
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+
+
+async def fetch_etag(port):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"HEAD /susops.pac HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n")
+    head = (await reader.read()).decode()
+    writer.close()
+    return next(line.split(": ", 1)[1] for line in head.split("\r\n") if line.startswith("ETag"))
+
+
+async def run(port, clients, requests, etag):
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, requests, etag, latencies) for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return len(latencies) / elapsed, latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.99)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--hosts", type=int, default=2000)
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    port_queue, stop = ctx.Queue(), ctx.Event()
+    process = ctx.Process(target=serve, args=(args.hosts, port_queue, stop), daemon=True)
+    process.start()
+    try:
+        port = port_queue.get(timeout=30)
+        etag = asyncio.run(fetch_etag(port))
+
+        print(f"{args.clients} keep-alive clients x {args.requests} requests, PAC with {args.hosts} hosts")
+        print(f"{'mode':<22}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+        for name, tag in (("200 (gzip body)", None), ("304 (If-None-Match)", etag)):
+            rps, p50, p99 = asyncio.run(run(port, args.clients, args.requests, tag))
+            print(f"{name:<22}{rps:>10.0f}{p50:>10.2f}{p99:>10.2f}")
+    finally:
+        stop.set()
+        process.join(5)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Panel-open latency: the config lists the panels need, one query per list against the shared ConfigModel snapshot.
+
+    python benchmarks/bench_panels.py [--size large] [--rounds 20] [--yq /path/to/yq]
+
+"queries" is what opening the four Remove panels and an Add panel used to cost: get_connection_tags, get_domains,
+get_local_forwards, get_remote_forwards, and get_connection_tags again for the Add panel's connection popup.
+"snapshot" is the same five opens on ConfigModel.current(). "cold" rewrites the config first, so the snapshot is
+rebuilt; "warm" is a reopen with the config unchanged. With mikefarah yq and --yq, also runs without PyYAML, where
+every query is a yq process and the snapshot is one `yq -o=json`.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import SIZES, generate_config, write_config
+from core.config import ConfigHelper
+from core.model import ConfigModel
+
+
+def queries():
+    titles = [ConfigHelper.get_connection_tags(), ConfigHelper.get_domains(), ConfigHelper.get_local_forwards(),
+              ConfigHelper.get_remote_forwards(), ConfigHelper.get_connection_tags()]
+    return sum(len(t) for t in titles)
+
+
+def snapshot():
+    # the titles GenericSelectPanel.update_items and GenericFieldPanel.run put into their popups
+    titles = [[str(c) for c in ConfigModel.current().connections.values()],
+              [str(h) for h in ConfigModel.current().hosts],
+              [str(f) for f in ConfigModel.current().local_forwards.values()],
+              [str(f) for f in ConfigModel.current().remote_forwards.values()],
+              list(ConfigModel.current().connections)]
+    return sum(len(t) for t in titles)
+
+
+def measure(fn, rounds: int, touch: bool) -> float:
+    samples = []
+    for _ in range(rounds):
+        if touch:
+            # a new file version, as after an edit
+            os.utime(ConfigHelper.config_path, ns=(time.time_ns(), time.time_ns()))
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def is_mikefarah(yq: str) -> bool:
+    try:
+        return "mikefarah" in subprocess.run([yq, "--version"], capture_output=True, text=True).stdout
+    except OSError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", default="large", choices=list(SIZES))
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--yq", default=ConfigHelper.yq_path, help="mikefarah yq for the run without PyYAML")
+    args = parser.parse_args()
+
+    connections, pac_hosts, forwards, _ = SIZES[args.size]
+    workspace = tempfile.mkdtemp(prefix="susops-bench-")
+    try:
+        ConfigHelper.config_path = os.path.join(workspace, "config.yaml")
+        ConfigHelper.yq_path = args.yq
+        write_config(ConfigHelper.config_path, generate_config(connections, pac_hosts, forwards))
+
+        backends = [("PyYAML", True)]
+        if is_mikefarah(args.yq):
+            backends.append(("yq", False))
+        print(f"{args.size}: {connections} connections, {pac_hosts} pac_hosts, {forwards} forwards, "
+              f"5 panel opens, median of {args.rounds} rounds (ms)")
+        print(f"{'backend':<10}{'':<8}{'queries':>10}{'snapshot':>10}")
+        for name, use_cache in backends:
+            ConfigHelper.use_cache = use_cache
+            rounds = args.rounds if use_cache else max(3, args.rounds // 4)
+            for label, touch in (("cold", True), ("warm", False)):
+                before = measure(queries, rounds, touch)
+                after = measure(snapshot, rounds, touch)
+                print(f"{name:<10}{label:<8}{before:>10.3f}{after:>10.3f}")
+        if len(backends) == 1:
+            print(f"\nmikefarah yq not found at {args.yq}, the run without PyYAML is skipped")
+    finally:
+        ConfigHelper.use_cache = True
+        shutil.rmtree(workspace)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Connection pools (core/pool.py): aggregate download throughput through one connection's SOCKS port as the pool
+grows from 1 to N ssh tunnels.
+
+    python benchmarks/bench_pool.py [--pools 1,2,4,8] [--streams 8] [--size 1] [--rate 2]
+
+benchmarks/bin/ssh stands in for ssh and sshd, capped at --rate MiB/s per tunnel, shared by every stream through
+it: what one ssh connection gets over a long path, where its TCP window and the channel window are the limit, not
+the link. The file server is an HTTP stand-in answering every GET with --size MiB. Each pool size runs one download
+alone and then --streams in parallel, through the supervisor's tunnels and the balancer like the app does.
+"""
+import argparse
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME = tempfile.mkdtemp(prefix="susops-pool-")
+os.environ["HOME"] = HOME
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from benchmarks.standins import HttpStandIn, write_workspace  # noqa: E402
+from core.config import ConfigHelper  # noqa: E402
+from core.supervisor import TunnelSupervisor, free_port  # noqa: E402
+
+SSH = os.path.join(BENCH_DIR, "bin", "ssh")
+MIB = 1024 * 1024
+
+
+def download(socks_port: int, target: tuple) -> int:
+    """GET / through the SOCKS port, returns the bytes received."""
+    with socket.create_connection(("127.0.0.1", socks_port), timeout=60) as sock:
+        sock.sendall(b"\x05\x01\x00")
+        if sock.recv(2) != b"\x05\x00":
+            raise ConnectionError("rejected")
+        sock.sendall(b"\x05\x01\x00\x01" + socket.inet_aton(target[0]) + target[1].to_bytes(2, "big"))
+        if sock.recv(10)[1:2] != b"\x00":
+            raise ConnectionError("connect failed")
+        sock.sendall(b"GET / HTTP/1.0\r\nHost: files\r\n\r\n")
+        received = 0
+        while chunk := sock.recv(256 * 1024):
+            received += len(chunk)
+        return received
+
+
+def throughput(socks_port: int, target: tuple, streams: int) -> float:
+    """MiB/s of `streams` parallel downloads."""
+    totals = [0] * streams
+
+    def run(i):
+        totals[i] = download(socks_port, target)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(streams)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(totals) / MIB / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pools", default="1,2,4,8", help="pool sizes, comma separated")
+    parser.add_argument("--streams", type=int, default=8, help="parallel downloads")
+    parser.add_argument("--size", type=float, default=1.0, help="MiB per download")
+    parser.add_argument("--rate", type=float, default=2.0, help="MiB/s cap of one tunnel")
+    args = parser.parse_args()
+    os.environ["SSH_STANDIN_RATE"] = str(args.rate * MIB)
+
+    files = HttpStandIn(b"\0" * int(args.size * MIB))
+    target = ("127.0.0.1", files.port)
+    rows = []
+    try:
+        for size in (int(n) for n in args.pools.split(",")):
+            port = free_port()
+            write_workspace(ConfigHelper.workspace_path, [
+                {"tag": "files", "ssh_host": "files.example.com", "socks_proxy_port": port, "pool": size}])
+            supervisor = TunnelSupervisor(ssh=SSH).start(ConfigHelper.load())
+            try:
+                output, returncode = supervisor.up(timeout=30)
+                if returncode:
+                    raise RuntimeError(output)
+                single = throughput(port, target, 1)
+                parallel = throughput(port, target, args.streams)
+                pool = supervisor.balancer.pools["files"] if supervisor.balancer else None
+                rows.append((size, single, parallel, pool.total if pool else "-", pool.failures if pool else "-"))
+            finally:
+                supervisor.stop()
+    finally:
+        files.close()
+
+    print(f"tunnels capped at {args.rate:g} MiB/s each, {args.size:g} MiB per download, "
+          f"{args.streams} parallel downloads")
+    print(f"{'pool':>6}{'1 stream MiB/s':>16}{f'{args.streams} streams MiB/s':>20}{'vs pool 1':>11}"
+          f"{'balanced':>10}{'failed':>8}")
+    for size, single, parallel, total, failures in rows:
+        print(f"{size:>6}{single:>16.1f}{parallel:>20.1f}{parallel / rows[0][2]:>10.1f}x{total:>10}{failures:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Per-poll wall and CPU time of the native StateProber against shelling out to `susops ps`.
+
+    python benchmarks/bench_prober.py [--connections 12] [--polls 50] [--cli bin/susops] [--handshake-ms 0,20]
+
+Without a working `--cli` the baseline is `sh -c 'exit 0'`, i.e. the bare cost of the
+shell-out before susops.sh and yq have even been loaded.
+--handshake-ms spreads SOCKS5 greeting delays over the tunnels, a poll should cost the slowest one, not the sum.
+"""
+import argparse
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.standins import Socks5StandInProcess, write_workspace
+from core.commands import susops_path
+from core.config import ConfigHelper
+from core.prober import StateProber
+
+
+def cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def measure(fn, polls):
+    cpu_start, wall_start = cpu_seconds(), time.perf_counter()
+    for _ in range(polls):
+        fn()
+    return (time.perf_counter() - wall_start) / polls * 1000, (cpu_seconds() - cpu_start) / polls * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connections", type=int, default=12)
+    parser.add_argument("--polls", type=int, default=50)
+    parser.add_argument("--cli", default=susops_path(), help="susops executable for the CLI baseline")
+    parser.add_argument("--handshake-ms", default="0", help="min,max greeting delay of the stand-in tunnels")
+    args = parser.parse_args()
+
+    low, high = (float(v) / 1000 for v in (args.handshake_ms.split(",") * 2)[:2])
+    delays = [low + (high - low) * i / max(args.connections - 1, 1) for i in range(args.connections)]
+    workspace = tempfile.mkdtemp(prefix="susops-bench-")
+    servers = Socks5StandInProcess(args.connections, greeting_delays=delays)
+    try:
+        connections = [{"tag": f"conn{i}", "socks_proxy_port": port} for i, port in enumerate(servers.ports)]
+        pids = {f"susops-ssh-conn{i}.pid": os.getpid() for i in range(args.connections)}
+        pids["susops-pac.pid"] = os.getpid()
+        write_workspace(workspace, connections, pids=pids)
+        ConfigHelper.config_path = os.path.join(workspace, "config.yaml")
+
+        prober = StateProber(workspace_path=workspace)
+        result = prober.probe()
+        assert result.returncode == 0, result.output
+
+        if os.access(args.cli, os.X_OK):
+            label, cli = "susops ps", lambda: subprocess.run(f"{args.cli} ps", shell=True, capture_output=True)
+        else:
+            label, cli = "sh -c (floor)", lambda: subprocess.run("exit 0", shell=True, capture_output=True)
+
+        print(f"{args.connections} connections, {args.polls} polls (ms per poll)")
+        print(f"{'probe':<16}{'wall':>10}{'cpu':>10}")
+        for name, fn in (("native", prober.probe), (label, cli)):
+            wall, cpu = measure(fn, args.polls)
+            print(f"{name:<16}{wall:>10.3f}{cpu:>10.3f}")
+        if high:
+            print(f"\nhandshakes take {low * 1000:g}-{high * 1000:g} ms, {sum(delays) * 1000:.0f} ms if probed one by one")
+    finally:
+        servers.close()
+        shutil.rmtree(workspace)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Overhead of the instrumented relay (core/relay.py) against connecting to the relayed port directly.
+
+    python benchmarks/bench_relay.py [--megabytes 512] [--connections 2000]
+
+The upstream stand-in and the relay each run in their own process, so neither competes with the client for the GIL.
+Measures bulk download/upload throughput and per-connection setup (connect + 1 byte round trip), then checks the
+relay's /metrics counters against what was sent.
+"""
+import argparse
+import multiprocessing
+import os
+import re
+import socket
+import statistics
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.relay import RelayServer
+
+BLOCK = 1 << 20
+
+
+def _upstream(ports, stop):
+    """b"D" + size: send size bytes; b"U": read to EOF, answer b"ok"; b"E": answer one byte."""
+    import threading
+
+    server = socket.socket()
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(("127.0.0.1", 0))
+    server.listen(1024)
+    ports.put(server.getsockname()[1])
+
+    def handle(conn):
+        with conn:
+            op = conn.recv(1)
+            if op == b"D":
+                size = int.from_bytes(conn.recv(8), "big")
+                block = b"x" * BLOCK
+                while size > 0:
+                    conn.sendall(block[:size])
+                    size -= BLOCK
+            elif op == b"U":
+                while conn.recv(BLOCK):
+                    pass
+                conn.sendall(b"ok")
+            elif op == b"E":
+                conn.sendall(b"e")
+
+    def accept():
+        while True:
+            conn, _ = server.accept()
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=accept, daemon=True).start()
+    stop.wait()
+
+
+def _relay(upstream_port, ports, stop):
+    server = RelayServer(metrics_port=0, offset=0).start()
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        listen_port = probe.getsockname()[1]
+    server.offset = listen_port - upstream_port
+    server.sync({"connections": [{"tag": "bench", "forwards": {"local": [{"tag": "bulk", "src_port": upstream_port}]}}]}
+                ).result(10)
+    ports.put((listen_port, server.metrics_port))
+    stop.wait()
+    server.stop()
+
+
+def download(port: int, size: int) -> float:
+    start = time.perf_counter()
+    with socket.create_connection(("127.0.0.1", port)) as sock:
+        sock.sendall(b"D" + size.to_bytes(8, "big"))
+        buffer = bytearray(BLOCK)
+        received = 0
+        while n := sock.recv_into(buffer):
+            received += n
+    assert received == size, (received, size)
+    return size / (time.perf_counter() - start) / 1e6
+
+
+def upload(port: int, size: int) -> float:
+    block = b"y" * BLOCK
+    start = time.perf_counter()
+    with socket.create_connection(("127.0.0.1", port)) as sock:
+        sock.sendall(b"U")
+        for _ in range(size // BLOCK):
+            sock.sendall(block)
+        sock.shutdown(socket.SHUT_WR)
+        assert sock.recv(2) == b"ok"
+    return size / (time.perf_counter() - start) / 1e6
+
+
+def setups(port: int, count: int) -> list:
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        with socket.create_connection(("127.0.0.1", port)) as sock:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.sendall(b"E")
+            assert sock.recv(1) == b"e"
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--megabytes", type=int, default=512)
+    parser.add_argument("--connections", type=int, default=2000)
+    args = parser.parse_args()
+    size = args.megabytes * BLOCK
+
+    ctx = multiprocessing.get_context("spawn")
+    stop = ctx.Event()
+    queue = ctx.Queue()
+    upstream = ctx.Process(target=_upstream, args=(queue, stop), daemon=True)
+    upstream.start()
+    upstream_port = queue.get(timeout=30)
+    relay = ctx.Process(target=_relay, args=(upstream_port, queue, stop), daemon=True)
+    relay.start()
+    relay_port, metrics_port = queue.get(timeout=30)
+
+    try:
+        rows = []
+        for name, port in (("direct", upstream_port), ("relay", relay_port)):
+            down = max(download(port, size) for _ in range(3))
+            up = max(upload(port, size) for _ in range(3))
+            setup = setups(port, args.connections)
+            rows.append((name, down, up, statistics.median(setup), sorted(setup)[int(len(setup) * 0.99) - 1]))
+
+        print(f"{args.megabytes} MB transfers (best of 3), {args.connections} connections")
+        print(f"{'path':<10}{'down MB/s':>12}{'up MB/s':>12}{'setup p50 µs':>15}{'setup p99 µs':>15}")
+        for name, down, up, p50, p99 in rows:
+            print(f"{name:<10}{down:>12.0f}{up:>12.0f}{p50:>15.0f}{p99:>15.0f}")
+        (_, d_down, d_up, d_p50, _), (_, r_down, r_up, r_p50, _) = rows
+        print(f"\nrelay overhead: download {1 - r_down / d_down:.0%}, upload {1 - r_up / d_up:.0%}, "
+              f"setup +{r_p50 - d_p50:.0f} µs")
+
+        metrics = urllib.request.urlopen(f"http://127.0.0.1:{metrics_port}/metrics", timeout=5).read().decode()
+        counted = {d: int(v) for d, v in re.findall(r'susops_relay_bytes_total\{[^}]*direction="(\w+)"[^}]*\} (\d+)',
+                                                     metrics)}
+        expected_in = 3 * (9 + 1 + size) + args.connections
+        expected_out = 3 * (size + 2) + args.connections
+        total = re.search(r"susops_relay_connections_total\{[^}]*\} (\d+)", metrics).group(1)
+        print(f"metrics: {total} connections, in {counted['in']} (expected {expected_in}), "
+              f"out {counted['out']} (expected {expected_out})")
+        if (counted["in"], counted["out"]) != (expected_in, expected_out):
+            sys.exit(1)
+    finally:
+        stop.set()
+        relay.join(5)
+        upstream.join(5)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Remove panel search (core/search.py): per-keystroke latency of the search index against the popup the panels used to
+fill, at 50k entries.
+
+    python benchmarks/bench_search.py [--entries 50000] [--typed 200] [--limit 50]
+
+The config has --entries pac_hosts spread over 200 connections, plus the fixture's local forwards (keyed by port, so
+fewer). "popup" is what opening the Remove Domain panel cost before: every host's title built and deduped for
+addItemsWithTitles_, before AppKit lays out a menu item per title. "linear" is the fallback the panel filters with
+until the index is built: a scan of every title, stopping at --limit matches. "typed" types every prefix of --typed
+sampled hosts and forwards, one search per keystroke, like the panel's search field does.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+HOME = tempfile.mkdtemp(prefix="susops-search-")
+os.environ["HOME"] = HOME
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import generate_config, write_config  # noqa: E402
+from core.config import ConfigHelper  # noqa: E402
+from core.model import ConfigModel  # noqa: E402
+from core.search import SearchIndex  # noqa: E402
+
+# a prefix, a word inside hosts, substrings, a port, an address, one with no match
+QUERIES = ["svc1", "team17", "corp", "c42.te", "zone9", "20105", "10.42.", "localhost", "nothing-matches-this"]
+
+
+def timed(fn, *args) -> tuple:
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def linear(items, query: str, limit: int) -> list:
+    found = []
+    for item in items:
+        if query in str(item).lower():
+            found.append(item)
+            if len(found) >= limit:
+                break
+    return found
+
+
+def keystrokes(index: SearchIndex, words: list, limit: int) -> list:
+    samples = []
+    for word in words:
+        for end in range(1, len(word) + 1):
+            samples.append(timed(index.search, word[:end], limit)[1])
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=50_000, help="pac_hosts")
+    parser.add_argument("--typed", type=int, default=200, help="sampled entries typed one keystroke at a time")
+    parser.add_argument("--limit", type=int, default=50, help="matches shown")
+    args = parser.parse_args()
+
+    write_config(ConfigHelper.config_path, generate_config(200, args.entries, args.entries))
+    model = ConfigModel.current()
+    hosts, forwards = model.hosts, tuple(model.local_forwards.values())
+    rnd = random.Random(0)
+
+    # what update_items did before: titles deduped for addItemsWithTitles_
+    _, popup = timed(lambda: list(dict.fromkeys(str(h) for h in hosts)))
+
+    print(f"{len(hosts)} hosts, {len(forwards)} local forwards, top {args.limit}\n")
+    print(f"{'':<34}{'hosts ms':>12}{'forwards ms':>14}")
+    indexes, builds = [], []
+    for items in (hosts, forwards):
+        index, build = timed(SearchIndex, items)
+        indexes.append(index)
+        builds.append(build)
+    print(f"{'popup titles (before, per open)':<34}{popup:>12.1f}{'':>14}")
+    print(f"{'index build (once per config)':<34}{builds[0]:>12.1f}{builds[1]:>14.1f}")
+
+    typed = []
+    for index, items in zip(indexes, (hosts, forwards)):
+        words = [str(getattr(item, "host", None) or item.tag) for item in rnd.sample(items, args.typed)]
+        typed.append(sorted(keystrokes(index, words, args.limit)))
+    for name, q in (("p50", 0.5), ("p99", 0.99), ("max", 1.0)):
+        row = [samples[min(int(len(samples) * q), len(samples) - 1)] for samples in typed]
+        print(f"{f'typed, {name} per keystroke':<34}{row[0]:>12.3f}{row[1]:>14.3f}")
+    print(f"{'typed, keystrokes':<34}{len(typed[0]):>12}{len(typed[1]):>14}\n")
+
+    print(f"{'query':<22}{'matches':>8}{'index ms':>11}{'linear ms':>11}")
+    for query in QUERIES:
+        items = forwards if query.isdigit() or query == "localhost" else hosts
+        index = indexes[0] if items is hosts else indexes[1]
+        matches = index.search(query, args.limit)
+        searched = statistics.median(timed(index.search, query, args.limit)[1] for _ in range(20))
+        scanned = statistics.median(timed(linear, items, query, args.limit)[1] for _ in range(3))
+        print(f"{query:<22}{len(matches):>8}{searched:>11.3f}{scanned:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+~/.ssh/config indexing: cold build and the cached lookup done when the Add Connection panel opens.
+
+    python benchmarks/bench_ssh_config.py [--files 40] [--hosts 20]
+
+Writes a generated config with `Include conf.d/*.conf` to a temporary directory.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import write_ssh_config
+from core.ssh_config import SshConfigCache
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--hosts", type=int, default=20, help="Host lines per included file")
+    parser.add_argument("--lookups", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_ssh_config(tmp, args.files * args.hosts, args.files)
+
+        cold = []
+        for _ in range(5):
+            cache = SshConfigCache(path)
+            start = time.perf_counter()
+            index = cache.get()
+            cold.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for _ in range(args.lookups):
+            cache.get().aliases
+        warm = (time.perf_counter() - start) / args.lookups
+
+        print(f"{len(index.hosts)} hosts in {len(index.stamps)} files/directories")
+        print(f"cold build     {min(cold) * 1000:8.2f} ms")
+        print(f"cached lookup  {warm * 1e6:8.2f} µs  (rebuilds: {cache.build_count})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+ssh operation latency with and without a ControlMaster, against a private sshd on localhost.
+
+    python benchmarks/bench_ssh_pool.py [--rtt-ms 80] [--ops 20]
+
+Starts sshd with throwaway host and client keys on a free port, behind a relay that delays every packet by half of
+--rtt-ms in each direction to stand in for a remote link. Needs the OpenSSH server binary (sshd), nothing is
+installed or changed outside a temporary directory.
+"""
+import argparse
+import asyncio
+import getpass
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.ssh_pool import ControlMaster, control_path
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_relay(target_port: int, delay: float) -> int:
+    """TCP relay on a background thread that forwards every chunk `delay` seconds late, in order."""
+    port = free_port()
+    ready = threading.Event()
+
+    async def pipe(reader, writer):
+        loop = asyncio.get_running_loop()
+        while data := await reader.read(65536):
+            loop.call_later(delay, writer.write, data)
+        loop.call_later(delay, writer.close)
+
+    async def handle(reader, writer):
+        upstream_reader, upstream_writer = await asyncio.open_connection("127.0.0.1", target_port)
+        await asyncio.gather(pipe(reader, upstream_writer), pipe(upstream_reader, writer), return_exceptions=True)
+
+    async def serve():
+        server = await asyncio.start_server(handle, "127.0.0.1", port)
+        ready.set()
+        async with server:
+            await server.serve_forever()
+
+    threading.Thread(target=asyncio.run, args=(serve(),), daemon=True).start()
+    ready.wait(5)
+    return port
+
+
+def start_sshd(sshd: str, tmp: str) -> tuple[subprocess.Popen, int, str]:
+    """sshd on a free port accepting a fresh client key. Returns the process, its port and the client key path."""
+    host_key, client_key = os.path.join(tmp, "host_key"), os.path.join(tmp, "client_key")
+    for key in (host_key, client_key):
+        subprocess.run(["ssh-keygen", "-q", "-t", "ed25519", "-N", "", "-f", key], check=True)
+    shutil.copy(client_key + ".pub", os.path.join(tmp, "authorized_keys"))
+
+    port = free_port()
+    config = os.path.join(tmp, "sshd_config")
+    with open(config, "w") as f:
+        f.write(f"Port {port}\nListenAddress 127.0.0.1\nHostKey {host_key}\nPidFile {tmp}/sshd.pid\n"
+                f"AuthorizedKeysFile {tmp}/authorized_keys\nStrictModes no\nUsePAM no\n"
+                f"PasswordAuthentication no\nKbdInteractiveAuthentication no\nMaxSessions 100\n")
+    process = subprocess.Popen([sshd, "-D", "-e", "-f", config], stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), 0.2).close()
+            return process, port, client_key
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("sshd did not start")
+
+
+def ssh_wrapper(tmp: str, port: int, client_key: str) -> str:
+    """An `ssh` that talks to the stand-in as host `bench`, like an entry in ~/.ssh/config would."""
+    config = os.path.join(tmp, "ssh_config")
+    with open(config, "w") as f:
+        f.write(f"Host bench\n  HostName 127.0.0.1\n  Port {port}\n  User {getpass.getuser()}\n"
+                f"  IdentityFile {client_key}\n  IdentitiesOnly yes\n  StrictHostKeyChecking no\n"
+                f"  UserKnownHostsFile /dev/null\n  LogLevel ERROR\n")
+    wrapper = os.path.join(tmp, "ssh")
+    with open(wrapper, "w") as f:
+        f.write(f'#!/bin/sh\nexec ssh -F "{config}" "$@"\n')
+    os.chmod(wrapper, 0o755)
+    return wrapper
+
+
+def timed(fn, ops: int) -> list:
+    samples = []
+    for _ in range(ops):
+        start = time.perf_counter()
+        output, returncode = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+        if returncode != 0:
+            raise RuntimeError(output)
+    return samples
+
+
+def report(name: str, samples: list):
+    p95 = sorted(samples)[int(len(samples) * 0.95) - 1]
+    print(f"{name:<28}{statistics.median(samples):>10.1f}{p95:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rtt-ms", type=float, default=80, help="simulated round trip time")
+    parser.add_argument("--ops", type=int, default=20)
+    parser.add_argument("--sshd", default=shutil.which("sshd") or "/usr/sbin/sshd")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.sshd):
+        print("sshd not found, install the OpenSSH server or pass --sshd")
+        sys.exit(2)
+
+    with tempfile.TemporaryDirectory(prefix="susops-ssh-") as tmp:
+        sshd, sshd_port, client_key = start_sshd(args.sshd, tmp)
+        try:
+            port = start_relay(sshd_port, args.rtt_ms / 2000)
+            ssh = ssh_wrapper(tmp, port, client_key)
+            master = ControlMaster("bench", "bench", control_path(os.path.join(tmp, "cm"), "bench"), ssh)
+
+            direct = timed(lambda: master.run("true"), args.ops)
+            start = time.perf_counter()
+            output, returncode = master.start()
+            if returncode != 0:
+                raise RuntimeError(output)
+            master_ms = (time.perf_counter() - start) * 1000
+            pooled = timed(lambda: master.run("true"), args.ops)
+            forward = timed(lambda: master.forward("-L", f"localhost:{free_port()}:localhost:22"), args.ops)
+            health = timed(lambda: (None, 0 if master.alive() else 1), args.ops)
+            master.stop()
+
+            print(f"rtt {args.rtt_ms:g} ms, {args.ops} ops each, ms")
+            print(f"{'operation':<28}{'median':>10}{'p95':>10}")
+            report("new session per op", direct)
+            report("over the master", pooled)
+            report("add forward (-O forward)", forward)
+            report("health check (socket)", health)
+            print(f"\nmaster start {master_ms:.1f} ms, "
+                  f"{statistics.median(direct) / statistics.median(pooled):.1f}x faster per operation")
+        finally:
+            sshd.terminate()
+            sshd.wait(5)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Chaos test for the tunnel supervisor (core/supervisor.py): kill, hang and cut off ssh children and measure how long
+each tunnel takes to answer SOCKS5 again. Compared with autossh when a runnable one is found.
+
+    python benchmarks/bench_supervisor.py [--tunnels 4] [--kills 12] [--hangs 4] [--outages 2] [--autossh PATH]
+
+benchmarks/bin/ssh stands in for ssh, so nothing leaves the machine. Scenarios:
+  kill    SIGKILL a child that has been up for a while, recovery from the kill
+  hang    SIGSTOP a child: still alive and accepting, but never answering. Only a health check notices
+  outage  the host is unreachable for --outage-seconds (ssh fails with 255) and the child is killed, recovery from
+          the end of the outage, i.e. what the backoff costs
+Recovery is probed from outside every 5 ms. The supervisor's own Reconnect records are printed too.
+"""
+import argparse
+import math
+import os
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME = tempfile.mkdtemp(prefix="susops-supervise-")
+os.environ["HOME"] = HOME
+os.environ["SSH_STANDIN_DOWN"] = os.path.join(HOME, "down")
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from benchmarks.standins import write_workspace  # noqa: E402
+from core.config import ConfigHelper, resource_path  # noqa: E402
+from core.prober import socks5_handshake  # noqa: E402
+from core.supervisor import STABLE_AFTER, TunnelSupervisor, free_port  # noqa: E402
+
+SSH = os.path.join(BENCH_DIR, "bin", "ssh")
+
+
+class SupervisorRunner:
+
+    def __init__(self, ports: list):
+        self.supervisor = TunnelSupervisor(ssh=SSH).start()
+        output, returncode = self.supervisor.up(timeout=30)
+        if returncode:
+            raise RuntimeError(output)
+
+    def child(self, i: int) -> int:
+        return self.supervisor.tunnels[f"conn{i}"].pid
+
+    def close(self):
+        self.supervisor.stop()
+
+
+class AutosshRunner:
+    """autossh -M 0 per tunnel, relying on ssh's exit like the CLI's tunnels."""
+
+    def __init__(self, ports: list, autossh: str):
+        env = {**os.environ, "AUTOSSH_PATH": SSH, "AUTOSSH_GATETIME": "0"}
+        self.processes = [subprocess.Popen([autossh, "-M", "0", "-N", "-D", f"127.0.0.1:{port}", f"conn{i}"], env=env,
+                                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                          for i, port in enumerate(ports)]
+        for port in ports:
+            wait_up(port, time.perf_counter(), 30)
+
+    def child(self, i: int) -> int:
+        # autossh's ssh child
+        out = subprocess.run(["pgrep", "-P", str(self.processes[i].pid)], capture_output=True, text=True).stdout
+        return int(out.split()[0]) if out.split() else None
+
+    def close(self):
+        for i, process in enumerate(self.processes):
+            child = self.child(i)
+            process.kill()
+            process.wait()
+            if child:
+                try:
+                    os.kill(child, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+
+def wait_up(port: int, since: float, timeout: float) -> float:
+    """Seconds from `since` until the port answers a SOCKS5 greeting, None after `timeout`."""
+    while time.perf_counter() - since < timeout:
+        if socks5_handshake([port], timeout=0.05)[port] is not None:
+            return time.perf_counter() - since
+        time.sleep(0.005)
+    return None
+
+
+def runnable(autossh: str) -> bool:
+    try:
+        return subprocess.run([autossh, "-V"], capture_output=True, timeout=5).returncode == 0
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+
+
+def chaos(runner, ports: list, args) -> dict:
+    results = {"kill": [], "hang": [], "outage": []}
+    up_since = [time.perf_counter()] * len(ports)
+
+    def settle(i):
+        # outages of a tunnel that was up long enough get the fast first retry
+        time.sleep(max(up_since[i] + STABLE_AFTER + 0.2 - time.perf_counter(), 0))
+
+    for n in range(args.kills):
+        i = n % len(ports)
+        settle(i)
+        start = time.perf_counter()
+        os.kill(runner.child(i), signal.SIGKILL)
+        results["kill"].append(wait_up(ports[i], start, args.timeout))
+        up_since[i] = time.perf_counter()
+
+    for n in range(args.hangs):
+        i = n % len(ports)
+        settle(i)
+        child = runner.child(i)
+        start = time.perf_counter()
+        os.kill(child, signal.SIGSTOP)
+        # the stopped child still accepts, wait for it to stop answering before probing for the replacement
+        time.sleep(0.1)
+        recovered = wait_up(ports[i], start, args.timeout)
+        results["hang"].append(recovered)
+        if recovered is None:
+            os.kill(child, signal.SIGKILL)
+            wait_up(ports[i], time.perf_counter(), args.timeout)
+            up_since[i] = time.perf_counter()
+            break
+        up_since[i] = time.perf_counter()
+
+    down = os.environ["SSH_STANDIN_DOWN"]
+    for n in range(args.outages):
+        i = n % len(ports)
+        settle(i)
+        open(down, "w").close()
+        os.kill(runner.child(i), signal.SIGKILL)
+        time.sleep(args.outage_seconds)
+        os.unlink(down)
+        results["outage"].append(wait_up(ports[i], time.perf_counter(), args.timeout))
+        up_since[i] = time.perf_counter()
+    return results
+
+
+def row(samples: list) -> str:
+    done = sorted(s * 1000 for s in samples if s is not None)
+    if not done:
+        return f"{'no recovery' if samples else '':>30}"
+    p95 = done[math.ceil(len(done) * 0.95) - 1]
+    missed = f" ({len(samples) - len(done)} missed)" if len(done) < len(samples) else ""
+    return f"{statistics.median(done):>10.0f}{p95:>10.0f}{done[-1]:>10.0f}{missed}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tunnels", type=int, default=4)
+    parser.add_argument("--kills", type=int, default=12)
+    parser.add_argument("--hangs", type=int, default=4)
+    parser.add_argument("--outages", type=int, default=2)
+    parser.add_argument("--outage-seconds", type=float, default=5.0)
+    parser.add_argument("--timeout", type=float, default=20.0, help="give up on a recovery after this many seconds")
+    parser.add_argument("--autossh", default=shutil.which("autossh") or resource_path(os.path.join("bin", "autossh")))
+    args = parser.parse_args()
+
+    ports = [free_port() for _ in range(args.tunnels)]
+    write_workspace(ConfigHelper.workspace_path,
+                    [{"tag": f"conn{i}", "ssh_host": f"conn{i}", "socks_proxy_port": port}
+                     for i, port in enumerate(ports)])
+    runs = [("supervisor", lambda: SupervisorRunner(ports))]
+    if runnable(args.autossh):
+        runs.append(("autossh", lambda: AutosshRunner(ports, args.autossh)))
+
+    results, reconnects = {}, []
+    for name, start in runs:
+        runner = start()
+        try:
+            results[name] = chaos(runner, ports, args)
+            if name == "supervisor":
+                reconnects = runner.supervisor.reconnects()
+        finally:
+            runner.close()
+
+    print(f"{args.tunnels} tunnels, ms until the SOCKS port answers again")
+    print(f"{'scenario':<10}{'':<12}{'p50':>10}{'p95':>10}{'max':>10}")
+    for scenario in ("kill", "hang", "outage"):
+        for name in results:
+            print(f"{scenario:<10}{name:<12}{row(results[name][scenario])}")
+    if len(runs) == 1:
+        print(f"\nno runnable autossh at {args.autossh}, the comparison is skipped")
+
+    print(f"\nsupervisor Reconnect records: {len(reconnects)}")
+    by_reason = {}
+    for r in reconnects:
+        by_reason.setdefault(r.reason.split(" by ")[0], []).append(r)
+    for reason, records in by_reason.items():
+        durations = [r.duration * 1000 for r in records if r.duration is not None]
+        print(f"  {reason:<14}{len(records):>4} events, p50 {statistics.median(durations):.0f} ms detection to up, "
+              f"max {max(r.attempts for r in records)} attempts")
+    shutil.rmtree(HOME, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
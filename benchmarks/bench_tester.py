@@ -0,0 +1,63 @@
+"""
+Wall time of the concurrent `Test All` engine against probing the same hosts one after another.
+
+    python benchmarks/bench_tester.py [--hosts 500] [--delay 0.05] [--concurrency 100]
+
+Every SOCKS CONNECT is delayed by `--delay` seconds (the bastion round trip) and lands on a local HTTP stand-in.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.standins import HttpStandIn, Socks5StandInProcess
+from core import tester
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hosts", type=int, default=500)
+    parser.add_argument("--delay", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--sequential-sample", type=int, default=20,
+                        help="hosts probed one by one, extrapolated to --hosts")
+    args = parser.parse_args()
+
+    http = HttpStandIn()
+    socks = Socks5StandInProcess(1, connect_delay=args.delay, upstream=("127.0.0.1", http.port))
+    try:
+        data = {"connections": [{
+            "tag": "bench",
+            "socks_proxy_port": socks.ports[0],
+            "pac_hosts": [f"host{i}.internal.example" for i in range(args.hosts)],
+        }]}
+        targets, _ = tester.collect_targets(data, port=80)
+
+        start = time.perf_counter()
+        results = asyncio.run(tester.run_tests(targets, args.concurrency, timeout=10, http=True))
+        concurrent_s = time.perf_counter() - start
+        failed = [r for r in results if not r.ok]
+        assert not failed, failed[:3]
+
+        sample = targets[:args.sequential_sample]
+        start = time.perf_counter()
+        asyncio.run(tester.run_tests(sample, 1, timeout=10, http=True))
+        sequential_s = (time.perf_counter() - start) / len(sample) * len(targets)
+
+        slowest = max(r.first_byte_ms for r in results)
+        print(f"{args.hosts} hosts, {args.delay * 1000:.0f} ms per CONNECT, concurrency {args.concurrency}")
+        print(f"concurrent:           {concurrent_s:8.3f} s (slowest probe {slowest:.0f} ms)")
+        print(f"sequential (extrap.): {sequential_s:8.3f} s")
+        print(f"speedup:              {sequential_s / concurrent_s:8.1f}x")
+        print()
+        print(tester.format_table(tester.sort_results(results), limit=5))
+    finally:
+        socks.close()
+        http.close()
+
+
+if __name__ == "__main__":
+    main()
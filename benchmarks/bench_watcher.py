@@ -0,0 +1,102 @@
+"""
+Config watcher (core/watcher.py): time from a write to the change event, burst coalescing and idle cost per backend.
+
+    python benchmarks/bench_watcher.py [--writes 50] [--burst 20] [--backends inotify,kqueue,polling]
+
+Writes go to a scratch config.yaml: half replace it by renaming a new file over it, like ConfigHelper.commit() and
+most editors, half append in place. Backends that aren't available on this platform are skipped.
+"""
+import argparse
+import os
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.watcher import BACKENDS, FileWatcher
+
+
+def write(path: str, i: int):
+    if i % 2:
+        with open(path, "a") as f:
+            f.write(f"# write {i}\n")
+        return
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(f"pac_server_port: {1081 + i}\n")
+    os.replace(tmp, path)
+
+
+def run(backend: str, path: str, args) -> tuple:
+    changes = []
+    seen = threading.Condition()
+
+    def changed(change):
+        with seen:
+            changes.append(time.perf_counter())
+            seen.notify_all()
+
+    watcher = FileWatcher([path], changed, backend=backend).start()
+    try:
+        latencies = []
+        for i in range(args.writes):
+            expected = len(changes) + 1
+            start = time.perf_counter()
+            write(path, i)
+            with seen:
+                if not seen.wait_for(lambda: len(changes) >= expected, timeout=5):
+                    raise RuntimeError(f"{backend}: no event for write {i}")
+            latencies.append((changes[-1] - start) * 1000)
+
+        # back-to-back writes within the debounce window should come out as one event
+        before = len(changes)
+        for i in range(args.burst):
+            write(path, i)
+            time.sleep(0.002)
+        time.sleep(watcher.debounce + (2.0 if backend == "polling" else 0.3))
+        burst_events = len(changes) - before
+
+        cpu_start = resource.getrusage(resource.RUSAGE_SELF)
+        time.sleep(args.idle)
+        cpu_end = resource.getrusage(resource.RUSAGE_SELF)
+        idle_cpu = (cpu_end.ru_utime + cpu_end.ru_stime - cpu_start.ru_utime - cpu_start.ru_stime) / args.idle
+    finally:
+        watcher.stop()
+    return latencies, burst_events, idle_cpu
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writes", type=int, default=50)
+    parser.add_argument("--burst", type=int, default=20)
+    parser.add_argument("--idle", type=float, default=3.0, help="seconds to measure the idle CPU over")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    args = parser.parse_args()
+
+    workspace = tempfile.mkdtemp(prefix="susops-bench-")
+    path = os.path.join(workspace, "config.yaml")
+    with open(path, "w") as f:
+        f.write("pac_server_port: 1081\n")
+    try:
+        print(f"{args.writes} writes, bursts of {args.burst}, idle over {args.idle:g} s")
+        print(f"{'backend':<10}{'p50 ms':>10}{'p95 ms':>10}{'burst events':>14}{'idle cpu':>10}")
+        for backend in args.backends.split(","):
+            try:
+                latencies, burst_events, idle_cpu = run(backend, path, args)
+            except (OSError, AttributeError) as e:
+                print(f"{backend:<10}unavailable: {e}")
+                continue
+            p95 = sorted(latencies)[int(len(latencies) * 0.95) - 1]
+            print(f"{backend:<10}{statistics.median(latencies):>10.1f}{p95:>10.1f}{burst_events:>14}"
+                  f"{idle_cpu:>10.2%}")
+    finally:
+        shutil.rmtree(workspace)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Synthetic configs for benchmarks: large susops configs and ~/.ssh/config trees."""
+import os
+import random
+
+import yaml
+
+# connections, pac_hosts, forwards (local + remote), ssh hosts
+SIZES = {
+    "small": (10, 1_000, 100, 50),
+    "medium": (50, 5_000, 500, 200),
+    "large": (200, 20_000, 2_000, 800),
+    "xl": (500, 50_000, 5_000, 2_000),
+}
+
+
+def generate_config(connections: int, pac_hosts: int, forwards: int, seed: int = 0) -> dict:
+    """A config.yaml document with pac_hosts and forwards spread over the connections."""
+    rnd = random.Random(seed)
+    conns = []
+    for c in range(connections):
+        hosts = []
+        for i in range(pac_hosts // connections):
+            r = rnd.random()
+            if r < 0.7:
+                hosts.append(f"svc{i}.team{c}.corp.example")
+            elif r < 0.85:
+                hosts.append(f"*.zone{i}.team{c}.corp.example")
+            elif r < 0.95:
+                hosts.append(f"10.{c % 256}.{rnd.randint(0, 255)}.{rnd.randint(1, 254)}")
+            else:
+                hosts.append(f"10.{c % 256}.{rnd.randint(0, 255)}.0/{rnd.choice([24, 26, 28])}")
+
+        per_connection = forwards // connections
+        local = [{"tag": f"l{c}-{i}", "src_port": 20000 + c * 50 + i, "dst_port": 8000 + i,
+                  "src_addr": "localhost", "dst_addr": "localhost"} for i in range(per_connection - per_connection // 4)]
+        remote = [{"tag": f"r{c}-{i}", "src_port": 40000 + c * 50 + i, "dst_port": 3000 + i,
+                   "src_addr": "localhost", "dst_addr": "localhost"} for i in range(per_connection // 4)]
+        conns.append({
+            "tag": f"conn{c}",
+            "ssh_host": f"bastion{c}",
+            "socks_proxy_port": 10000 + c,
+            "forwards": {"local": local, "remote": remote},
+            "pac_hosts": hosts,
+        })
+    return {
+        "pac_server_port": 1081,
+        "susops_app": {"logo_style": "COLORED_GLASSES", "stop_on_quit": "1", "ephemeral_ports": "1"},
+        "connections": conns,
+    }
+
+
+def write_config(path: str, data: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        yaml.dump(data, f, sort_keys=False, Dumper=getattr(yaml, "CSafeDumper", yaml.SafeDumper))
+
+
+def write_ssh_config(directory: str, hosts: int, files: int = 20) -> str:
+    """~/.ssh/config with `Include conf.d/*.conf`, the hosts spread over `files` included files."""
+    os.makedirs(os.path.join(directory, "conf.d"), exist_ok=True)
+    path = os.path.join(directory, "config")
+    with open(path, "w") as f:
+        f.write("Include conf.d/*.conf\n\nHost bastion\n  HostName bastion.example.com\n\n"
+                "Match originalhost *-db user *\n  ProxyJump bastion\n\nHost *\n  User me\n  ServerAliveInterval 30\n")
+    for i in range(files):
+        with open(os.path.join(directory, "conf.d", f"{i:03}.conf"), "w") as f:
+            for j in range(i, hosts, files):
+                f.write(f"Host h{j} h{j}-db\n  HostName 10.{j // 250 % 256}.{j % 250}.1\n  Port {2000 + j % 100}\n"
+                        f"  IdentityFile ~/.ssh/id_ed25519\n\n")
+    return path
@@ -0,0 +1,179 @@
+"""Local stand-ins for the processes SusOps talks to, so benchmarks run without ssh or a remote host."""
+import multiprocessing
+import os
+import socket
+import struct
+import threading
+import time
+
+import yaml
+
+
+class Socks5StandIn:
+    """
+    Minimal threaded SOCKS5 server (no auth, CONNECT only) on 127.0.0.1.
+    `connect_delay` simulates the extra round trip through a remote bastion, `greeting_delay` a slow or loaded tunnel,
+    `rate` (bytes/s shared by all streams) the throughput cap of one ssh connection over a long path.
+    """
+
+    def __init__(self, port: int = 0, connect_delay: float = 0.0, upstream: tuple = None, greeting_delay: float = 0.0,
+                 rate: float = 0.0):
+        self.connect_delay = connect_delay
+        self.greeting_delay = greeting_delay
+        self.rate = rate
+        self._rate_lock = threading.Lock()
+        self._rate_free = 0.0  # monotonic time the shared link is free again
+        # send every CONNECT here instead of resolving the requested host
+        self.upstream = upstream
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(("127.0.0.1", port))
+        self._sock.listen(512)
+        self.port = self._sock.getsockname()[1]
+        self._closed = threading.Event()
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def _accept_loop(self):
+        while not self._closed.is_set():
+            try:
+                client, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(client,), daemon=True).start()
+
+    @staticmethod
+    def _recv_exact(sock, n):
+        data = b""
+        while len(data) < n:
+            chunk = sock.recv(n - len(data))
+            if not chunk:
+                raise ConnectionError("closed")
+            data += chunk
+        return data
+
+    def _handle(self, client):
+        upstream = None
+        try:
+            _, n_methods = self._recv_exact(client, 2)
+            self._recv_exact(client, n_methods)
+            if self.greeting_delay:
+                self._closed.wait(self.greeting_delay)
+            client.sendall(b"\x05\x00")
+
+            _, cmd, _, atyp = self._recv_exact(client, 4)
+            if atyp == 1:
+                host = socket.inet_ntoa(self._recv_exact(client, 4))
+            elif atyp == 3:
+                host = self._recv_exact(client, self._recv_exact(client, 1)[0]).decode()
+            else:
+                host = socket.inet_ntop(socket.AF_INET6, self._recv_exact(client, 16))
+            port = struct.unpack("!H", self._recv_exact(client, 2))[0]
+
+            if self.connect_delay:
+                self._closed.wait(self.connect_delay)
+            try:
+                upstream = socket.create_connection(self.upstream or (host, port), timeout=5)
+            except OSError:
+                client.sendall(b"\x05\x04\x00\x01" + b"\x00" * 6)
+                return
+            client.sendall(b"\x05\x00\x00\x01" + b"\x00" * 6)
+            self._pipe(client, upstream)
+        except (OSError, ConnectionError, ValueError):
+            pass
+        finally:
+            client.close()
+            if upstream:
+                upstream.close()
+
+    def _throttle(self, size: int):
+        with self._rate_lock:
+            now = time.monotonic()
+            self._rate_free = max(self._rate_free, now) + size / self.rate
+            wait = self._rate_free - now
+        time.sleep(wait)
+
+    def _pipe(self, a, b):
+        def forward(src, dst):
+            try:
+                while chunk := src.recv(65536):
+                    if self.rate:
+                        self._throttle(len(chunk))
+                    dst.sendall(chunk)
+            except OSError:
+                pass
+            finally:
+                try:
+                    dst.shutdown(socket.SHUT_WR)
+                except OSError:
+                    pass
+
+        t = threading.Thread(target=forward, args=(b, a), daemon=True)
+        t.start()
+        forward(a, b)
+        t.join()
+
+    def close(self):
+        self._closed.set()
+        self._sock.close()
+
+
+def _serve_socks5(count, connect_delay, upstream, ports, stop, greeting_delays=None):
+    servers = [Socks5StandIn(connect_delay=connect_delay, upstream=upstream,
+                             greeting_delay=greeting_delays[i] if greeting_delays else 0.0) for i in range(count)]
+    ports.put([s.port for s in servers])
+    stop.wait()
+
+
+class Socks5StandInProcess:
+    """`count` SOCKS5 stand-ins in a child process, so their CPU time doesn't count against the caller."""
+
+    def __init__(self, count: int, connect_delay: float = 0.0, upstream: tuple = None, greeting_delays: list = None):
+        ctx = multiprocessing.get_context("spawn")
+        ports, self._stop = ctx.Queue(), ctx.Event()
+        self._process = ctx.Process(target=_serve_socks5, daemon=True,
+                                    args=(count, connect_delay, upstream, ports, self._stop, greeting_delays))
+        self._process.start()
+        self.ports = ports.get(timeout=30)
+
+    def close(self):
+        self._stop.set()
+        self._process.join(5)
+
+
+class HttpStandIn:
+    """Threaded HTTP server on 127.0.0.1 answering every request with a small 200."""
+
+    def __init__(self, body: bytes = b"ok"):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+
+            def do_GET(self):
+                self.do_HEAD()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def write_workspace(workspace: str, connections: list, pac_server_port: int = 1081, pids: dict = None):
+    """Write config.yaml plus pidfiles laid out like the CLI does."""
+    os.makedirs(os.path.join(workspace, "pids"), exist_ok=True)
+    with open(os.path.join(workspace, "config.yaml"), "w") as f:
+        yaml.safe_dump({"pac_server_port": pac_server_port, "connections": connections}, f, sort_keys=False)
+    for name, pid in (pids or {}).items():
+        with open(os.path.join(workspace, "pids", name), "w") as f:
+            f.write(str(pid))
@@ -0,0 +1,2 @@
+"""Benchmark stub of PyObjC's Foundation, see benchmarks/stubs/_objc_stub.py."""
+from _objc_stub import module_getattr as __getattr__  # noqa: F401
@@ -0,0 +1,10 @@
+"""Benchmark stub of PyObjCTools.AppHelper, backed by the event loop in the rumps stub."""
+import rumps
+
+
+def callAfter(fn, *args, **kwargs):
+    rumps.loop.call_later(0, fn, *args, **kwargs)
+
+
+def callLater(delay, fn, *args, **kwargs):
+    rumps.loop.call_later(delay, fn, *args, **kwargs)
@@ -0,0 +1,8 @@
+"""Benchmark stub of PyObjC's objc module."""
+from _objc_stub import module_getattr as __getattr__  # noqa: F401
+
+super = super
+
+
+def selector(fn, selector=None, signature=None):
+    return fn
@@ -0,0 +1,166 @@
+"""
+Benchmark stub of rumps: menus are plain objects and App.run() is a small event loop, so app.py runs headless.
+Dialogs return "OK" immediately.
+"""
+import heapq
+import itertools
+import threading
+import time
+
+
+class EventLoop:
+    """Main-thread queue for AppHelper.callAfter/callLater and rumps.Timer."""
+
+    def __init__(self):
+        self._queue = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self.running = False
+
+    def call_later(self, delay, fn, *args, **kwargs):
+        with self._lock:
+            heapq.heappush(self._queue, (time.monotonic() + delay, next(self._counter), fn, args, kwargs))
+        self._wakeup.set()
+
+    def run_pending(self) -> int:
+        """Run every callback that is due, returns how many ran."""
+        ran = 0
+        while True:
+            with self._lock:
+                if not self._queue or self._queue[0][0] > time.monotonic():
+                    return ran
+                _, _, fn, args, kwargs = heapq.heappop(self._queue)
+            fn(*args, **kwargs)
+            ran += 1
+
+    def run(self):
+        self.running = True
+        while self.running:
+            self.run_pending()
+            with self._lock:
+                timeout = max(0.0, self._queue[0][0] - time.monotonic()) if self._queue else 0.1
+            self._wakeup.wait(min(timeout, 0.1))
+            self._wakeup.clear()
+
+    def stop(self):
+        self.running = False
+        self._wakeup.set()
+
+
+loop = EventLoop()
+
+
+class MenuItem:
+    def __init__(self, title, callback=None, key=None, icon=None, dimensions=None, template=None):
+        self.title = str(title)
+        self.callback = callback
+        self.key = key
+        self.icon = icon
+        self.state = 0
+        self._items = {}
+
+    def set_callback(self, callback, key=None):
+        self.callback = callback
+
+    def __getitem__(self, title):
+        return self._items[title]
+
+    def __contains__(self, title):
+        return title in self._items
+
+    def keys(self):
+        return self._items.keys()
+
+    def values(self):
+        return self._items.values()
+
+    def add(self, item):
+        if item is not separator:
+            self._items[item.title] = item
+
+    def update(self, items):
+        for item in items:
+            if item is None:
+                continue
+            if isinstance(item, (tuple, list)):
+                parent, children = item
+                parent = parent if isinstance(parent, MenuItem) else MenuItem(parent)
+                parent.update(children)
+                item = parent
+            elif not isinstance(item, MenuItem):
+                item = MenuItem(item)
+            self.add(item)
+
+    def clear(self):
+        self._items.clear()
+
+
+separator = object()
+
+
+class Timer:
+    def __init__(self, callback, interval):
+        self.callback = callback
+        self.interval = interval
+        self._generation = 0
+
+    def _fire(self, generation):
+        if generation == self._generation:
+            self.callback(self)
+            loop.call_later(self.interval, self._fire, generation)
+
+    def start(self):
+        self._generation += 1
+        loop.call_later(self.interval, self._fire, self._generation)
+
+    def stop(self):
+        self._generation += 1
+
+
+class App:
+    def __init__(self, name, title=None, icon=None, template=None, menu=None, quit_button="Quit"):
+        self.name = name
+        self.title = title
+        self.icon = icon
+        self._menu = MenuItem(name)
+        if menu:
+            self.menu = menu
+
+    @property
+    def menu(self):
+        return self._menu
+
+    @menu.setter
+    def menu(self, items):
+        self._menu.update(items)
+
+    def run(self, **options):
+        loop.run()
+
+
+class Response:
+    clicked = 1
+    text = ""
+
+
+class Window:
+    def __init__(self, message="", title="", default_text="", ok=None, cancel=None, dimensions=(320, 160)):
+        self.default_text = default_text
+
+    def run(self):
+        response = Response()
+        response.text = self.default_text
+        return response
+
+
+def alert(title=None, message="", ok=None, cancel=None, other=None, icon_path=None):
+    return 1
+
+
+def notification(title, subtitle, message, data=None, sound=True):
+    pass
+
+
+def quit_application(sender=None):
+    loop.stop()
@@ -0,0 +1,185 @@
+"""
+Benchmark suite that runs on plain Linux: app.py is imported against the stub rumps/AppKit/Cocoa modules in
+benchmarks/stubs, `susops` is the stand-in in benchmarks/bin, and configs come from benchmarks/fixtures.py.
+
+    python benchmarks/suite.py [--sizes small,medium,large] [--rounds 5] [--latency 0.05]
+                               [--baseline benchmarks/baseline.json] [--save-baseline]
+                               [--tolerance 0.5] [--min-delta-ms 0.5]
+
+Prints the median ms of every operation per config size and how it grows from the smallest to the largest size.
+Exits with 1 when an operation is slower than the stored baseline by more than the tolerance.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+# everything below runs in a scratch HOME, ~/.susops and ~/.ssh are never touched
+HOME = tempfile.mkdtemp(prefix="susops-suite-")
+os.environ["HOME"] = HOME
+os.environ["SUSOPS_BIN"] = os.path.join(BENCH_DIR, "bin", "susops")
+sys.path[:0] = [os.path.join(BENCH_DIR, "stubs"), ROOT]
+
+import app  # noqa: E402
+from benchmarks.fixtures import SIZES, generate_config, write_config, write_ssh_config  # noqa: E402
+from core.commands import run_susops_command  # noqa: E402
+from core.config import ConfigHelper  # noqa: E402
+from core.host_import import plan_import  # noqa: E402
+from core.search import SearchIndex  # noqa: E402
+from core.model import ConfigModel  # noqa: E402
+from core.pac_compiler import PacCompiler  # noqa: E402
+from core.ssh_config import SshConfigCache  # noqa: E402
+from core.state import ProcessState  # noqa: E402
+from core.supervisor import tunnel_specs  # noqa: E402
+
+
+class Context:
+    """One config size written to the scratch HOME, plus an app instance on top of it."""
+
+    def __init__(self, size: str):
+        connections, pac_hosts, forwards, ssh_hosts = SIZES[size]
+        self.data = generate_config(connections, pac_hosts, forwards)
+        write_config(ConfigHelper.config_path, self.data)
+        ConfigHelper.cache().invalidate()
+        ssh_dir = os.path.join(HOME, ".ssh", size)
+        self.ssh_path = write_ssh_config(ssh_dir, ssh_hosts)
+        self.ssh_cache = SshConfigCache(self.ssh_path)
+        self.compiler = PacCompiler(self.data)
+        self.app = app.SusOpsApp()
+        self.app.controller.reload_config()
+
+    def close(self):
+        self.app.executor.shutdown()
+
+
+def check_state(ctx: Context, probe: str):
+    ctx.app.config["state_probe"] = probe
+    # from INITIAL, so every round takes the full menu update path
+    ctx.app.controller.process_state = ProcessState.INITIAL
+    ctx.app.controller.check_state()
+
+
+def startup(ctx: Context):
+    instance = app.SusOpsApp()
+    instance.controller.startup_loaded(instance.controller.load_startup())
+    instance.controller.shutdown(stop_proxy=False)
+
+
+def pac_update(ctx: Context):
+    tag = ctx.data["connections"][0]["tag"]
+    ctx.compiler.add_hosts(tag, ["bench.suite.example"])
+    ctx.compiler.render()
+    ctx.compiler.remove_hosts(tag, ["bench.suite.example"])
+    ctx.compiler.render()
+
+
+def config_commit(ctx: Context):
+    with ConfigHelper.transaction() as tx:
+        tx.set(".susops_app.logo_style", "COLORED_GLASSES")
+
+
+OPERATIONS = [
+    ("config.parse", lambda ctx: (ConfigHelper.cache().invalidate(), ConfigHelper.load())),
+    ("config.read_config", lambda ctx: ConfigHelper.read_config(".pac_server_port", "1081")),
+    ("config.connection_tags", lambda ctx: ConfigHelper.get_connection_tags()),
+    ("config.domains", lambda ctx: ConfigHelper.get_domains()),
+    ("config.local_forwards", lambda ctx: ConfigHelper.get_local_forwards()),
+    ("config.commit", config_commit),
+    ("model.build", lambda ctx: ConfigModel(ctx.data)),
+    ("model.current", lambda ctx: ConfigModel.current()),
+    ("app.load_config", lambda ctx: ctx.app.controller.load_config()),
+    ("app.startup", startup),
+    ("app.check_state.native", lambda ctx: check_state(ctx, "native")),
+    ("app.check_state.cli", lambda ctx: check_state(ctx, "cli")),
+    ("run_susops", lambda ctx: run_susops_command("ps")),
+    ("ssh_config.build", lambda ctx: (ctx.ssh_cache.invalidate(), ctx.ssh_cache.get())),
+    ("ssh_config.lookup", lambda ctx: ctx.ssh_cache.get().aliases),
+    ("pac.compile", lambda ctx: PacCompiler(ctx.data).render()),
+    ("pac.update", pac_update),
+    ("supervisor.specs", lambda ctx: tunnel_specs(ctx.data)),
+    ("host_import.plan", lambda ctx: plan_import([], [h for c in ctx.data["connections"] for h in c["pac_hosts"]])),
+    ("search.index", lambda ctx: SearchIndex(ConfigModel.current().hosts)),
+]
+
+
+def measure(fn, ctx: Context, rounds: int) -> float:
+    fn(ctx)  # warm-up, fills caches the operation is expected to hit
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn(ctx)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def compare(results: dict, baseline: dict, tolerance: float, min_delta: float) -> list:
+    regressions = []
+    for name, by_size in results.items():
+        for size, ms in by_size.items():
+            base = baseline.get(name, {}).get(size)
+            if base is not None and ms > base * (1 + tolerance) and ms - base > min_delta:
+                regressions.append(f"{name}@{size}: {ms:.3f} ms, baseline {base:.3f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="small,medium,large", help=f"any of {','.join(SIZES)}")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds the stand-in susops takes per call")
+    parser.add_argument("--only", default="", help="comma-separated operation name prefixes")
+    parser.add_argument("--baseline", default=os.path.join(BENCH_DIR, "baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown against the baseline")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    os.environ["SUSOPS_STANDIN_LATENCY"] = str(args.latency)
+    os.environ["SUSOPS_STANDIN_STATE"] = "stopped"
+    sizes = args.sizes.split(",")
+    operations = [(name, fn) for name, fn in OPERATIONS
+                  if not args.only or any(name.startswith(p) for p in args.only.split(","))]
+
+    results = {name: {} for name, _ in operations}
+    for size in sizes:
+        ctx = Context(size)
+        try:
+            for name, fn in operations:
+                results[name][size] = measure(fn, ctx, args.rounds)
+        finally:
+            ctx.close()
+
+    first, last = sizes[0], sizes[-1]
+    print(f"median ms of {args.rounds} rounds; sizes = (connections, pac_hosts, forwards, ssh hosts)")
+    for size in sizes:
+        print(f"  {size:<8}{SIZES[size]}")
+    print(f"\n{'operation':<26}" + "".join(f"{size:>11}" for size in sizes) + f"{'growth':>9}")
+    for name, by_size in results.items():
+        growth = by_size[last] / by_size[first] if by_size[first] else float("nan")
+        print(f"{name:<26}" + "".join(f"{by_size[size]:>11.3f}" for size in sizes) + f"{growth:>8.1f}x")
+    scale = SIZES[last][1] / SIZES[first][1]
+    print(f"\nconfig grows {scale:.0f}x from {first} to {last}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({name: {s: round(ms, 4) for s, ms in by_size.items()} for name, by_size in results.items()},
+                      f, indent=2)
+        print(f"baseline saved to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        return
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance, args.min_delta_ms)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Local event bus: newline-delimited JSON over a Unix socket, ~/.susops/events.sock.
+
+Publishers connect and write one JSON object per line, with at least a "type":
+
+    printf '{"type":"tunnel_down","tag":"work"}\\n' | nc -U ~/.susops/events.sock
+
+A connection whose first line is {"type":"subscribe"} gets every later event as a line instead. The process hosting
+the bus (the app or core.daemon) gets each event through its callback, and re-publishes its own probe results so
+subscribers see those too. From a shell or a CLI hook:
+
+    python -m core.bus tunnel_down work reason=exit
+    python -m core.bus --subscribe
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+
+from core.config import ConfigHelper
+
+TUNNEL_UP = "tunnel_up"            # tag, pid, socks_port
+TUNNEL_DOWN = "tunnel_down"        # tag, reason
+PORT_BOUND = "port_bound"          # tag, port
+FORWARD_ADDED = "forward_added"    # tag, flag, spec
+FORWARD_REMOVED = "forward_removed"
+SUBSCRIBE = "subscribe"
+
+MAX_LINE = 64 * 1024
+
+
+def socket_path() -> str:
+    return os.path.join(ConfigHelper.workspace_path, "events.sock")
+
+
+@dataclass(frozen=True)
+class BusEvent:
+    type: str
+    tag: str = None
+    data: dict = field(default_factory=dict)
+    received: float = 0.0  # time.monotonic() when the bus read it
+
+    @classmethod
+    def parse(cls, line: bytes) -> "BusEvent":
+        """Raises ValueError for anything but a JSON object with a string "type"."""
+        data = json.loads(line)
+        if not isinstance(data, dict) or not isinstance(data.get("type"), str):
+            raise ValueError("an event is a JSON object with a \"type\"")
+        event_type, tag = data.pop("type"), data.pop("tag", None)
+        return cls(event_type, None if tag is None else str(tag), data, time.monotonic())
+
+    def encode(self) -> bytes:
+        fields = {"type": self.type, **({"tag": self.tag} if self.tag is not None else {}), **self.data}
+        return json.dumps(fields, separators=(",", ":")).encode() + b"\n"
+
+
+def publish(event_type: str, tag: str = None, path: str = None, timeout: float = 1.0, **data) -> bool:
+    """Send one event to the running bus. False if there is none."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(path or socket_path())
+        sock.sendall(BusEvent(event_type, tag, data).encode())
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+class EventBus:
+    """Hosts the socket on an asyncio loop in a daemon thread, like PacServer. callback(BusEvent) runs on that thread."""
+
+    def __init__(self, callback, path: str = None):
+        self.callback = callback
+        self.path = path or socket_path()
+        self.received = 0
+        self._subscribers = set()
+        self._clients = set()
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._error = None
+
+    def publish(self, event: BusEvent):
+        """Fan an event out to subscribers, from any thread. The callback doesn't see it."""
+        if self._loop and self._subscribers:
+            self._loop.call_soon_threadsafe(self._fan_out, event.encode(), None)
+
+    def _fan_out(self, line: bytes, source):
+        for writer in list(self._subscribers):
+            if writer is source:
+                continue
+            if writer.transport.get_write_buffer_size() > MAX_LINE * 16:
+                # a subscriber that stopped reading loses its connection, not our memory
+                writer.close()
+                self._subscribers.discard(writer)
+                continue
+            writer.write(line)
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._clients.add(writer)
+        try:
+            while line := await reader.readline():
+                try:
+                    event = BusEvent.parse(line)
+                except ValueError:
+                    continue
+                if event.type == SUBSCRIBE:
+                    self._subscribers.add(writer)
+                    continue
+                self.received += 1
+                self._fan_out(event.encode(), writer)
+                self.callback(event)
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            self._subscribers.discard(writer)
+            self._clients.discard(writer)
+            writer.close()
+
+    # --- lifecycle ---
+
+    def _bind(self):
+        # a live socket belongs to another app or daemon, a dead one is left over from a crash
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+            raise OSError(f"{self.path} is in use by another process")
+        except (FileNotFoundError, ConnectionRefusedError):
+            pass
+        finally:
+            probe.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        return asyncio.start_unix_server(self._client, self.path, limit=MAX_LINE)
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._server = self._loop.run_until_complete(self._bind())
+            os.chmod(self.path, 0o600)
+        except OSError as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            for writer in list(self._clients):
+                writer.close()
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+    def start(self):
+        """Bind and serve in a daemon thread. Raises OSError if another process owns the socket."""
+        self._ready.clear()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="susops-bus", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error:
+            raise self._error
+        return self
+
+    def stop(self):
+        if self._loop and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread:
+            self._thread.join(5)
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m core.bus", description="Publish to or follow the SusOps event bus.")
+    parser.add_argument("type", nargs="?", help=f"e.g. {TUNNEL_UP}, {TUNNEL_DOWN}, {PORT_BOUND}, {FORWARD_ADDED}")
+    parser.add_argument("tag", nargs="?")
+    parser.add_argument("fields", nargs="*", metavar="key=value")
+    parser.add_argument("--subscribe", action="store_true", help="print every event until interrupted")
+    args = parser.parse_args()
+
+    if args.subscribe:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(socket_path())
+            sock.sendall(BusEvent(SUBSCRIBE).encode())
+            with sock.makefile("rb") as lines:
+                for line in lines:
+                    print(line.decode().rstrip(), flush=True)
+        except OSError as e:
+            raise SystemExit(f"no event bus at {socket_path()}: {e}")
+        except KeyboardInterrupt:
+            pass
+        return
+    if not args.type:
+        parser.error("an event type or --subscribe is required")
+    fields = dict(field.split("=", 1) for field in args.fields if "=" in field)
+    if not publish(args.type, args.tag, **fields):
+        raise SystemExit(f"no event bus at {socket_path()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+import os
+import subprocess
+
+from core.config import resource_path
+
+
+def susops_path() -> str:
+    # $SUSOPS_BIN points benchmarks at a stand-in
+    return os.environ.get("SUSOPS_BIN") or resource_path(os.path.join('bin', 'susops'))
+
+
+def run_susops_command(command: str, timeout: float = None) -> tuple[str, int]:
+    """Run `susops <command>` and return its stripped stdout and exit code."""
+    result = subprocess.run(f"{susops_path()} {command}", shell=True, capture_output=True, encoding="utf-8",
+                            errors="ignore", timeout=timeout)
+    return result.stdout.strip(), result.returncode
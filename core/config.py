@@ -0,0 +1,462 @@
+import fcntl
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import yaml
+except ImportError:  # yq-only fallback
+    yaml = None
+
+# libyaml parser is an order of magnitude faster on large pac_hosts lists
+_Loader = getattr(yaml, 'CSafeLoader', None) or getattr(yaml, 'SafeLoader', None)
+_Dumper = getattr(yaml, 'CSafeDumper', None) or getattr(yaml, 'SafeDumper', None)
+
+
+def resource_path(rel_path):
+    # on macOS bundle, resources are in Contents/Resources
+    if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
+        base = sys._MEIPASS
+    else:
+        # running normally: project root
+        base = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base, rel_path)
+
+
+class ConfigCache:
+    """Parsed copy of a YAML file, re-parsed only when mtime, size or inode change."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._data = None
+        self.parse_count = 0
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def get(self):
+        """Return the parsed document (None if missing). Raises yaml.YAMLError on invalid YAML."""
+        stamp = self._file_stamp()
+        with self._lock:
+            if stamp is not None and stamp == self._stamp:
+                return self._data
+            if stamp is None:
+                data = None
+            else:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = yaml.load(f, Loader=_Loader)
+                self.parse_count += 1
+            self._stamp = stamp
+            self._data = data
+            return data
+
+    def invalidate(self):
+        with self._lock:
+            self._stamp = None
+            self._data = None
+
+    def prime(self, data):
+        """Adopt data just written to the file, so the next get() doesn't parse it again."""
+        stamp = self._file_stamp()
+        with self._lock:
+            self._stamp = stamp
+            self._data = data
+
+
+# simple yq paths like `.susops_app.logo_style` or `.connections[].pac_hosts[]`
+_PATH_TOKEN = re.compile(r'\.([A-Za-z_][\w-]*)|\[(\d*)\]')
+_SIMPLE_PATH = re.compile(r'^(?:\.[A-Za-z_][\w-]*|\[\d*\])+$')
+
+
+def _eval_path(data, query: str) -> list:
+    nodes = [data]
+    for key, index in _PATH_TOKEN.findall(query):
+        matched = []
+        for node in nodes:
+            if key:
+                matched.append(node.get(key) if isinstance(node, dict) else None)
+            elif index:
+                i = int(index)
+                matched.append(node[i] if isinstance(node, list) and i < len(node) else None)
+            elif isinstance(node, list):
+                matched.extend(node)
+            elif isinstance(node, dict):
+                matched.extend(node.values())
+        nodes = matched
+    return nodes
+
+
+def _format_scalar(value) -> str:
+    # mirror yq's plain output
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (dict, list)):
+        return yaml.safe_dump(value, default_flow_style=False, sort_keys=False).strip()
+    return str(value)
+
+
+def _read_parsed(data, query: str, default):
+    nodes = _eval_path(data, query)
+    if len(nodes) == 1 and nodes[0] is None:
+        return default
+    return "\n".join(_format_scalar(node) for node in nodes)
+
+
+_SET_PATH = re.compile(r'^(?:\.[A-Za-z_][\w-]*|\[\d+\])+$')
+
+
+def _put(node, token, value):
+    if isinstance(token, int):
+        node.extend([None] * (token + 1 - len(node)))
+    node[token] = value
+
+
+def _set_path(data: dict, query: str, value):
+    tokens = [key or int(index) for key, index in _PATH_TOKEN.findall(query)]
+    node = data
+    for token, next_token in zip(tokens, tokens[1:]):
+        child = node.get(token) if isinstance(node, dict) else (node[token] if token < len(node) else None)
+        if not isinstance(child, (dict, list)):
+            child = {} if isinstance(next_token, str) else []
+            _put(node, token, child)
+        node = child
+    _put(node, tokens[-1], value)
+
+
+class ConfigTransaction:
+    """Collects config mutations so they can be written to disk in a single locked, atomic rewrite."""
+
+    def __init__(self):
+        self.mutations = []
+        self.added = {}  # connection tag -> pac_hosts actually added by apply()
+        self.removed = {}
+        self.imports = {}  # connection tag -> core.host_import.ImportPlan applied by apply()
+        self.result = None  # document written by ConfigHelper.commit()
+        # index in .connections -> pac_hosts as apply() found them, by index since tags aren't guaranteed to be unique
+        self._hosts_before = {}
+
+    def set(self, query: str, value):
+        """Queue `query = value`, e.g. set(".susops_app.logo_style", "GEAR")."""
+        if not _SET_PATH.match(query):
+            raise ValueError(f"unsupported config path: {query}")
+        self.mutations.append(("set", query, value))
+        return self
+
+    def add_pac_hosts(self, tag: str, hosts: list):
+        """Queue appending hosts to a connection's pac_hosts, skipping ones it already has."""
+        self.mutations.append(("add_hosts", tag, list(hosts)))
+        return self
+
+    def remove_pac_hosts(self, tag, hosts: list):
+        """Queue removing hosts from a connection's pac_hosts, or from every connection if tag is None."""
+        self.mutations.append(("remove_hosts", tag, list(hosts)))
+        return self
+
+    def import_pac_hosts(self, tag: str, hosts: list):
+        """Queue a bulk import into a connection's pac_hosts, planned against its hosts at write time."""
+        self.mutations.append(("import_hosts", tag, list(hosts)))
+        return self
+
+    def apply(self, data):
+        for op, target, value in self.mutations:
+            if op == "set":
+                _set_path(data, target, value)
+                continue
+            for index, conn in enumerate(data.get("connections") or []):
+                if not isinstance(conn, dict) or (target is not None and conn.get("tag") != target):
+                    continue
+                hosts = conn.get("pac_hosts") or []
+                self._hosts_before.setdefault(index, list(hosts))
+                if op == "import_hosts":
+                    from core.host_import import plan_import
+                    plan = self.imports[conn.get("tag")] = plan_import(hosts, value)
+                    # what deleting plan.removed and appending plan.added with yq leaves, see yq_patch()
+                    gone = {str(h) for h in plan.removed}
+                    conn["pac_hosts"] = [h for h in hosts if str(h) not in gone] + plan.added
+                    if plan.added:
+                        self.added.setdefault(conn.get("tag"), []).extend(plan.added)
+                    if plan.removed:
+                        self.removed.setdefault(conn.get("tag"), []).extend(plan.removed)
+                elif op == "add_hosts":
+                    present = {str(h).strip().lower() for h in hosts}
+                    new = []
+                    for host in value:
+                        if host.strip().lower() not in present:
+                            present.add(host.strip().lower())
+                            new.append(host)
+                    conn["pac_hosts"] = hosts + new
+                    self.added.setdefault(conn.get("tag"), []).extend(new)
+                else:
+                    drop = {h.strip().lower() for h in value}
+                    conn["pac_hosts"] = [h for h in hosts if str(h).strip().lower() not in drop]
+                    gone = [h for h in hosts if str(h).strip().lower() in drop]
+                    if gone:
+                        self.removed.setdefault(conn.get("tag"), []).extend(gone)
+        return data
+
+    def yq_patch(self) -> str:
+        """
+        After apply() to self.result: one yq expression making the same changes, as resolved against that document.
+        Only the set values and the pac_hosts entries added or removed are touched, the rest of the file stays as it is.
+        """
+        queries = [f"{target} = {json.dumps(value)}" for op, target, value in self.mutations if op == "set"]
+        connections = (self.result or {}).get("connections") or []
+        for index, before in self._hosts_before.items():
+            # apply() keeps the surviving hosts in order and appends new ones, so this is the whole difference
+            hosts = connections[index].get("pac_hosts") or []
+            kept = {str(h) for h in hosts}
+            gone = list(dict.fromkeys(str(h) for h in before if str(h) not in kept))
+            present = {str(h) for h in before}
+            new = [h for h in hosts if str(h) not in present]
+            selector = f".connections[{index}]"
+            if gone:
+                matches = " or ".join(f". == {json.dumps(h)}" for h in gone)
+                queries.append(f"del({selector} | .pac_hosts[] | select({matches}))")
+            if new:
+                queries.append(f"({selector} | .pac_hosts) |= ((. // []) + {json.dumps(new)})")
+        return " | ".join(queries)
+
+    def as_yq(self) -> str:
+        """Without PyYAML: the mutations as one yq expression, unresolved since the document isn't parsed here."""
+        # JSON literals are valid yq values
+        queries = []
+        for op, target, value in self.mutations:
+            if op == "set":
+                queries.append(f"{target} = {json.dumps(value)}")
+                continue
+            selector = ".connections[]" + ("" if target is None else f" | select(.tag == {json.dumps(target)})")
+            if op == "import_hosts":
+                # without PyYAML the current hosts aren't known here, only the import itself is normalized
+                from core.host_import import plan_import
+                op, value = "add_hosts", plan_import([], value).hosts
+            if op == "add_hosts":
+                queries.append(f"({selector} | .pac_hosts) |= ((. // []) + ({json.dumps(value)} - (. // [])))")
+            else:
+                matches = " or ".join(f". == {json.dumps(h)}" for h in value)
+                queries.append(f"del({selector} | .pac_hosts[] | select({matches}))")
+        return " | ".join(queries)
+
+
+class ConfigHelper:
+    yq_path = resource_path(os.path.join('bin', 'yq'))
+    workspace_path = os.path.expanduser("~/.susops")
+    config_path = os.path.join(workspace_path, "config.yaml")
+
+    # answer queries from an in-memory parse when PyYAML is available, yq otherwise
+    use_cache = yaml is not None
+    _cache = None
+
+    @classmethod
+    def cache(cls) -> ConfigCache:
+        if cls._cache is None or cls._cache.path != cls.config_path:
+            cls._cache = ConfigCache(cls.config_path)
+        return cls._cache
+
+    @classmethod
+    def load(cls):
+        """Return the parsed config document, or raise LookupError when the cache can't serve it."""
+        if not cls.use_cache:
+            raise LookupError("config cache disabled")
+        try:
+            return cls.cache().get()
+        except (OSError, yaml.YAMLError) as e:
+            raise LookupError(str(e)) from e
+
+    @staticmethod
+    def get_connection_tags():
+        result = ConfigHelper.read_config(".connections[].tag", "")
+        return result.splitlines()
+
+    @staticmethod
+    def get_domains():
+        result = ConfigHelper.read_config(".connections[].pac_hosts[]", "")
+        split_result = result.splitlines()
+        return split_result
+
+    @staticmethod
+    def _format_forwards(kind: str) -> list:
+        try:
+            data = ConfigHelper.load()
+        except LookupError:
+            return None
+
+        result = []
+        for fwd in _eval_path(data, f".connections[].forwards.{kind}[]"):
+            if not isinstance(fwd, dict):
+                continue
+            src = fwd.get('src_port', fwd.get('src'))
+            dst = fwd.get('dst_port', fwd.get('dst'))
+            result.append(f"{fwd.get('tag') or ''} ({'' if src is None else src} → {'' if dst is None else dst})")
+        return result
+
+    @staticmethod
+    def get_local_forwards():
+        result = ConfigHelper._format_forwards("local")
+        if result is not None:
+            return result
+        result = ConfigHelper.read_config(".connections[].forwards.local[] | \"\\(.tag) (\\((.src_port // .src)) → \\((.dst_port // .dst)))\"", "")
+        # filter result items, remove all items equal to "( → )" (this is the case when no remote forwards are set)
+        result = [item for item in result.splitlines() if not item == "( → )"]
+        return result
+
+    @staticmethod
+    def get_remote_forwards():
+        result = ConfigHelper._format_forwards("remote")
+        if result is not None:
+            return result
+        result = ConfigHelper.read_config(".connections[].forwards.remote[] | \"\\(.tag) (\\((.src_port // .src)) → \\((.dst_port // .dst)))\"", "")
+        # filter result items, remove all items equal to "( → )" (this is the case when no remote forwards are set)
+        result = [item for item in result.splitlines() if not item == "( → )"]
+        return result
+
+    @staticmethod
+    def read_config(query: str, default):
+        if ConfigHelper.use_cache and _SIMPLE_PATH.match(query):
+            try:
+                return _read_parsed(ConfigHelper.load(), query, default)
+            except LookupError:
+                pass
+        return ConfigHelper.read_config_yq(query, default)
+
+    @staticmethod
+    def read_configs(queries: dict) -> dict:
+        """
+        {name: value} for {name: (query, default)}, formatted like read_config, from one parse or a single yq call.
+        Queries are simple paths like `.susops_app.logo_style`.
+        """
+        if ConfigHelper.use_cache:
+            try:
+                data = ConfigHelper.load()
+            except LookupError:
+                pass
+            else:
+                return {name: _read_parsed(data, query, default) for name, (query, default) in queries.items()}
+        expression = "{" + ", ".join(f"{json.dumps(name)}: {query}" for name, (query, _) in queries.items()) + "}"
+        try:
+            values = json.loads(subprocess.check_output([ConfigHelper.yq_path, "e", "-o=json", expression,
+                                                         ConfigHelper.config_path], encoding="utf-8") or "null")
+        except (subprocess.CalledProcessError, OSError, ValueError):
+            values = None
+        values = values if isinstance(values, dict) else {}
+        return {name: default if values.get(name) is None else
+                (json.dumps(values[name]) if isinstance(values[name], (dict, list)) else _format_scalar(values[name]))
+                for name, (_, default) in queries.items()}
+
+    @staticmethod
+    def read_config_yq(query: str, default):
+        try:
+            result = subprocess.check_output([ConfigHelper.yq_path, "e", query, ConfigHelper.config_path], encoding="utf-8").strip()
+            if result == "null":
+                result = default
+        except subprocess.CalledProcessError:
+            result = default
+        return result
+
+    @staticmethod
+    def update_config(query: str):
+        with ConfigHelper.lock():
+            subprocess.run([ConfigHelper.yq_path, "e", "-i", query, ConfigHelper.config_path, ], check=True)
+        if ConfigHelper._cache is not None:
+            ConfigHelper._cache.invalidate()
+
+    @staticmethod
+    @contextmanager
+    def lock():
+        """
+        Advisory flock on config.yaml.lock. Serializes the writes going through ConfigHelper (transactions and
+        update_config), across threads and processes: the app, the headless daemon and the supervisor's port writes.
+        The susops CLI and editors don't take it. Their writes can still interleave with ours, as two CLI calls can,
+        but yq -i re-reads the file itself, so only a write landing while yq runs is lost.
+        """
+        os.makedirs(os.path.dirname(ConfigHelper.config_path), exist_ok=True)
+        with open(ConfigHelper.config_path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    @contextmanager
+    def transaction():
+        """
+        Batch several mutations into one write:
+
+            with ConfigHelper.transaction() as tx:
+                tx.set(".pac_server_port", 1081)
+                tx.set(".susops_app.logo_style", "GEAR")
+
+        Nothing is written if the block raises.
+        """
+        tx = ConfigTransaction()
+        yield tx
+        ConfigHelper.commit(tx)
+
+    @staticmethod
+    def commit(tx: ConfigTransaction):
+        """
+        Write a transaction with one `yq -i`, like the CLI writes, so comments, quoting and blank lines survive.
+        With PyYAML the mutations are resolved against a fresh parse under the lock first (tx.added, tx.removed,
+        tx.imports, tx.result). Source checkouts without bin/yq fall back to an atomic PyYAML rewrite, which does drop
+        comments.
+        """
+        if not tx.mutations:
+            return
+        if yaml is None:
+            ConfigHelper.update_config(tx.as_yq())
+            return
+
+        path = ConfigHelper.config_path
+        with ConfigHelper.lock():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = yaml.load(f, Loader=_Loader) or {}
+            except FileNotFoundError:
+                data = {}
+            tx.result = tx.apply(data)
+
+            if os.access(ConfigHelper.yq_path, os.X_OK) and os.path.exists(path):
+                patch = tx.yq_patch()
+                if patch:
+                    subprocess.run([ConfigHelper.yq_path, "e", "-i", patch, path], check=True)
+            else:
+                ConfigHelper._rewrite(path, data)
+            ConfigHelper.cache().prime(data)
+
+    @staticmethod
+    def _rewrite(path: str, data):
+        """Temp file + fsync + rename."""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".config.", suffix=".yaml", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                yaml.dump(data, f, Dumper=_Dumper, default_flow_style=False, sort_keys=False, allow_unicode=True)
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(path):
+                os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
@@ -0,0 +1,734 @@
+"""
+Platform-neutral SusOps core: process state, the config snapshot, susops commands and status polling.
+
+The menu-bar app and the headless daemon (core/daemon.py) are views on top of it. They pass in how to get back on
+their main loop and subscribe to events, nothing in here imports AppKit or rumps.
+"""
+import math
+import threading
+import time
+
+from core.commands import run_susops_command
+from core.config import ConfigHelper
+from core.executor import CommandExecutor, CommandResult
+from core.prober import ProbeMode, ProbeResult, StateProber, port_open
+from core.scheduler import PollScheduler
+from core.state import ConnectionStates, ProcessState, returncode_from_state
+
+# core.pac_server, core.ssh_pool, core.relay, core.watcher, core.bus, core.supervisor and core.failover are imported
+# when their feature is enabled
+
+# used until load_config() has run
+DEFAULT_CONFIG = {
+    "pac_server_port": "1081",
+    "logo_style": "COLORED_GLASSES",
+    "stop_on_quit": True,
+    "ephemeral_ports": True,
+    "state_probe": ProbeMode.NATIVE,
+    "poll_max_interval": 60.0,
+    "builtin_pac_server": False,
+    "ssh_multiplex": False,
+    "relay": False,
+    "relay_offset": 10000,
+    "metrics_port": "9105",
+    "watch_config": True,
+    "watch_backend": "auto",
+    "event_bus": True,
+    "bus_poll_interval": 30.0,
+    "supervisor": False,
+    "failover_interval": 5.0,
+    "failover_target": "127.0.0.1:22",
+    "failover_direct": True,
+    "invalid": [],
+}
+
+
+
+def _number(read: dict, key: str, kind, invalid: list):
+    """`kind(read[key])`, or the default for anything but a positive number, with (key, value) added to `invalid`."""
+    try:
+        value = kind(read[key])
+    except (TypeError, ValueError):
+        value = None
+    if value is None or not math.isfinite(value) or value <= 0:
+        invalid.append((key, read[key]))
+        return DEFAULT_CONFIG[key]
+    return value
+
+
+# seconds shutdown() waits for the ssh masters to exit
+SHUTDOWN_REAP_TIMEOUT = 3.0
+
+
+class Event:
+    """Names passed to subscribers as listener(event, payload)."""
+    CONFIG = "config"              # payload: the new config dict
+    CONFIG_CHANGED = "config_changed"  # payload: core.watcher.FileChanged, after CONFIG
+    BUS = "bus"                    # payload: core.bus.BusEvent published by another process or the supervisor
+    STARTED = "started"            # payload: the first ProbeResult
+    STATE = "state"                # payload: the ProbeResult that changed the state
+    CONNECTIONS = "connections"    # payload: the ConnectionStates after every native probe
+    ACTION = "action"              # payload: label of the running proxy action, None once it completed
+    ERROR = "error"                # payload: message
+    MISMATCH = "mismatch"          # payload: (time, native state, CLI state) from a `verify` probe that disagreed
+
+
+class SusOpsController:
+    """
+    `dispatch(fn, *args)` runs fn on the view's main loop, `call_later(delay, fn, *args)` schedules it there,
+    e.g. PyObjCTools.AppHelper.callAfter/callLater or core.loop.MainLoop.call_soon/call_later.
+    All state is read and changed on that loop, commands and the startup load run on the executor.
+    `watch=False` is for a one-off state read: no config watcher, no event bus and no servers or supervisor.
+    """
+
+    def __init__(self, dispatch, call_later, config: dict = None, executor: CommandExecutor = None,
+                 watch: bool = True):
+        self.dispatch = dispatch
+        self.call_later = call_later
+        self.watch = watch
+        self.config = {**DEFAULT_CONFIG, **(config or {})}
+        self.process_state = ProcessState.INITIAL
+        self.connections = ConnectionStates()
+        self.prober = StateProber()
+        self.executor = executor or CommandExecutor(dispatch=dispatch)
+        self.poll_scheduler = PollScheduler(max_interval=self.config['poll_max_interval'])
+        self.pac_server = None
+        self.relay_server = None
+        self.ssh_pool = None
+        self.watcher = None
+        self.bus = None
+        self.supervisor = None
+        self.failover = None
+        self.pending_action = None
+        self.pending_handle = None
+        self.listeners = []
+        self.stopped = False
+        self._poll_generation = 0
+        self._config_loads = 0
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+        return listener
+
+    def emit(self, event: str, payload=None):
+        for listener in list(self.listeners):
+            listener(event, payload)
+
+    @staticmethod
+    def load_config() -> dict:
+        # one parse, or one yq call without PyYAML
+        read = ConfigHelper.read_configs({
+            "pac_server_port": (".pac_server_port", "1081"),
+            "logo_style": (".susops_app.logo_style", DEFAULT_CONFIG['logo_style']),
+            "stop_on_quit": (".susops_app.stop_on_quit", '1'),
+            "ephemeral_ports": (".susops_app.ephemeral_ports", '1'),
+            "state_probe": (".susops_app.state_probe", ProbeMode.NATIVE),
+            "poll_max_interval": (".susops_app.poll_max_interval", "60"),
+            "builtin_pac_server": (".susops_app.builtin_pac_server", '0'),
+            "ssh_multiplex": (".susops_app.ssh_multiplex", '0'),
+            "relay": (".susops_app.relay", '0'),
+            "relay_offset": (".susops_app.relay_offset", "10000"),
+            "metrics_port": (".susops_app.metrics_port", "9105"),
+            "watch_config": (".susops_app.watch_config", '1'),
+            "watch_backend": (".susops_app.watch_backend", "auto"),
+            "event_bus": (".susops_app.event_bus", '1'),
+            "bus_poll_interval": (".susops_app.bus_poll_interval", "30"),
+            "supervisor": (".susops_app.supervisor", '0'),
+            "failover_interval": (".susops_app.failover_interval", "5"),
+            "failover_target": (".susops_app.failover_target", "127.0.0.1:22"),
+            "failover_direct": (".susops_app.failover_direct", '1'),
+        })
+        invalid = []
+        return {
+            "pac_server_port": read["pac_server_port"],
+            "logo_style": read["logo_style"],
+            "stop_on_quit": read["stop_on_quit"] == '1',
+            "ephemeral_ports": read["ephemeral_ports"] == '1',
+            # native: pidfiles + SOCKS5 handshake, cli: `susops ps`, verify: both, trusting the CLI
+            "state_probe": read["state_probe"],
+            # ceiling in seconds for the status poll backoff
+            "poll_max_interval": _number(read, "poll_max_interval", float, invalid),
+            # serve the PAC file from the app instead of the CLI's PAC server process
+            "builtin_pac_server": read["builtin_pac_server"] == '1',
+            # keep one ssh ControlMaster per connection for tests and live forward changes
+            "ssh_multiplex": read["ssh_multiplex"] == '1',
+            # counting relays at port + relay_offset in front of SOCKS ports and local forwards, see core.relay
+            "relay": read["relay"] == '1',
+            "relay_offset": _number(read, "relay_offset", int, invalid),
+            "metrics_port": read["metrics_port"],
+            # follow config.yaml edits (app, CLI, editor) as they happen instead of re-reading on suspicion
+            "watch_config": read["watch_config"] == '1',
+            # auto, inotify, kqueue or polling, see core.watcher
+            "watch_backend": read["watch_backend"],
+            # take tunnel events from ~/.susops/events.sock, polling becomes a slow consistency check
+            "event_bus": read["event_bus"] == '1',
+            "bus_poll_interval": _number(read, "bus_poll_interval", float, invalid),
+            # run the ssh tunnels from core.supervisor instead of `susops start` and autossh, implies the built-in PAC
+            "supervisor": read["supervisor"] == '1',
+            # connections sharing a `group` get latency-ordered failover chains in the built-in PAC, see core.failover
+            "failover_interval": _number(read, "failover_interval", float, invalid),
+            "failover_target": read["failover_target"],
+            "failover_direct": read["failover_direct"] == '1',
+            # (key, value) of the settings above that fell back to their default
+            "invalid": invalid,
+        }
+
+    def set_config(self, config: dict):
+        invalid = config.get('invalid')
+        if invalid and invalid != self.config.get('invalid'):
+            settings = ", ".join(f"{key}={value!r}" for key, value in invalid)
+            self.emit(Event.ERROR, f"Invalid settings in {ConfigHelper.config_path}, using the defaults: {settings}")
+        self.config = config
+        self.poll_scheduler.max_interval = max(config['poll_max_interval'], self.poll_scheduler.base_interval)
+        if config['ssh_multiplex'] and self.ssh_pool is None:
+            from core.ssh_pool import SshPool
+            self.ssh_pool = SshPool()
+        elif not config['ssh_multiplex'] and self.ssh_pool is not None:
+            self.executor.call(self.ssh_pool.reap, label="ssh_pool")
+            self.ssh_pool = None
+        if config['supervisor'] and self.supervisor is None:
+            from core.supervisor import TunnelSupervisor
+            self.supervisor = TunnelSupervisor(on_event=self.supervisor_event)
+        self.emit(Event.CONFIG, config)
+
+    def reload_config(self) -> dict:
+        self.set_config(self.load_config())
+        return self.config
+
+    def refresh_config(self) -> dict:
+        """Re-read the config unless the watcher already keeps it current."""
+        if self.watching:
+            return self.config
+        return self.reload_config()
+
+    @property
+    def watching(self) -> bool:
+        return self.watcher is not None and self.watcher.running
+
+    def start_watcher(self) -> bool:
+        from core.watcher import FileWatcher
+        try:
+            self.watcher = FileWatcher([ConfigHelper.config_path], self.config_file_changed,
+                                       backend=self.config['watch_backend']).start()
+        except (OSError, KeyError) as e:
+            self.watcher = None
+            self.emit(Event.ERROR, f"Could not watch {ConfigHelper.config_path}: {e}")
+            return False
+        return True
+
+    def config_file_changed(self, change):
+        """Called on the watcher thread."""
+        self.dispatch(self.apply_config_change, change)
+
+    def apply_config_change(self, change):
+        """Re-read the config and compile the PAC on the executor, then apply both on the main loop."""
+        if self.stopped:
+            return
+        self._config_loads += 1
+        loads, pac_server = self._config_loads, self.pac_server
+
+        def load():
+            return self.load_config(), pac_server.compile() if pac_server else None
+
+        def loaded(result):
+            # a later change is loading the newer file
+            if self.stopped or loads != self._config_loads:
+                return
+            if isinstance(result, Exception):
+                self.emit(Event.ERROR, f"Could not load the config: {result}")
+                return
+            config, compiled = result
+            self.set_config(config)
+            if self.supervisor:
+                # new or changed forwards restart their tunnel
+                self.executor.call(self.supervisor.sync, label="supervisor")
+            if self.pac_server:
+                self.pac_server.install(compiled)
+                self.sync_failover()
+            if self.relay_server:
+                self.sync_relays()
+            self.emit(Event.CONFIG_CHANGED, change)
+
+        self.executor.call(load, callback=loaded, label="config")
+
+    # startup and polling
+
+    def start(self):
+        """Load config and the first state on the executor, then start polling. Emits STARTED."""
+        self.executor.call(self.load_startup, callback=self.startup_loaded, label="startup")
+
+    def load_startup(self):
+        """Runs on the executor: config, then the first probe unless the built-in PAC server has to start first."""
+        config = self.load_config()
+        builtin_pac = config['builtin_pac_server'] or config['supervisor']
+        result = None if builtin_pac else self.prober.run(config['state_probe'])
+        return config, result
+
+    def startup_loaded(self, loaded):
+        if isinstance(loaded, Exception):
+            self.emit(Event.ERROR, f"Could not load the config: {loaded}")
+            loaded = self.config, None
+        config, result = loaded
+        self.set_config(config)
+        if (self.config['builtin_pac_server'] or self.config['supervisor']) and self.watch:
+            self.start_pac_server()
+        elif self.config['builtin_pac_server'] or self.config['supervisor']:
+            # a one-off read binds nothing, the PAC is served in-process by the app or daemon running, if any
+            try:
+                port = int(self.config['pac_server_port'])
+            except ValueError:
+                port = 0
+            self.prober.pac_check = lambda: port_open(port)
+        if self.pac_server:
+            self.sync_failover()
+        if self.config['relay'] and self.watch:
+            self.start_relay_server()
+        if self.config['watch_config'] and self.watch:
+            self.start_watcher()
+        if self.config['event_bus'] and self.watch:
+            self.start_bus()
+
+        if self.supervisor and self.watch:
+            # the first probe sees the tunnels the supervisor adopted
+            self.start_supervisor(then=lambda: self.probe_state(then=self.started))
+        elif result is None:
+            self.probe_state(then=self.started)
+        else:
+            self.started(*self.check_state(result))
+
+    def started(self, state, output, returncode):
+        self.emit(Event.STARTED, ProbeResult(state, output, returncode))
+        self.schedule_poll()
+
+    def schedule_poll(self, delay: float = None):
+        if self.stopped:
+            return
+        # a newer schedule supersedes any poll that is still pending
+        self._poll_generation += 1
+        delay = self.poll_scheduler.next_interval() if delay is None else delay
+        self.call_later(delay, self.poll, self._poll_generation)
+
+    def poll(self, generation: int):
+        if generation != self._poll_generation:
+            return
+        if self.pac_server:
+            # a no-op unless config.yaml changed, the relays follow once the PAC is current
+            self.executor.call(self.pac_server.compile, callback=self.pac_compiled, label="pac")
+        elif self.relay_server:
+            self.sync_relays()
+
+        def polled(*_):
+            if self.ssh_pool and self.process_state == ProcessState.RUNNING and not all(self.ssh_pool.health().values()):
+                self.warm_pool()
+            # unless a bus event or an action scheduled the next poll meanwhile
+            if generation == self._poll_generation:
+                self.schedule_poll()
+
+        if self.pending_action:
+            # check_state() would ignore the result anyway
+            polled()
+        else:
+            self.probe_state(then=polled)
+
+    def pac_compiled(self, compiled):
+        if self.stopped or not self.pac_server:
+            return
+        if isinstance(compiled, Exception):
+            self.emit(Event.ERROR, f"Could not compile the PAC file: {compiled}")
+        else:
+            self.pac_server.install(compiled)
+        self.sync_failover()
+        if self.relay_server:
+            self.sync_relays()
+
+    def notify_state_action(self):
+        """Switch to fast polling after anything that may change the proxy state."""
+        self.poll_scheduler.notify_action()
+        self.schedule_poll()
+
+    def probe_state(self, then=None):
+        """
+        Probe on the executor, native handshakes or `susops ps` can take a while, then apply the result with
+        check_state() on the main loop and call then(state, output, returncode).
+        """
+        def probed(result):
+            if self.stopped:
+                return
+            if isinstance(result, Exception):
+                self.emit(Event.ERROR, f"Could not probe the proxy state: {result}")
+                state = self.process_state, str(result), None
+            else:
+                if result.mismatch:
+                    self.emit(Event.MISMATCH, result.mismatch)
+                state = self.check_state(result)
+            if then:
+                then(*state)
+
+        self.executor.call(self.prober.run, self.config['state_probe'], callback=probed, label="probe")
+
+    def check_state(self, result: ProbeResult = None) -> tuple:
+        """
+        Apply a probe result and emit STATE if it changed. Without `result` the probe runs right here, only for
+        callers off the main loop; the main loop uses probe_state().
+        """
+        if self.pending_action:
+            # keep showing "starting…" etc. until the command completes
+            return self.process_state, "", None
+
+        result = result or self.prober.run(self.config['state_probe'])
+        if result.pac_running is not None or len(self.connections):
+            # per-tunnel detail comes from the native probe, the overall state is derived from it
+            before = {conn.tag: conn.state for conn in self.connections}
+            if self.connections.update(result.connections, result.pac_running) and self.bus:
+                self.publish_transitions(before)
+            if result.pac_running is not None:
+                result.state = self.connections.aggregate()
+            self.emit(Event.CONNECTIONS, self.connections)
+        self.poll_scheduler.record_poll(result.state)
+        if result.state != self.process_state:
+            self.process_state = result.state
+            self.emit(Event.STATE, result)
+            if result.state in (ProcessState.RUNNING, ProcessState.STOPPED_PARTIALLY):
+                self.warm_pool()
+        return result.state, result.output, result.returncode
+
+    # event bus
+
+    def start_bus(self) -> bool:
+        """
+        Host ~/.susops/events.sock. False if another app or daemon already does, polling stays as it was.
+        Polling only slows down once tunnel changes are published: with the supervisor, or from the first
+        tunnel_up/tunnel_down on the bus.
+        """
+        from core.bus import EventBus
+        try:
+            self.bus = EventBus(lambda event: self.dispatch(self.bus_event, event)).start()
+        except OSError:
+            self.bus = None
+            return False
+        if self.config['supervisor']:
+            self.relax_polling()
+        return True
+
+    def relax_polling(self):
+        """Poll every bus_poll_interval as a consistency check, the bus reports tunnel changes."""
+        scheduler = self.poll_scheduler
+        scheduler.base_interval = max(scheduler.base_interval, self.config['bus_poll_interval'])
+        scheduler.max_interval = max(scheduler.max_interval, scheduler.base_interval)
+        scheduler.interval = max(scheduler.interval, scheduler.base_interval)
+
+    def bus_event(self, event):
+        """Apply a tunnel_up/tunnel_down right away, then let a probe confirm it (or anything else on the bus)."""
+        from core.bus import TUNNEL_DOWN, TUNNEL_UP
+        if self.stopped:
+            return
+        self.emit(Event.BUS, event)
+        if event.type in (TUNNEL_UP, TUNNEL_DOWN) and self.bus:
+            self.relax_polling()
+        if event.type in (TUNNEL_UP, TUNNEL_DOWN) and not self.pending_action:
+            try:
+                pid = int(event.data.get("pid"))
+            except (TypeError, ValueError):
+                pid = None
+            if self.failover:
+                self.failover.mark(event.tag, event.type == TUNNEL_UP)
+            if self.connections.apply(event.tag, event.type == TUNNEL_UP, pid):
+                self.emit(Event.CONNECTIONS, self.connections)
+                state = self.connections.aggregate()
+                if state != self.process_state:
+                    self.process_state = state
+                    self.emit(Event.STATE, ProbeResult(state, f"{event.tag}: {event.type}", returncode_from_state(state)))
+        self.schedule_poll(1.0)
+
+    def publish_transitions(self, before: dict):
+        """Tell bus subscribers about tunnels whose state the last probe changed."""
+        from core.bus import TUNNEL_DOWN, TUNNEL_UP, BusEvent
+        for conn in self.connections:
+            if before.get(conn.tag, ProcessState.INITIAL) == conn.state:
+                continue
+            if conn.state == ProcessState.RUNNING:
+                self.bus.publish(BusEvent(TUNNEL_UP, conn.tag, {"pid": conn.pid, "socks_port": conn.socks_port,
+                                                                "source": "probe"}))
+            elif before.get(conn.tag) == ProcessState.RUNNING:
+                self.bus.publish(BusEvent(TUNNEL_DOWN, conn.tag, {"reason": conn.state.value.lower(),
+                                                                  "source": "probe"}))
+
+    # proxy actions
+
+    def run_action(self, label: str, command, timeout: float, before=None):
+        """
+        Run a state-changing susops command, or a callable returning (output, exit code) like run_susops_command,
+        emitting ACTION before and after and ERROR if it failed. before() runs first, on the same worker.
+        """
+        self.pending_action = label
+        self.poll_scheduler.notify_action()
+        self.emit(Event.ACTION, label)
+
+        def done(result):
+            self.pending_action = None
+            self.pending_handle = None
+            self.emit(Event.ACTION, None)
+            if isinstance(result, Exception):
+                self.emit(Event.ERROR, str(result))
+            elif result.returncode != 0 and not result.cancelled:
+                self.emit(Event.ERROR, result.output)
+            # force a full refresh, views still show the in-flight state
+            self.process_state = ProcessState.INITIAL
+            self.probe_state(then=lambda *_: self.notify_state_action())
+
+        if callable(command):
+            def call():
+                started = time.perf_counter()
+                if before:
+                    before()
+                output, returncode = command()
+                return CommandResult(label, output, returncode, time.perf_counter() - started)
+
+            self.pending_handle = self.executor.call(call, callback=done, label=label)
+        else:
+            self.pending_handle = self.executor.submit(command, done, timeout=timeout, label=label, before=before)
+        return self.pending_handle
+
+    def start_proxy(self):
+        if self.supervisor:
+            return self.run_action("starting", lambda: self.supervisor.up(timeout=60), timeout=60)
+        return self.run_action("starting", "start", timeout=60)
+
+    def stop_proxy(self):
+        ports_flag = "--keep-ports" if not self.config['ephemeral_ports'] else ""
+        reap = self.ssh_pool.reap if self.ssh_pool else None
+        if self.supervisor:
+            return self.run_action("stopping", self.supervisor.down, timeout=30, before=reap)
+        return self.run_action("stopping", f"stop {ports_flag}", timeout=30, before=reap)
+
+    def restart_proxy(self):
+        self.refresh_config()
+        # forwards added live on a master would hold the ports the restarted tunnel binds
+        reap = self.ssh_pool.reap if self.ssh_pool else None
+        if self.supervisor:
+            return self.run_action("restarting", lambda: self.supervisor.restart(timeout=90), timeout=90, before=reap)
+        return self.run_action("restarting", "restart", timeout=90, before=reap)
+
+    def cancel_action(self):
+        if self.pending_handle:
+            self.pending_handle.cancel()
+
+    # tunnel supervisor
+
+    def start_supervisor(self, then=None):
+        """
+        Adopt tunnels left running by an earlier run, on the executor since every adoption is a handshake, then call
+        then(). Nothing new is started until start_proxy().
+        """
+        try:
+            data = ConfigHelper.load()
+        except LookupError:
+            data = {}
+
+        def started(supervisor):
+            if self.stopped:
+                return
+            if isinstance(supervisor, Exception):
+                self.emit(Event.ERROR, f"Could not start the tunnel supervisor: {supervisor}")
+            elif supervisor.balancer:
+                for tag, error in supervisor.balancer.errors().items():
+                    self.emit(Event.ERROR, f"Could not start the pool balancer of {tag}: {error}")
+            if then:
+                then()
+
+        self.executor.call(self.supervisor.start, data, callback=started, label="supervisor")
+
+    def supervisor_event(self, event_type: str, tag: str, data: dict):
+        """Runs on the supervisor thread: handled like the same event arriving on the bus, and published there."""
+        from core.bus import BusEvent
+        event = BusEvent(event_type, tag, data, time.monotonic())
+        if self.bus:
+            self.bus.publish(event)
+        self.dispatch(self.bus_event, event)
+
+    # built-in PAC server
+
+    def start_pac_server(self) -> bool:
+        from core.pac_server import PacServer
+        try:
+            self.pac_server = PacServer(int(self.config['pac_server_port'])).start()
+        except (OSError, ValueError) as e:
+            self.pac_server = None
+            self.emit(Event.ERROR, f"Could not start the built-in PAC server on port {self.config['pac_server_port']}: {e}")
+            return False
+        self.pac_server.refresh()
+        self.prober.pac_check = lambda: self.pac_server is not None and self.pac_server.running
+        return True
+
+    # failover groups
+
+    def sync_failover(self):
+        """Measure the connections' failover groups while the config has any."""
+        try:
+            data = ConfigHelper.load()
+        except LookupError:
+            return
+        if self.failover is None:
+            if not any(isinstance(c, dict) and c.get("group") for c in (data or {}).get("connections") or []):
+                return
+            from core.failover import GroupMonitor, parse_target
+            self.pac_server.compiler.direct = self.config['failover_direct']
+            self.failover = GroupMonitor(lambda chains: self.dispatch(self.apply_failover, chains),
+                                         interval=self.config['failover_interval'],
+                                         target=parse_target(self.config['failover_target']))
+            self.failover.sync(data)
+            self.failover.start()
+            return
+        self.failover.sync(data)
+        if not self.failover.members:
+            self.failover.stop()
+            self.failover = None
+
+    def apply_failover(self, chains: dict):
+        if self.pac_server and not self.stopped:
+            self.pac_server.failover(chains)
+
+    # instrumented relays
+
+    def start_relay_server(self) -> bool:
+        from core.relay import RelayServer
+        try:
+            self.relay_server = RelayServer(int(self.config['metrics_port']), self.config['relay_offset']).start()
+        except (OSError, ValueError) as e:
+            self.relay_server = None
+            self.emit(Event.ERROR, f"Could not start the metrics endpoint on port {self.config['metrics_port']}: {e}")
+            return False
+        self.relay_server.collectors.append(self.poll_metrics)
+        self.sync_relays()
+        return True
+
+    def poll_metrics(self) -> list:
+        """The poll scheduler's stats for the metrics endpoint, as [(name, type, help, value)]."""
+        stats = self.poll_scheduler.stats()
+        metrics = [
+            ("susops_polls_total", "counter", "Status polls since start.", stats["polls_total"]),
+            ("susops_polls_last_hour", "gauge", "Status polls in the last hour.", stats["polls_per_hour"]),
+            ("susops_state_changes_total", "counter", "Proxy state changes seen by polls.", stats["state_changes"]),
+            ("susops_poll_interval_seconds", "gauge", "Seconds until the next poll.", stats["interval"]),
+        ]
+        if stats["detection_latency_last"] is not None:
+            metrics += [
+                ("susops_detection_latency_seconds", "gauge", "Action start to the poll that saw the new state, last.",
+                 round(stats["detection_latency_last"], 6)),
+                ("susops_detection_latency_mean_seconds", "gauge", "The same over the last 100 actions.",
+                 round(stats["detection_latency_mean"], 6)),
+            ]
+        return metrics
+
+    def sync_relays(self):
+        """Follow config changes, and point the built-in PAC at the SOCKS relays."""
+        try:
+            data = ConfigHelper.load()
+        except LookupError:
+            return
+
+        def synced(result):
+            if self.stopped or not self.relay_server:
+                return
+            if isinstance(result, Exception):
+                self.emit(Event.ERROR, f"Could not update the relays: {result}")
+            elif self.pac_server:
+                self.pac_server.route(self.relay_server.socks_ports)
+
+        self.relay_server.sync(data, callback=lambda result: self.dispatch(synced, result))
+
+    def edit_pac_hosts(self, connection, added=(), removed=(), callback=None):
+        """
+        Write pac_hosts in-process and patch the served PAC in place, no CLI call or proxy restart.
+        callback(tx) gets the committed ConfigTransaction, or the exception.
+        """
+        def write():
+            with ConfigHelper.transaction() as tx:
+                if added:
+                    tx.add_pac_hosts(connection, added)
+                if removed:
+                    tx.remove_pac_hosts(connection, removed)
+            return tx
+
+        self.executor.call(write, callback=lambda tx: self.pac_hosts_written(tx, callback), label="pac_hosts")
+
+    def import_pac_hosts(self, connection, entries, callback=None):
+        """
+        Bulk add with duplicates, covered hosts and mergeable CIDRs normalized away (core.host_import), in one write.
+        callback(tx) gets the committed ConfigTransaction, its ImportPlan in tx.imports[connection], or the exception.
+        """
+        def write():
+            with ConfigHelper.transaction() as tx:
+                tx.import_pac_hosts(connection, entries)
+            return tx
+
+        self.executor.call(write, callback=lambda tx: self.pac_hosts_written(tx, callback), label="pac_hosts")
+
+    def pac_hosts_written(self, tx, callback=None):
+        """Patch the served PAC with what a pac_hosts transaction changed."""
+        if isinstance(tx, Exception):
+            self.emit(Event.ERROR, str(tx))
+        elif self.pac_server:
+            for tag in set(tx.added) | set(tx.removed):
+                self.pac_server.update(tag, tx.added.get(tag, ()), tx.removed.get(tag, ()), source=tx.result)
+        if callback:
+            callback(tx)
+
+    @property
+    def patches_pac(self) -> bool:
+        """Host changes go through edit_pac_hosts() instead of the CLI."""
+        return self.pac_server is not None and ConfigHelper.use_cache
+
+    # ssh multiplexing
+
+    def warm_pool(self):
+        """Start the masters in the background so the first test or forward change doesn't wait for them."""
+        if self.ssh_pool and not self.executor.busy("ssh_pool"):
+            self.executor.call(self.ssh_pool.start_all, label="ssh_pool")
+
+    def apply_forward(self, connection: str, flag: str, spec: str, callback=None):
+        """
+        Add a -L/-R forward to the connection's master so it works without a proxy restart.
+        callback((output, returncode)) gets the result, or the exception.
+        """
+        def forward():
+            master = self.ssh_pool.ensure(connection)
+            if master is None:
+                return f"unknown connection {connection}", -1
+            return master.forward(flag, spec)
+
+        self.executor.call(forward, callback=callback, label="ssh_pool")
+
+    @property
+    def forwards_live(self) -> bool:
+        """Forward changes can be applied through the ssh pool instead of a restart."""
+        return self.ssh_pool is not None and self.process_state == ProcessState.RUNNING
+
+    def shutdown(self, stop_proxy: bool = None):
+        """Stop polling, in-flight commands, the servers and the ssh masters; stop the proxy if `stop_on_quit` (or stop_proxy) says so."""
+        self.stopped = True
+        self._poll_generation += 1
+        reaper = None
+        if self.ssh_pool:
+            # `ssh -O exit` per master, in parallel with the rest and bounded so quitting never waits on a dead host
+            reaper = threading.Thread(target=self.ssh_pool.reap, name="susops-reap", daemon=True)
+            reaper.start()
+        self.executor.shutdown()
+        if self.watcher:
+            self.watcher.stop()
+        if self.bus:
+            self.bus.stop()
+        if self.failover:
+            self.failover.stop()
+        if self.pac_server:
+            self.pac_server.stop()
+        if self.relay_server:
+            self.relay_server.stop()
+        if reaper:
+            reaper.join(SHUTDOWN_REAP_TIMEOUT)
+        stop = self.config['stop_on_quit'] if stop_proxy is None else stop_proxy
+        if self.supervisor:
+            # left running, the tunnels are adopted on the next start
+            self.supervisor.stop(kill=stop)
+        elif stop:
+            run_susops_command("stop --keep-ports")
@@ -0,0 +1,80 @@
+"""
+Headless SusOps: SusOpsController on core.loop.MainLoop, without AppKit or rumps, e.g. on Linux jump boxes or in CI.
+
+    python -m core.daemon [--start] [--stop-on-exit] [--once]
+
+Prints one line per state change, proxy action and error. SIGTERM/SIGINT stop it.
+With --once it prints the state like `susops ps` and exits with the same codes.
+"""
+import argparse
+import os
+import signal
+import sys
+import time
+
+from core.controller import Event, SusOpsController
+from core.loop import MainLoop
+from core.state import ProcessState, returncode_from_state
+
+
+def log(event: str, message: str):
+    print(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {event} {message}", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m core.daemon")
+    parser.add_argument("--start", action="store_true", help="start the proxy unless it is already running")
+    parser.add_argument("--stop-on-exit", action="store_true", help="stop the proxy when the daemon exits")
+    parser.add_argument("--once", action="store_true", help="print the current state and exit")
+    args = parser.parse_args(argv)
+
+    loop = MainLoop()
+    # --once only reads the state, without the watcher, the event bus, the servers and the supervisor
+    controller = SusOpsController(loop.call_soon, loop.call_later, watch=not args.once)
+    tunnels = {}
+
+    def listener(event, payload):
+        match event:
+            case Event.STARTED:
+                log(event, f"pid {os.getpid()}")
+                if args.once:
+                    print(payload.output, flush=True)
+                    loop.stop()
+                elif args.start and payload.state != ProcessState.RUNNING:
+                    controller.start_proxy()
+            case Event.STATE:
+                stats = controller.poll_scheduler.stats()
+                detected = stats["detection_latency_last"]
+                log(event, f"{payload.state.value} polls/h={stats['polls_per_hour']} interval={stats['interval']:g}s"
+                           + ("" if detected is None else f" detected_in={detected:.2f}s"))
+            case Event.CONNECTIONS:
+                for conn in payload:
+                    if tunnels.get(conn.tag) != conn.state:
+                        log("tunnel", f"{conn.tag} {conn.state.value} port={conn.socks_port} pid={conn.pid}")
+                tunnels.clear()
+                tunnels.update((conn.tag, conn.state) for conn in payload)
+            case Event.ACTION:
+                log(event, payload or "done")
+            case Event.BUS:
+                fields = " ".join(f"{k}={v}" for k, v in payload.data.items())
+                log(payload.type, " ".join(filter(None, [payload.tag, fields])))
+            case Event.CONFIG_CHANGED:
+                log("config", f"{payload.path} {'changed' if payload.stamp else 'removed'} ({payload.backend})")
+            case Event.ERROR:
+                log(event, payload.replace("\n", " | "))
+            case Event.MISMATCH:
+                log(event, f"native {payload[1].value} cli {payload[2].value}")
+
+    controller.subscribe(listener)
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: loop.stop())
+
+    controller.start()
+    loop.run()
+    controller.shutdown(stop_proxy=args.stop_on_exit)
+    # --once exits like `susops ps`
+    return returncode_from_state(controller.process_state) if args.once else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+import os
+import signal
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+
+from core.commands import susops_path
+
+
+@dataclass
+class CommandResult:
+    command: str
+    output: str
+    returncode: int
+    duration: float
+    timed_out: bool = False
+    cancelled: bool = False
+
+
+class CommandHandle:
+    """A submitted susops command: wraps its future and the running process so it can be cancelled."""
+
+    def __init__(self, command: str, label: str = None):
+        self.command = command
+        self.label = label
+        self.future = Future()
+        self._process = None
+        self._cancelled = False
+        self._lock = threading.Lock()
+
+    def _attach(self, process: subprocess.Popen) -> bool:
+        with self._lock:
+            if self._cancelled:
+                return False
+            self._process = process
+            return True
+
+    def cancel(self):
+        """Cancel before start, or kill the command's whole process group if it is already running."""
+        with self._lock:
+            self._cancelled = True
+            process = self._process
+        if process is None:
+            self.future.cancel()
+        elif process.poll() is None:
+            _kill_group(process)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def result(self, timeout: float = None) -> CommandResult:
+        return self.future.result(timeout)
+
+
+def _kill_group(process: subprocess.Popen):
+    # commands run in their own session, so ssh/autossh children go down with the shell
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(2)
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    except ProcessLookupError:
+        pass
+
+
+class CommandExecutor:
+    """
+    Runs susops commands on a bounded worker pool.
+    Completion callbacks are handed to `dispatch`, e.g. PyObjCTools.AppHelper.callAfter to land on the main run loop.
+    """
+
+    def __init__(self, max_workers: int = 4, dispatch=None, default_timeout: float = 120):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="susops-cmd")
+        self._dispatch = dispatch or (lambda fn, *args: fn(*args))
+        self.default_timeout = default_timeout
+        self._in_flight = []
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> list:
+        with self._lock:
+            return list(self._in_flight)
+
+    def busy(self, label: str = None) -> bool:
+        return any(label is None or h.label == label for h in self.in_flight)
+
+    def submit(self, command: str, callback=None, timeout: float = None, label: str = None,
+               before=None) -> CommandHandle:
+        """Run `susops <command>`, after before() if given, on the worker that runs the command."""
+        handle = CommandHandle(command, label)
+        timeout = self.default_timeout if timeout is None else timeout
+        with self._lock:
+            self._in_flight.append(handle)
+
+        def finished(future: Future):
+            with self._lock:
+                self._in_flight.remove(handle)
+            if future.cancelled():
+                result = CommandResult(command, "Cancelled", -1, 0.0, cancelled=True)
+            else:
+                result = future.result()
+            if callback:
+                self._dispatch(callback, result)
+
+        handle.future.add_done_callback(finished)
+        self._pool.submit(self._run, handle, timeout, before)
+        return handle
+
+    def call(self, fn, *args, callback=None, label: str = None) -> Future:
+        """Run a Python callable on the pool, callback(result_or_exception) is dispatched like command results."""
+        handle = CommandHandle(getattr(fn, "__name__", "call"), label)
+        with self._lock:
+            self._in_flight.append(handle)
+        handle.future = future = self._pool.submit(fn, *args)
+
+        def finished(f: Future):
+            with self._lock:
+                self._in_flight.remove(handle)
+            if callback and not f.cancelled():
+                self._dispatch(callback, f.exception() or f.result())
+
+        future.add_done_callback(finished)
+        return future
+
+    def _run(self, handle: CommandHandle, timeout: float, before=None):
+        if not handle.future.set_running_or_notify_cancel():
+            return
+
+        started = time.perf_counter()
+        if before:
+            try:
+                before()
+            except Exception as e:
+                handle.future.set_result(CommandResult(handle.command, str(e), -1, time.perf_counter() - started))
+                return
+            if handle.cancelled:
+                handle.future.set_result(CommandResult(handle.command, f"Cancelled: susops {handle.command}", -1,
+                                                       time.perf_counter() - started, cancelled=True))
+                return
+        try:
+            process = subprocess.Popen(f"{susops_path()} {handle.command}", shell=True, stdout=subprocess.PIPE,
+                                       stderr=subprocess.DEVNULL, encoding="utf-8", errors="ignore",
+                                       start_new_session=True)
+        except OSError as e:
+            handle.future.set_result(CommandResult(handle.command, str(e), -1, 0.0))
+            return
+
+        if not handle._attach(process):
+            _kill_group(process)
+
+        timed_out = False
+        try:
+            output, _ = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            timed_out = True
+            _kill_group(process)
+            output, _ = process.communicate()
+
+        output = (output or "").strip()
+        if timed_out:
+            output = f"Command timed out after {timeout:g}s: susops {handle.command}\n{output}".strip()
+        elif handle.cancelled:
+            output = f"Cancelled: susops {handle.command}\n{output}".strip()
+        handle.future.set_result(CommandResult(handle.command, output, process.returncode,
+                                               time.perf_counter() - started, timed_out, handle.cancelled))
+
+    def cancel_all(self):
+        for handle in self.in_flight:
+            handle.cancel()
+
+    def shutdown(self, cancel: bool = True):
+        if cancel:
+            self.cancel_all()
+        self._pool.shutdown(wait=False, cancel_futures=cancel)
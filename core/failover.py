@@ -0,0 +1,191 @@
+"""
+Failover groups: connections with the same `group` stand in for each other. Their PAC return value is an ordered
+list, `SOCKS5 127.0.0.1:a; SOCKS5 127.0.0.1:b; DIRECT`, fastest member first, so the browser moves on to the next
+tunnel when one is down instead of stalling until it times out.
+
+    connections:
+      - tag: eu-1
+        group: eu
+        ...
+
+GroupMonitor measures each member's round trip through its tunnel, a SOCKS5 CONNECT to `target` as seen from the
+ssh host (by default 127.0.0.1:22, its own sshd). Samples are smoothed, and a member only moves ahead of another
+when it is faster by a clear margin, so the PAC isn't regenerated on jitter.
+"""
+import asyncio
+import threading
+from dataclasses import dataclass
+
+from core.tester import ProbeKind, TestTarget, run_tests
+
+DEFAULT_TARGET = ("127.0.0.1", 22)
+SMOOTHING = 0.3  # weight of a new sample in the moving average
+# a member moves ahead when it is this much faster, relative and absolute
+MARGIN = 1.2
+MARGIN_MS = 5.0
+
+
+def parse_target(value: str) -> tuple:
+    """"host:port" as (host, port), DEFAULT_TARGET if it doesn't parse."""
+    host, _, port = str(value).rpartition(":")
+    return (host.strip("[]"), int(port)) if host and port.isdigit() else DEFAULT_TARGET
+
+
+def failover_groups(data: dict) -> dict:
+    """{group: {tag: socks port}} in config order, for connections with a `group` and a SOCKS port."""
+    groups = {}
+    for conn in (data or {}).get("connections") or []:
+        if not isinstance(conn, dict) or not conn.get("tag") or not conn.get("group"):
+            continue
+        try:
+            port = int(conn.get("socks_proxy_port") or 0)
+        except (TypeError, ValueError):
+            port = 0
+        if port:
+            groups.setdefault(str(conn["group"]), {}).setdefault(str(conn["tag"]), port)
+    return groups
+
+
+@dataclass
+class Member:
+    tag: str
+    socks_port: int
+    rtt: float = None  # smoothed ms through the tunnel, None until measured
+    up: bool = False
+
+    def record(self, rtt: float):
+        """One sample in ms, None if the tunnel didn't answer."""
+        if rtt is None:
+            self.up = False
+            return
+        self.rtt = rtt if self.rtt is None or not self.up else self.rtt + SMOOTHING * (rtt - self.rtt)
+        self.up = True
+
+
+def clearly_ahead(b: Member, a: Member) -> bool:
+    """b belongs before a: a is down and b isn't, or b is faster by more than the margin."""
+    if not b.up:
+        return False
+    return not a.up or a.rtt > b.rtt * MARGIN + MARGIN_MS
+
+
+def reorder(order: list, members: dict) -> list:
+    """Swap neighbours only where one is clearly ahead, so near-equal members keep their place."""
+    order = list(order)
+    swapped = True
+    while swapped:
+        swapped = False
+        for i in range(len(order) - 1):
+            if clearly_ahead(members[order[i + 1]], members[order[i]]):
+                order[i], order[i + 1] = order[i + 1], order[i]
+                swapped = True
+    return order
+
+
+class GroupMonitor:
+    """
+    Measures every member each `interval` seconds on a daemon thread and calls on_change(chains) when an order
+    changed, chains being {tag: (member tags, fastest first)} for every grouped connection.
+    """
+
+    def __init__(self, on_change, interval: float = 5.0, target: tuple = DEFAULT_TARGET, timeout: float = 2.0):
+        self.on_change = on_change
+        self.interval = interval
+        self.target = target
+        self.timeout = timeout
+        self.members = {}
+        self.orders = {}  # group -> [tags]
+        self.rounds = 0
+        self._source = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def chains(self) -> dict:
+        with self._lock:
+            return {tag: tuple(order) for order in self.orders.values() for tag in order}
+
+    def sync(self, data: dict) -> bool:
+        """Follow the config's groups, keeping the measurements of known members. True if the chains changed."""
+        if data is self._source:
+            return False
+        self._source = data
+        before = self.chains()
+        with self._lock:
+            groups = failover_groups(data)
+            members = {}
+            for ports in groups.values():
+                for tag, port in ports.items():
+                    member = self.members.get(tag)
+                    members[tag] = member if member and member.socks_port == port else Member(tag, port)
+            self.members = members
+            self.orders = {group: reorder([t for t in self.orders.get(group, []) if t in ports]
+                                          + [t for t in ports if t not in self.orders.get(group, [])], members)
+                           for group, ports in groups.items()}
+        return self._changed(before)
+
+    def mark(self, tag: str, up: bool) -> bool:
+        """A tunnel_down (or tunnel_up) pushed ahead of the next measurement. True if the chains changed."""
+        with self._lock:
+            member = self.members.get(tag)
+            if member is None or member.up == up or (up and member.rtt is None):
+                return False
+            member.up = up
+            changed = self._reorder()
+        if changed:
+            self.on_change(self.chains())
+        return changed
+
+    def measure(self) -> bool:
+        """One round over every member. True if an order changed."""
+        with self._lock:
+            members = list(self.members.values())
+        if not members:
+            return False
+        host, port = self.target
+        targets = [TestTarget(ProbeKind.RTT, m.tag, m.tag, host, port, m.socks_port) for m in members]
+        results = asyncio.run(run_tests(targets, timeout=self.timeout))
+        with self._lock:
+            for member, result in zip(members, results):
+                member.record(result.connect_ms if result.ok else None)
+            changed = self._reorder()
+            self.rounds += 1
+        if changed:
+            self.on_change(self.chains())
+        return changed
+
+    def _reorder(self) -> bool:
+        # with the lock held
+        orders = {group: reorder(order, self.members) for group, order in self.orders.items()}
+        changed, self.orders = orders != self.orders, orders
+        return changed
+
+    def _changed(self, before: dict) -> bool:
+        chains = self.chains()
+        if chains == before:
+            return False
+        self.on_change(chains)
+        return True
+
+    # --- lifecycle ---
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self.measure()
+            self._stopped.wait(self.interval)
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="susops-failover", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(self.timeout + 1)
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
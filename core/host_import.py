@@ -0,0 +1,153 @@
+"""
+Bulk host import: a pasted list or file of pac_hosts entries, normalized together with a connection's current hosts
+so the result goes to the config in one write.
+
+Exact duplicates go, and so do hosts a domain or `*.` wildcard already covers (`example.com` covers `a.example.com`
+and `*.a.example.com`, `*.example.com` covers both but not `example.com` itself). Overlapping or adjacent networks
+are merged into the fewest CIDRs covering the same addresses. Shell patterns like `*corp*` are kept as they are, only
+their duplicates go.
+
+IPs inside a listed network stay: the PAC checks them as names, before any connection's networks, so dropping one
+could hand it to an earlier connection with an overlapping network.
+"""
+import bisect
+import ipaddress
+import re
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+from core.pac_compiler import CIDR4, CIDR6, DOMAIN, EXACT, SUBDOMAIN, classify, normalize_entry
+
+_SEPARATORS = re.compile(r"[\s,;]+")
+# what a hostname, wildcard or shell pattern can contain, anything else in a pasted list is junk
+_HOST_CHARS = re.compile(r"[a-z0-9_.*?\[\]-]+")
+
+
+def parse_entries(text: str) -> list:
+    """Entries of a pasted list or file: separated by whitespace, commas or semicolons, `#` comments, URLs as hosts."""
+    entries = []
+    for line in text.splitlines():
+        for token in _SEPARATORS.split(line.split("#", 1)[0]):
+            if "://" in token:
+                try:
+                    token = urlsplit(token).hostname or ""
+                except ValueError:
+                    pass
+            if token:
+                entries.append(token)
+    return entries
+
+
+@dataclass
+class ImportPlan:
+    hosts: list  # the connection's pac_hosts after the import
+    added: list = field(default_factory=list)  # entries that weren't there before
+    removed: list = field(default_factory=list)  # entries that were, now covered or merged
+    duplicates: list = field(default_factory=list)
+    covered: list = field(default_factory=list)  # (entry, the entry covering it)
+    merged: list = field(default_factory=list)  # (entries, the CIDRs replacing them)
+    invalid: list = field(default_factory=list)
+
+    def summary(self) -> str:
+        lines = [f"{len(self.added)} added, {len(self.removed)} removed, {len(self.hosts)} hosts in total"]
+        if self.duplicates:
+            lines.append(f"{len(self.duplicates)} duplicates skipped")
+        if self.covered:
+            lines.append(f"{len(self.covered)} already covered, e.g. {self.covered[0][0]} by {self.covered[0][1]}")
+        for entries, cidrs in self.merged[:5]:
+            lines.append(f"merged {', '.join(entries)} into {', '.join(cidrs)}")
+        if len(self.merged) > 5:
+            lines.append(f"and {len(self.merged) - 5} more merges")
+        if self.invalid:
+            lines.append(f"{len(self.invalid)} invalid: {', '.join(self.invalid[:5])}"
+                         + (" ..." if len(self.invalid) > 5 else ""))
+        return "\n".join(lines)
+
+
+def _parents(domain: str):
+    pos = domain.find(".") + 1
+    while pos:
+        yield domain[pos:]
+        pos = domain.find(".", pos) + 1
+
+
+def _collapse(networks: list) -> list:
+    """[(network, [indexes of the inputs inside it])] for [(index, network)] of one IP version, lowest first."""
+    results = list(ipaddress.collapse_addresses(network for _, network in networks))
+    starts = [int(network.network_address) for network in results]
+    groups = [[] for _ in results]
+    for index, network in networks:
+        groups[bisect.bisect_right(starts, int(network.network_address)) - 1].append(index)
+    return list(zip(results, groups))
+
+
+def plan_import(existing: list, entries: list) -> ImportPlan:
+    """Merge `entries` into the `existing` pac_hosts. Existing entries keep their order and spelling."""
+    plan = ImportPlan([])
+    items = []  # (entry, kind, key) of the first of each (kind, key), key is an ip_network for CIDRs and IPs
+    seen = set()
+    for entry, new in [(str(h), False) for h in existing] + [(str(h), True) for h in entries]:
+        text = normalize_entry(entry)
+        if "/" not in text:
+            text = text.rstrip(".")
+        kind_key = classify(text)
+        if new and kind_key and kind_key[0] not in (CIDR4, CIDR6, EXACT) and not _HOST_CHARS.fullmatch(text):
+            kind_key = None
+        if kind_key is None:
+            if new:
+                plan.invalid.append(entry.strip())
+            else:
+                items.append((entry, None, None))
+            continue
+        kind, key = kind_key
+        if kind in (CIDR4, CIDR6, EXACT):
+            key = ipaddress.ip_network(text, strict=False)
+        if (kind, key) in seen:
+            plan.duplicates.append(entry.strip())
+            continue
+        seen.add((kind, key))
+        items.append((text if new else entry, kind, key))
+
+    dropped = set()
+
+    # domains and wildcards covered by a parent
+    domains = {key for _, kind, key in items if kind == DOMAIN}
+    wildcards = {key for _, kind, key in items if kind == SUBDOMAIN}
+    for index, (entry, kind, key) in enumerate(items):
+        if kind == SUBDOMAIN and key in domains:
+            plan.covered.append((entry, key))
+            dropped.add(index)
+        elif kind in (DOMAIN, SUBDOMAIN):
+            for parent in _parents(key):
+                if parent in domains or parent in wildcards:
+                    plan.covered.append((entry, parent if parent in domains else f"*.{parent}"))
+                    dropped.add(index)
+                    break
+
+    # networks merged into the fewest CIDRs
+    outputs = {}  # index of the first merged entry -> the CIDR taking its place
+    for version in (4, 6):
+        networks = [(i, key) for i, (_, kind, key) in enumerate(items)
+                    if kind in (CIDR4, CIDR6) and key.version == version]
+        for network, group in _collapse(networks) if networks else ():
+            if len(group) == 1 and items[group[0]][2] == network:
+                continue
+            kept = [i for i in group if items[i][2] == network]
+            gone = [i for i in group if i not in kept]
+            dropped.update(gone)
+            if kept:
+                plan.covered.extend((items[i][0], items[kept[0]][0]) for i in gone)
+            else:
+                outputs[gone[0]] = str(network)
+                plan.merged.append(([items[i][0] for i in gone], [str(network)]))
+
+    for index, (entry, _, _) in enumerate(items):
+        if index in outputs:
+            plan.hosts.append(outputs[index])
+        elif index not in dropped:
+            plan.hosts.append(entry)
+    before = {normalize_entry(h) for h in existing}
+    after = {normalize_entry(h) for h in plan.hosts}
+    plan.added = [h for h in plan.hosts if normalize_entry(h) not in before]
+    plan.removed = [str(h) for h in existing if normalize_entry(h) not in after]
+    return plan
@@ -0,0 +1,94 @@
+"""
+Launch-time helpers: the last known icon state and settings, so the menu can be drawn before the config is
+loaded, and optional milestones for benchmarks/bench_launch.py.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+
+from core.config import ConfigHelper
+from core.state import ProcessState
+
+TRACE_ENV = "SUSOPS_LAUNCH_TRACE"
+
+
+@dataclass
+class LaunchState:
+    state: str = ProcessState.STOPPED.value
+    config: dict = field(default_factory=dict)
+
+    @property
+    def process_state(self) -> ProcessState:
+        try:
+            return ProcessState(self.state)
+        except ValueError:
+            return ProcessState.STOPPED
+
+
+class LaunchCache:
+    """Small JSON file next to config.yaml, written only when the cached values change."""
+
+    def __init__(self, path: str = None):
+        self.path = path or os.path.join(ConfigHelper.workspace_path, "app-launch.json")
+        self._saved = None
+
+    def load(self) -> LaunchState:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            launch = LaunchState(str(data.get("state")), dict(data.get("config") or {}))
+        except (OSError, ValueError, AttributeError):
+            return LaunchState()
+        self._saved = launch
+        return launch
+
+    def save(self, state: ProcessState, config: dict):
+        if state == ProcessState.INITIAL:
+            return
+        launch = LaunchState(state.value, dict(config))
+        if launch == self._saved:
+            return
+        tmp_path = None
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=".app-launch.", dir=os.path.dirname(self.path))
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(asdict(launch), f)
+            os.replace(tmp_path, self.path)
+        except (OSError, TypeError, ValueError):
+            # TypeError/ValueError: a config value json can't write
+            if tmp_path:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+            return
+        self._saved = launch
+
+
+class LaunchTrace:
+    """Appends `{"mark": name, "time": epoch}` lines to $SUSOPS_LAUNCH_TRACE, a no-op when it isn't set."""
+
+    def __init__(self, path: str = None):
+        self.path = path if path is not None else os.environ.get(TRACE_ENV)
+        self.marks = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def mark(self, name: str):
+        if not self.path or name in self.marks:
+            return
+        self.marks[name] = time.time()
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"mark": name, "time": self.marks[name], "pid": os.getpid()}) + "\n")
+        except OSError as e:
+            print(f"launch trace: {e}", file=sys.stderr)
+
+
+trace = LaunchTrace()
@@ -0,0 +1,51 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class MainLoop:
+    """
+    Minimal run loop for the headless daemon, standing in for the AppKit main loop.
+    call_soon/call_later are thread-safe, callbacks always run on the thread that called run().
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._queue = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._running = False
+
+    def call_soon(self, fn, *args):
+        self.call_later(0, fn, *args)
+
+    def call_later(self, delay: float, fn, *args):
+        with self._cond:
+            heapq.heappush(self._queue, (self.clock() + max(delay, 0), next(self._counter), fn, args))
+            self._cond.notify()
+
+    def run(self):
+        self._running = True
+        while self._running:
+            with self._cond:
+                if not self._queue:
+                    self._cond.wait()
+                    continue
+                when, _, fn, args = self._queue[0]
+                delay = when - self.clock()
+                if delay > 0:
+                    # sleeps until the next timer, no periodic wake-ups while idle
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._queue)
+            fn(*args)
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
@@ -0,0 +1,161 @@
+"""
+Typed, immutable snapshot of config.yaml: connections, forwards and pac_hosts as slotted dataclasses, indexed by
+connection tag, forward source port and host. Built once per config version and shared by every panel, so they
+bind to these objects instead of formatting display strings and parsing them back.
+"""
+import json
+import os
+import subprocess
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+
+from core.config import ConfigHelper
+
+
+def _port(value) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def host_key(host) -> str:
+    return str(host).strip().lower()
+
+
+def _file_stamp(path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+@dataclass(slots=True, frozen=True)
+class Forward:
+    connection: str  # connection tag
+    tag: str
+    src_port: int
+    dst_port: int
+    src_addr: str = ""
+    dst_addr: str = ""
+
+    def __str__(self):
+        return f"{self.tag} ({self.src_port or ''} → {self.dst_port or ''})"
+
+
+@dataclass(slots=True, frozen=True)
+class LocalForward(Forward):
+    flag = "-l"
+
+
+@dataclass(slots=True, frozen=True)
+class RemoteForward(Forward):
+    flag = "-r"
+
+
+@dataclass(slots=True, frozen=True)
+class PacHost:
+    connection: str
+    host: str
+
+    def __str__(self):
+        return self.host
+
+
+@dataclass(slots=True, frozen=True, eq=False)
+class Connection:
+    tag: str
+    ssh_host: str
+    socks_proxy_port: int
+    # read-only mappings keyed by src_port and host_key() respectively, in config order
+    local_forwards: MappingProxyType
+    remote_forwards: MappingProxyType
+    pac_hosts: MappingProxyType
+
+    def __str__(self):
+        return self.tag
+
+
+class ConfigModel:
+    """
+    All connections of one config document, with O(1) lookups across connections. Read-only: the mappings are
+    MappingProxyType views and the lists tuples, so one instance can be handed to every panel.
+    """
+    __slots__ = ("connections", "local_forwards", "remote_forwards", "pac_hosts", "hosts")
+
+    _lock = threading.Lock()
+    _current = None  # (parsed document or file stamp, model)
+
+    def __init__(self, data: dict = None):
+        connections = {}
+        # first forward per source port and every connection listing a host, like `susops rm` resolves them
+        local_forwards = {}
+        remote_forwards = {}
+        pac_hosts = {}
+        for conn in (data or {}).get("connections") or []:
+            if isinstance(conn, dict) and conn.get("tag") is not None and str(conn["tag"]) not in connections:
+                connection = _build_connection(conn, local_forwards, remote_forwards, pac_hosts)
+                connections[connection.tag] = connection
+        self.connections = MappingProxyType(connections)
+        self.local_forwards = MappingProxyType(local_forwards)
+        self.remote_forwards = MappingProxyType(remote_forwards)
+        self.pac_hosts = MappingProxyType({key: tuple(entries) for key, entries in pac_hosts.items()})
+        # one PacHost per distinct host, in config order
+        self.hosts = tuple(entries[0] for entries in pac_hosts.values())
+
+    def __setattr__(self, name, value):
+        if hasattr(self, name):
+            raise AttributeError(f"ConfigModel is read-only, can't set {name}")
+        object.__setattr__(self, name, value)
+
+    @classmethod
+    def current(cls) -> "ConfigModel":
+        """The snapshot of the config on disk, rebuilt only when the file changes."""
+        try:
+            source = data = ConfigHelper.load()
+        except LookupError:
+            source, data = _file_stamp(ConfigHelper.config_path), None
+        with cls._lock:
+            if cls._current is not None and (cls._current[0] is source or
+                                             isinstance(source, tuple) and cls._current[0] == source):
+                return cls._current[1]
+        model = cls(data if data is not None or source is None else cls._read_yq())
+        with cls._lock:
+            cls._current = (source, model)
+        return model
+
+    @staticmethod
+    def _read_yq() -> dict:
+        # one yq call for the whole document instead of one per query
+        try:
+            output = subprocess.check_output([ConfigHelper.yq_path, "e", "-o=json", ".", ConfigHelper.config_path],
+                                             encoding="utf-8")
+            return json.loads(output) or {}
+        except (OSError, subprocess.CalledProcessError, ValueError):
+            return {}
+
+
+def _build_connection(conn: dict, local_forwards: dict, remote_forwards: dict, pac_hosts: dict) -> Connection:
+    tag = str(conn["tag"])
+    forwards = conn.get("forwards") or {}
+    own = {}
+    for kind, cls, index in (("local", LocalForward, local_forwards), ("remote", RemoteForward, remote_forwards)):
+        items = own[kind] = {}
+        for fwd in forwards.get(kind) or []:
+            if not isinstance(fwd, dict):
+                continue
+            item = cls(tag, str(fwd.get("tag") or ""), _port(fwd.get("src_port", fwd.get("src"))),
+                       _port(fwd.get("dst_port", fwd.get("dst"))), str(fwd.get("src_addr") or ""),
+                       str(fwd.get("dst_addr") or ""))
+            items.setdefault(item.src_port, item)
+            index.setdefault(item.src_port, item)
+    hosts = {}
+    for host in conn.get("pac_hosts") or []:
+        key = host_key(host)
+        if key and key not in hosts:
+            item = hosts[key] = PacHost(tag, str(host).strip())
+            pac_hosts.setdefault(key, []).append(item)
+    return Connection(tag, str(conn.get("ssh_host") or ""), _port(conn.get("socks_proxy_port")),
+                      MappingProxyType(own["local"]), MappingProxyType(own["remote"]), MappingProxyType(hosts))
@@ -0,0 +1,62 @@
+import ipaddress
+
+PROXY_HOST = "127.0.0.1"
+
+
+def socks_return(port: int) -> str:
+    return f"SOCKS5 {PROXY_HOST}:{port}"
+
+
+def host_condition(entry: str) -> str:
+    """JavaScript condition matching one pac_hosts entry."""
+    entry = entry.strip()
+    if "/" in entry:
+        network = ipaddress.ip_network(entry, strict=False)
+        if network.version == 4:
+            return f'isInNet(ip, "{network.network_address}", "{network.netmask}")'
+        return f'isInNetEx(ip, "{network}")'
+    if "*" in entry:
+        return f'shExpMatch(host, "{entry}")'
+    try:
+        ipaddress.ip_address(entry)
+    except ValueError:
+        domain = entry.lstrip(".")
+        return f'(host == "{domain}" || dnsDomainIs(host, ".{domain}"))'
+    return f'host == "{entry}"'
+
+
+def connection_blocks(data: dict) -> list:
+    """(socks port, [pac_hosts]) per connection that has a SOCKS port."""
+    blocks = []
+    for conn in (data or {}).get("connections") or []:
+        if not isinstance(conn, dict):
+            continue
+        try:
+            port = int(conn.get("socks_proxy_port") or 0)
+        except (TypeError, ValueError):
+            port = 0
+        hosts = [str(h) for h in conn.get("pac_hosts") or [] if h]
+        if port and hosts:
+            blocks.append((port, hosts))
+    return blocks
+
+
+def render_pac(data: dict) -> str:
+    """Render FindProxyForURL, checking every entry of every connection in order."""
+    name_rules, ip_rules = [], []
+    for port, hosts in connection_blocks(data):
+        for entry in hosts:
+            try:
+                condition = host_condition(entry)
+            except ValueError:
+                continue
+            rule = f'  if ({condition}) return "{socks_return(port)}";'
+            (ip_rules if "/" in entry else name_rules).append(rule)
+
+    lines = ["function FindProxyForURL(url, host) {", "  host = host.toLowerCase();", *name_rules]
+    if ip_rules:
+        # only resolve when there are network rules, dnsResolve blocks the browser
+        lines += ["  var ip = /^[0-9.]+$/.test(host) || host.indexOf(\":\") >= 0 ? host : dnsResolve(host);",
+                  "  if (!ip) return \"DIRECT\";", *ip_rules]
+    lines += ['  return "DIRECT";', "}", ""]
+    return "\n".join(lines)
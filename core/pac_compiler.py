@@ -0,0 +1,376 @@
+"""
+Compiles the connections' pac_hosts into a PAC file whose lookup cost doesn't grow with the host count.
+
+Every connection is one section of the PAC, checked in config order like the linear PAC:
+
+* domains and `*.domain` wildcards are hash maps keyed by suffix; a lookup checks one key per label of the host
+* IP literals are an exact-match map
+* IPv4 CIDRs are merged into sorted ranges and binary searched, merged once per build or batch of changes
+* entries already covered by a broader entry of the same connection are left out
+
+Sections stay in memory and are re-rendered one at a time, so adding or removing hosts only touches the
+affected connection. Other shell patterns (`foo*.example.com`) and IPv6 networks are rare and stay linear.
+
+Connections in a failover group (core.failover) return their group's chain, `SOCKS5 a; SOCKS5 b; DIRECT`, instead
+of their own port. A new order only re-renders the group's sections.
+"""
+import bisect
+import fnmatch
+import ipaddress
+import json
+
+from core.pac import socks_return
+
+DOMAIN = "domain"  # the domain and its subdomains
+SUBDOMAIN = "subdomain"  # `*.domain`, subdomains only
+EXACT = "exact"  # IP literal
+PATTERN = "pattern"  # other shell expressions
+CIDR4 = "cidr4"
+CIDR6 = "cidr6"
+
+_COMPACT = {"separators": (",", ":")}
+
+
+def normalize_entry(entry) -> str:
+    return str(entry).strip().lower()
+
+
+def classify(entry: str):
+    """(kind, key) of a normalized pac_hosts entry, None if it can't be used."""
+    if not entry:
+        return None
+    if "/" in entry:
+        try:
+            network = ipaddress.ip_network(entry, strict=False)
+        except ValueError:
+            return None
+        if network.version == 4:
+            return CIDR4, (int(network.network_address), int(network.broadcast_address))
+        return CIDR6, str(network)
+    try:
+        ipaddress.ip_address(entry)
+        return EXACT, entry
+    except ValueError:
+        pass
+    if entry.startswith("*.") and not any(c in entry[2:] for c in "*?["):
+        return SUBDOMAIN, entry[2:]
+    if any(c in entry for c in "*?["):
+        return PATTERN, entry
+    return DOMAIN, entry.lstrip(".")
+
+
+def _parent_suffixes(domain: str):
+    pos = domain.find(".") + 1
+    while pos:
+        yield domain[pos:]
+        pos = domain.find(".", pos) + 1
+
+
+def merge_ranges(ranges) -> list:
+    """Merge overlapping or adjacent (start, end) integer ranges."""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(r) for r in merged]
+
+
+class PacSection:
+    """Lookup tables of one connection."""
+
+    def __init__(self, tag: str, proxy: str):
+        self.tag = tag
+        self.proxy = proxy
+        self.entries = {}  # normalized entry -> (kind, key)
+        # visible keys with reference counts, "a.com" and ".a.com" share a key
+        self.visible = {DOMAIN: {}, SUBDOMAIN: {}, EXACT: {}, PATTERN: {}, CIDR6: {}}
+        self.cidrs = {}  # entry -> (start, end)
+        self._ranges = None  # merged (starts, ends), None until the next read after a build or a removed CIDR
+        self.hidden = {}  # entry -> (kind, key) of the entry covering it
+        self.hidden_by = {}  # (kind, key) -> {entries}
+        self._text = None
+
+    def _cover(self, kind: str, key):
+        domains, subdomains = self.visible[DOMAIN], self.visible[SUBDOMAIN]
+        if kind == SUBDOMAIN and key in domains:
+            return DOMAIN, key
+        if kind in (DOMAIN, SUBDOMAIN):
+            for suffix in _parent_suffixes(key):
+                if suffix in domains:
+                    return DOMAIN, suffix
+                if suffix in subdomains:
+                    return SUBDOMAIN, suffix
+        # an IP literal is not covered by a CIDR: it matches before any network rule, also of later connections
+        return None
+
+    def _show(self, entry: str, kind: str, key):
+        cover = self._cover(kind, key)
+        if cover:
+            self.hidden[entry] = cover
+            self.hidden_by.setdefault(cover, set()).add(entry)
+        elif kind == CIDR4:
+            self.cidrs[entry] = key
+            if self._ranges is not None:
+                self._insert_range(*key)
+        else:
+            counts = self.visible[kind]
+            counts[key] = counts.get(key, 0) + 1
+
+    def add(self, entry) -> bool:
+        entry = normalize_entry(entry)
+        classified = classify(entry)
+        if classified is None or entry in self.entries:
+            return False
+        self.entries[entry] = classified
+        # entries made redundant by this one stay visible, that's harmless and the next full build drops them
+        self._show(entry, *classified)
+        self._text = None
+        return True
+
+    def remove(self, entry) -> bool:
+        entry = normalize_entry(entry)
+        classified = self.entries.pop(entry, None)
+        if classified is None:
+            return False
+        self._text = None
+
+        if entry in self.hidden:
+            self.hidden_by[self.hidden.pop(entry)].discard(entry)
+            return True
+
+        kind, key = classified
+        if kind == CIDR4:
+            del self.cidrs[entry]
+            self._ranges = None
+            return True
+        counts = self.visible[kind]
+        counts[key] -= 1
+        if counts[key]:
+            return True
+        del counts[key]
+        restore = self.hidden_by.pop(classified, set())
+
+        # entries hidden behind the removed one reappear, or hide behind the next broader entry
+        for hidden in restore:
+            del self.hidden[hidden]
+            self._show(hidden, *self.entries[hidden])
+        return True
+
+    def ranges(self) -> tuple:
+        """(starts, ends) of the merged IPv4 ranges, merged here so a build or a batch of changes merges once."""
+        if self._ranges is None:
+            ranges = merge_ranges(self.cidrs.values())
+            self._ranges = [r[0] for r in ranges], [r[1] for r in ranges]
+        return self._ranges
+
+    def _insert_range(self, start: int, end: int):
+        """Merge one range into current ranges in place, without merging all of them again."""
+        starts, ends = self._ranges
+        # the ranges overlapping or adjacent to the new one are lo..hi-1, ends are sorted like starts
+        lo = bisect.bisect_left(ends, start - 1)
+        hi = bisect.bisect_right(starts, end + 1)
+        if lo < hi:
+            start, end = min(start, starts[lo]), max(end, ends[hi - 1])
+        starts[lo:hi] = [start]
+        ends[lo:hi] = [end]
+
+    @property
+    def starts(self) -> list:
+        return self.ranges()[0]
+
+    @property
+    def ends(self) -> list:
+        return self.ranges()[1]
+
+    def contains_ip(self, value) -> bool:
+        if value is None:
+            return False
+        starts, ends = self.ranges()
+        i = bisect.bisect_right(starts, value) - 1
+        return i >= 0 and value <= ends[i]
+
+    def match_name(self, host: str, suffixes: list) -> bool:
+        if host in self.visible[EXACT]:
+            return True
+        domains, subdomains = self.visible[DOMAIN], self.visible[SUBDOMAIN]
+        for i, suffix in enumerate(suffixes):
+            if suffix in domains or (i and suffix in subdomains):
+                return True
+        return any(fnmatch.fnmatchcase(host, pattern) for pattern in self.visible[PATTERN])
+
+    def match_ip(self, ip: str) -> bool:
+        addr = ipaddress.ip_address(ip)
+        if addr.version == 6:
+            return any(addr in ipaddress.ip_network(net) for net in self.visible[CIDR6])
+        return self.contains_ip(int(addr))
+
+    @property
+    def has_networks(self) -> bool:
+        return bool(self.starts or self.visible[CIDR6])
+
+    def render(self) -> str:
+        if self._text is None:
+            def js_set(keys):
+                # "." prefix keeps keys like "constructor" away from Object.prototype
+                return json.dumps({"." + k: 1 for k in keys}, **_COMPACT)
+
+            self._text = (
+                f"// {json.dumps(self.tag)}\n"
+                f"C.push([{json.dumps(self.proxy)},"
+                f"{js_set(self.visible[DOMAIN])},{js_set(self.visible[SUBDOMAIN])},{js_set(self.visible[EXACT])},"
+                f"{json.dumps(list(self.visible[PATTERN]), **_COMPACT)},"
+                f"{json.dumps(self.starts, **_COMPACT)},{json.dumps(self.ends, **_COMPACT)},"
+                f"{json.dumps(list(self.visible[CIDR6]), **_COMPACT)}]);\n"
+            )
+        return self._text
+
+
+_JS_LOOKUP = """
+var NETS = false;
+for (var n = 0; n < C.length; n++) if (C[n][5].length || C[n][7].length) NETS = true;
+
+function FindProxyForURL(url, host) {
+  host = host.toLowerCase();
+  var keys = [], pos = 0, c, s, i;
+  while (true) {
+    keys.push("." + host.substring(pos));
+    pos = host.indexOf(".", pos) + 1;
+    if (pos === 0) break;
+  }
+  for (c = 0; c < C.length; c++) {
+    s = C[c];
+    if (s[1][keys[0]] || s[3][keys[0]]) return s[0];
+    for (i = 1; i < keys.length; i++) {
+      if (s[1][keys[i]] || s[2][keys[i]]) return s[0];
+    }
+    for (i = 0; i < s[4].length; i++) {
+      if (shExpMatch(host, s[4][i])) return s[0];
+    }
+  }
+  if (!NETS) return "DIRECT";
+  var ip = /^[0-9.]+$/.test(host) || host.indexOf(":") >= 0 ? host : dnsResolve(host);
+  if (!ip) return "DIRECT";
+  if (ip.indexOf(":") >= 0) {
+    for (c = 0; c < C.length; c++) {
+      for (i = 0; i < C[c][7].length; i++) {
+        if (isInNetEx(ip, C[c][7][i])) return C[c][0];
+      }
+    }
+    return "DIRECT";
+  }
+  var o = ip.split(".");
+  var v = ((+o[0]) * 16777216) + ((+o[1]) << 16) + ((+o[2]) << 8) + (+o[3]);
+  for (c = 0; c < C.length; c++) {
+    var S = C[c][5], T = C[c][6], lo = 0, hi = S.length - 1;
+    while (lo <= hi) {
+      var mid = (lo + hi) >> 1;
+      if (v < S[mid]) hi = mid - 1;
+      else if (v > T[mid]) lo = mid + 1;
+      else return C[c][0];
+    }
+  }
+  return "DIRECT";
+}
+"""
+
+
+class PacCompiler:
+    """All sections of the PAC, built from a config and then patched per connection."""
+
+    def __init__(self, data: dict = None, socks_ports: dict = None, chains: dict = None, direct: bool = True):
+        self.sections = {}
+        # {tag: port} overriding socks_proxy_port, e.g. the instrumented relays of core.relay
+        self.socks_ports = socks_ports or {}
+        # {tag: (tags, fastest first)} of failover groups, ending in DIRECT if `direct`
+        self.chains = chains or {}
+        self.direct = direct
+        self.ports = {}  # effective SOCKS port per tag
+        if data is not None:
+            self.build(data)
+
+    def proxy(self, tag: str) -> str:
+        chain = [self.ports[t] for t in self.chains.get(tag, ()) if t in self.ports]
+        if not chain:
+            return socks_return(self.ports[tag])
+        return "; ".join([socks_return(port) for port in chain] + (["DIRECT"] if self.direct else []))
+
+    def build(self, data: dict):
+        self.sections = {}
+        self.ports = {}
+        connections = [c for c in (data or {}).get("connections") or [] if isinstance(c, dict) and c.get("tag")]
+        for conn in connections:
+            try:
+                port = int(conn.get("socks_proxy_port") or 0)
+            except (TypeError, ValueError):
+                port = 0
+            tag = str(conn["tag"])
+            if port and tag not in self.ports:
+                self.ports[tag] = self.socks_ports.get(tag, port)
+        for conn in connections:
+            tag = str(conn["tag"])
+            if tag not in self.ports or tag in self.sections:
+                continue
+            section = self.sections[tag] = PacSection(tag, self.proxy(tag))
+            # broad entries first, so narrower ones are hidden behind them straight away
+            for host in sorted((normalize_entry(h) for h in conn.get("pac_hosts") or [] if h),
+                               key=lambda h: h.count(".")):
+                section.add(host)
+        return self
+
+    def set_chains(self, chains: dict) -> list:
+        """Switch to new failover chains, returns the tags whose return value changed."""
+        self.chains = chains
+        changed = []
+        for tag, section in self.sections.items():
+            proxy = self.proxy(tag)
+            if proxy != section.proxy:
+                section.proxy, section._text = proxy, None
+                changed.append(tag)
+        return changed
+
+    def add_hosts(self, tag: str, hosts) -> list:
+        """Add entries to one connection, returns the ones that were new. A CIDR costs a bisect, not a re-merge."""
+        section = self.sections.get(tag)
+        return [h for h in hosts if section.add(h)] if section else []
+
+    def remove_hosts(self, tag: str, hosts) -> list:
+        """Remove entries from one connection. The IPv4 ranges are merged again once, on the next lookup or render."""
+        section = self.sections.get(tag)
+        return [h for h in hosts if section.remove(h)] if section else []
+
+    @property
+    def hidden(self) -> list:
+        """Entries left out because a broader entry of the same connection covers them."""
+        return [entry for section in self.sections.values() for entry in section.hidden]
+
+    def render(self) -> str:
+        return "var C = [];\n" + "".join(s.render() for s in self.sections.values()) + _JS_LOOKUP
+
+    # Python reference evaluator, same algorithm as the generated JavaScript
+    def find_proxy(self, host: str, resolve=lambda host: None) -> str:
+        host = host.lower()
+        suffixes, pos = [], 0
+        while True:
+            suffixes.append(host[pos:])
+            pos = host.find(".", pos) + 1
+            if not pos:
+                break
+        for section in self.sections.values():
+            if section.match_name(host, suffixes):
+                return section.proxy
+        if not any(s.has_networks for s in self.sections.values()):
+            return "DIRECT"
+        try:
+            ipaddress.ip_address(host)
+            ip = host
+        except ValueError:
+            ip = resolve(host)
+        if not ip:
+            return "DIRECT"
+        return next((s.proxy for s in self.sections.values() if s.match_ip(ip)), "DIRECT")
+
+
+def compile_pac(data: dict) -> str:
+    return PacCompiler(data).render()
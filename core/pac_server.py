@@ -0,0 +1,240 @@
+import asyncio
+import gzip
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+
+from core.config import ConfigHelper
+from core.pac_compiler import PacCompiler
+
+PAC_CONTENT_TYPE = "application/x-ns-proxy-autoconfig"
+MAX_HEADER_BYTES = 16 * 1024
+
+
+@dataclass(frozen=True)
+class PacDocument:
+    """One rendered PAC version. Replaced as a whole, so readers never see a half-updated document."""
+    body: bytes
+    gzip_body: bytes
+    etag: str
+    version: int
+
+    @classmethod
+    def build(cls, text: str, version: int) -> "PacDocument":
+        body = text.encode("utf-8")
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        return cls(body, gzip.compress(body, compresslevel=6, mtime=0), etag, version)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # weak comparison, W/ prefixes are fine for a GET
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+class PacServer:
+    """
+    Serves the PAC file from memory on an asyncio loop in a background thread.
+    Bytes are rendered and gzipped once per change. Clients revalidate with If-None-Match and usually get a 304.
+    Host changes made through update() patch only the affected connection's section.
+    """
+
+    def __init__(self, port: int, host: str = "127.0.0.1"):
+        self.host = host
+        self.port = port
+        self.compiler = PacCompiler()
+        self.document = PacDocument.build(self.compiler.render(), 0)
+        self.requests = 0
+        self.not_modified = 0
+        self._source = None
+        # bumped whenever the compiler is replaced, patched or re-routed, so install() drops stale compiles
+        self._generation = 0
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._error = None
+
+    # --- content ---
+
+    def publish(self, text: str) -> PacDocument:
+        document = PacDocument.build(text, self.document.version + 1)
+        if document.etag != self.document.etag:
+            self.document = document
+        return self.document
+
+    def refresh(self) -> bool:
+        """Re-render from the cached config if it was re-parsed since the last call. Returns True if published."""
+        return self.install(self.compile())
+
+    def compile(self):
+        """
+        The slow half of refresh(), safe to run on a worker: parse and compile the cached config into a new compiler.
+        Returns what install() takes, None if the config wasn't re-parsed since the last install.
+        """
+        try:
+            data = ConfigHelper.load()
+        except LookupError:
+            return None
+        if data is self._source:
+            return None
+        generation, compiler = self._generation, self.compiler
+        compiled = PacCompiler(data or {}, dict(compiler.socks_ports), compiler.chains, compiler.direct)
+        return generation, data, compiled, compiled.render()
+
+    def install(self, compiled) -> bool:
+        """Publish a compile() result, unless the compiler changed since it started. Returns True if published."""
+        if compiled is None:
+            return False
+        generation, data, compiler, text = compiled
+        if generation != self._generation:
+            return False
+        if compiler.chains is not self.compiler.chains:
+            # failover reordered the groups meanwhile
+            compiler.set_chains(self.compiler.chains)
+            text = compiler.render()
+        self.compiler, self._source = compiler, data
+        self._generation += 1
+        previous = self.document
+        return self.publish(text) is not previous
+
+    def route(self, socks_ports: dict) -> bool:
+        """Point connections at other SOCKS ports ({tag: port}, e.g. relays) and rebuild. True if published."""
+        if socks_ports == self.compiler.socks_ports:
+            return False
+        self.compiler.socks_ports = dict(socks_ports)
+        self._source = None
+        self._generation += 1
+        return self.refresh()
+
+    def failover(self, chains: dict) -> bool:
+        """Order failover groups by `chains` (core.failover), re-rendering only their sections. True if published."""
+        if not self.compiler.set_chains(chains):
+            return False
+        previous = self.document
+        return self.publish(self.compiler.render()) is not previous
+
+    def update(self, tag: str, added=(), removed=(), source=None) -> bool:
+        """
+        Patch one connection's hosts without a full rebuild and publish the result as a new version.
+        source is the document written by ConfigHelper.commit() for this change; while it is still the cached
+        config, refresh() has nothing left to rebuild.
+        """
+        changed = self.compiler.remove_hosts(tag, removed) + self.compiler.add_hosts(tag, added)
+        if changed:
+            self._generation += 1
+        try:
+            if source is not None and ConfigHelper.load() is source:
+                self._source = source
+        except LookupError:
+            pass
+        if not changed:
+            return False
+        previous = self.document
+        return self.publish(self.compiler.render()) is not previous
+
+    # --- HTTP ---
+
+    def _response(self, status: str, headers: dict, body: bytes = b"") -> bytes:
+        head = [f"HTTP/1.1 {status}"] + [f"{k}: {v}" for k, v in headers.items()]
+        return ("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body
+
+    def handle(self, method: str, headers: dict) -> bytes:
+        self.requests += 1
+        document = self.document
+        common = {
+            "ETag": document.etag,
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+            "Date": time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime()),
+        }
+        if method not in ("GET", "HEAD"):
+            return self._response("405 Method Not Allowed", {"Allow": "GET, HEAD", "Content-Length": "0"})
+
+        if_none_match = headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, document.etag):
+            self.not_modified += 1
+            return self._response("304 Not Modified", common)
+
+        body = document.body
+        if "gzip" in headers.get("accept-encoding", ""):
+            body = document.gzip_body
+            common["Content-Encoding"] = "gzip"
+        common["Content-Type"] = PAC_CONTENT_TYPE
+        common["Content-Length"] = str(len(body))
+        return self._response("200 OK", common, b"" if method == "HEAD" else body)
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    raw = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.LimitOverrunError:
+                    break
+                lines = raw.decode("latin-1").split("\r\n")
+                parts = lines[0].split(" ")
+                if len(parts) != 3:
+                    break
+                method, _, version = parts
+                headers = {}
+                for line in lines[1:]:
+                    name, sep, value = line.partition(":")
+                    if sep:
+                        headers[name.strip().lower()] = value.strip()
+
+                writer.write(self.handle(method, headers))
+                await writer.drain()
+
+                connection = headers.get("connection", "").lower()
+                if connection == "close" or (version == "HTTP/1.0" and connection != "keep-alive"):
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    # --- lifecycle ---
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._client, self.host, self.port, limit=MAX_HEADER_BYTES, reuse_address=True,
+                                     backlog=1024))
+            self.port = self._server.sockets[0].getsockname()[1]
+        except OSError as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+    def start(self):
+        """Bind and serve in a daemon thread. Raises OSError if the port is taken."""
+        self._ready.clear()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="susops-pac", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error:
+            raise self._error
+        return self
+
+    def stop(self):
+        if self._loop and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread:
+            self._thread.join(5)
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
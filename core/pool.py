@@ -0,0 +1,173 @@
+"""
+Connection pools: with `pool: N` the supervisor runs N ssh tunnels to the connection's host, each on its own
+ephemeral SOCKS port, and PoolBalancer listens on the connection's socks_proxy_port in front of them.
+
+    connections:
+      - tag: mirror
+        ssh_host: build-box
+        socks_proxy_port: 1090
+        pool: 4
+
+One ssh connection is one TCP stream, and every SOCKS stream through it shares that stream's congestion and
+channel window, which caps a tunnel over a long or lossy path well below the link. N tunnels have N windows. The
+balancer is plain TCP and hands each new client connection to the member with the fewest open streams, so a single
+download still runs through one tunnel, parallel ones are spread.
+"""
+import asyncio
+import itertools
+import socket
+import threading
+from collections import Counter
+
+CHUNK = 256 * 1024
+
+
+class Pool:
+    """One listening port and its members, only ever touched on the balancer loop."""
+
+    def __init__(self, tag: str, port: int):
+        self.tag = tag
+        self.port = port
+        self.members = []  # SOCKS ports of the members that are up
+        self.active = Counter()  # member SOCKS port -> open streams
+        self.server = None
+        self.error = None
+        self.tasks = set()
+        self.total = 0
+        self.failures = 0
+        self._turn = itertools.count()
+
+    async def start(self):
+        try:
+            self.server = await asyncio.start_server(self.handle, "127.0.0.1", self.port,
+                                                     reuse_address=True, backlog=1024, limit=CHUNK)
+        except OSError as e:
+            self.error = e
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        for task in list(self.tasks):
+            task.cancel()
+
+    def candidates(self) -> list:
+        """Member ports to try, fewest open streams first, ties taking turns."""
+        ports = self.members
+        if not ports:
+            return []
+        shift = next(self._turn) % len(ports)
+        return sorted(ports[shift:] + ports[:shift], key=self.active.__getitem__)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self.tasks.add(task)
+        self.total += 1
+        upstream = port = None
+        try:
+            for port in self.candidates():
+                try:
+                    up_reader, upstream = await asyncio.open_connection("127.0.0.1", port, limit=CHUNK)
+                    break
+                except OSError:
+                    continue
+            if upstream is None:
+                self.failures += 1
+                return
+            self.active[port] += 1
+            for stream in (writer, upstream):
+                stream.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            try:
+                await asyncio.gather(pipe(reader, upstream), pipe(up_reader, writer))
+            finally:
+                self.active[port] -= 1
+        except (OSError, asyncio.CancelledError):
+            pass
+        finally:
+            self.tasks.discard(task)
+            for stream in (writer, upstream):
+                if stream:
+                    stream.close()
+
+
+async def pipe(src: asyncio.StreamReader, dst: asyncio.StreamWriter):
+    try:
+        while data := await src.read(CHUNK):
+            dst.write(data)
+            await dst.drain()
+        if dst.can_write_eof():
+            dst.write_eof()
+    except OSError:
+        pass
+
+
+class PoolBalancer:
+    """Every pool's listener on one asyncio loop in a daemon thread, like RelayServer. Methods are thread-safe."""
+
+    def __init__(self):
+        self.pools = {}
+        self._loop = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    def sync(self, ports: dict) -> bool:
+        """Serve {connection tag: port}: new pools start listening, gone or moved ones stop. True if changed."""
+        return self._call(self._sync(dict(ports)))
+
+    async def _sync(self, ports: dict) -> bool:
+        gone = [tag for tag, pool in self.pools.items() if ports.get(tag) != pool.port]
+        for tag in gone:
+            await self.pools.pop(tag).stop()
+        new = [tag for tag in ports if tag not in self.pools]
+        for tag in new:
+            pool = self.pools[tag] = Pool(tag, ports[tag])
+            await pool.start()
+        return bool(gone or new)
+
+    def set_members(self, tag: str, ports):
+        """The SOCKS ports of the pool's members that are up now. New connections only go to these."""
+        self._loop.call_soon_threadsafe(self._set_members, tag, list(ports))
+
+    def _set_members(self, tag: str, ports: list):
+        pool = self.pools.get(tag)
+        if pool is not None:
+            pool.members = ports
+
+    def errors(self) -> dict:
+        """{connection tag: OSError} of the pools that couldn't bind their port."""
+        return {tag: pool.error for tag, pool in list(self.pools.items()) if pool.error}
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result(10)
+
+    # --- lifecycle ---
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            for pool in self.pools.values():
+                self._loop.run_until_complete(pool.stop())
+            self._loop.close()
+
+    def start(self):
+        self._ready.clear()
+        self._thread = threading.Thread(target=self._run, name="susops-pool", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread:
+            self._thread.join(5)
+        self._thread = None
+        self.pools = {}
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
@@ -0,0 +1,242 @@
+import errno
+import os
+import selectors
+import socket
+import subprocess
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+from core.commands import run_susops_command
+from core.config import ConfigHelper
+from core.state import ProcessState, aggregate_state, returncode_from_state, state_from_returncode
+
+MAX_MISMATCHES = 100
+SOCKS5_GREETING = b"\x05\x01\x00"  # version 5, one auth method: no authentication
+
+
+class ProbeMode:
+    NATIVE = "native"
+    CLI = "cli"
+    VERIFY = "verify"
+
+
+@dataclass
+class ProbeResult:
+    state: ProcessState
+    output: str
+    returncode: int
+    # native probes only: one ConnectionProbe per tunnel, and the PAC server
+    connections: list = field(default_factory=list)
+    pac_running: bool = None
+    # verify probes only: (time, native state, CLI state) when the two disagreed
+    mismatch: tuple = None
+
+
+@dataclass
+class ConnectionProbe:
+    tag: str
+    socks_port: int = 0
+    pid: int = None
+    alive: bool = False
+    latency: float = None  # SOCKS5 handshake round trip in seconds
+    started: float = None  # mtime of the pidfile, i.e. when the tunnel was started
+
+    @property
+    def running(self) -> bool:
+        if not self.alive:
+            return False
+        # ports are only known once assigned, fall back to the pid check
+        return not self.socks_port or self.latency is not None
+
+
+def read_pidfile(path: str):
+    try:
+        with open(path, "r") as f:
+            return int(f.read().strip().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def pid_alive(pid) -> bool:
+    if not pid or pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        # EPERM: process exists but belongs to someone else
+        return e.errno == errno.EPERM
+    return True
+
+
+def port_open(port: int, host: str = "127.0.0.1", timeout: float = 0.5) -> bool:
+    """Something accepts connections on the port, e.g. the PAC server of the app or daemon already running."""
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except (OSError, OverflowError):
+        return False
+
+
+def socks5_handshake(ports, host: str = "127.0.0.1", timeout: float = 0.5) -> dict:
+    """
+    Greet every port concurrently with non-blocking sockets.
+    Returns {port: handshake latency in seconds, or None if the port doesn't speak SOCKS5}.
+    """
+    results = {port: None for port in ports}
+    sel = selectors.DefaultSelector()
+    started = {}
+    for port in results:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        err = sock.connect_ex((host, port))
+        if err not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+            sock.close()
+            continue
+        started[port] = time.perf_counter()
+        sel.register(sock, selectors.EVENT_WRITE, port)
+
+    deadline = time.perf_counter() + timeout
+    try:
+        while sel.get_map():
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            for key, events in sel.select(remaining):
+                sock, port = key.fileobj, key.data
+                if events & selectors.EVENT_WRITE:
+                    if sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) != 0:
+                        sel.unregister(sock)
+                        sock.close()
+                        continue
+                    try:
+                        sock.send(SOCKS5_GREETING)
+                    except OSError:
+                        sel.unregister(sock)
+                        sock.close()
+                        continue
+                    sel.modify(sock, selectors.EVENT_READ, port)
+                else:
+                    try:
+                        reply = sock.recv(2)
+                    except OSError:
+                        reply = b""
+                    # 0xFF means "no acceptable method" - still a SOCKS5 server, but unusable
+                    if len(reply) == 2 and reply[0] == 5 and reply[1] != 0xFF:
+                        results[port] = time.perf_counter() - started[port]
+                    sel.unregister(sock)
+                    sock.close()
+    finally:
+        for key in list(sel.get_map().values()):
+            key.fileobj.close()
+        sel.close()
+    return results
+
+
+@dataclass
+class StateProber:
+    """Works out the proxy state from pidfiles and SOCKS5 handshakes instead of spawning `susops ps`."""
+
+    workspace_path: str = ConfigHelper.workspace_path
+    socks_pidfile: str = "susops-ssh-{tag}.pid"
+    pac_pidfile: str = "susops-pac.pid"
+    handshake_timeout: float = 0.5
+    # replaces the pidfile check when the PAC file is served in-process
+    pac_check: object = None
+    # the last MAX_MISMATCHES disagreements of verify(), as (time, native state, CLI state)
+    mismatches: deque = field(default_factory=lambda: deque(maxlen=MAX_MISMATCHES))
+
+    @property
+    def pid_dir(self) -> str:
+        return os.path.join(self.workspace_path, "pids")
+
+    def connections(self) -> list:
+        data = ConfigHelper.load() or {}
+        connections = data.get("connections") or []
+        return [c for c in connections if isinstance(c, dict) and c.get("tag")]
+
+    def probe_connections(self, connections: list) -> list:
+        probes = []
+        for conn in connections:
+            tag = str(conn["tag"])
+            pidfile = os.path.join(self.pid_dir, self.socks_pidfile.format(tag=tag))
+            pid = read_pidfile(pidfile)
+            try:
+                port = int(conn.get("socks_proxy_port") or 0)
+            except (TypeError, ValueError):
+                port = 0
+            probe = ConnectionProbe(tag=tag, socks_port=port, pid=pid, alive=pid_alive(pid))
+            if probe.alive:
+                try:
+                    probe.started = os.stat(pidfile).st_mtime
+                except OSError:
+                    pass
+            probes.append(probe)
+
+        # handshakes run concurrently with one shared timeout, a poll costs the slowest tunnel rather than the sum
+        ports = {p.socks_port for p in probes if p.alive and p.socks_port}
+        latencies = socks5_handshake(ports, timeout=self.handshake_timeout) if ports else {}
+        for p in probes:
+            p.latency = latencies.get(p.socks_port)
+        return probes
+
+    def probe(self) -> ProbeResult:
+        try:
+            connections = self.connections()
+        except LookupError as e:
+            return ProbeResult(ProcessState.ERROR, f"Error reading config: {e}", 1)
+        if not connections:
+            return ProbeResult(ProcessState.ERROR, "no default connection found", 1)
+
+        probes = self.probe_connections(connections)
+        if self.pac_check:
+            pac_pid, pac_running = os.getpid(), self.pac_check()
+        else:
+            pac_pid = read_pidfile(os.path.join(self.pid_dir, self.pac_pidfile))
+            pac_running = pid_alive(pac_pid)
+
+        lines = []
+        for p in probes:
+            if p.running:
+                latency = f", {p.latency * 1000:.1f} ms" if p.latency is not None else ""
+                lines.append(f"{p.tag}: running (pid {p.pid}, SOCKS port {p.socks_port}{latency})")
+            elif p.alive:
+                lines.append(f"{p.tag}: not responding (pid {p.pid}, SOCKS port {p.socks_port})")
+            else:
+                lines.append(f"{p.tag}: stopped")
+        lines.append(f"PAC server: {'running (pid %d)' % pac_pid if pac_running else 'stopped'}")
+
+        state = aggregate_state([p.running for p in probes] + [pac_running])
+        return ProbeResult(state, "\n".join(lines), returncode_from_state(state), probes, pac_running)
+
+    @staticmethod
+    def probe_cli() -> ProbeResult:
+        try:
+            output, returncode = run_susops_command("ps")
+        except subprocess.SubprocessError:
+            output, returncode = "Error running command", -1
+
+        if not output:
+            returncode = -1
+        return ProbeResult(state_from_returncode(returncode), output, returncode)
+
+    def verify(self) -> ProbeResult:
+        """Run both probes, record disagreements on the result and in `mismatches`, and trust the CLI."""
+        native = self.probe()
+        cli = self.probe_cli()
+        if native.state != cli.state:
+            cli.mismatch = (time.time(), native.state, cli.state)
+            self.mismatches.append(cli.mismatch)
+        return cli
+
+    def run(self, mode: str = ProbeMode.NATIVE) -> ProbeResult:
+        if not ConfigHelper.use_cache:
+            # the native probe needs the parsed config
+            mode = ProbeMode.CLI
+        match mode:
+            case ProbeMode.CLI:
+                return self.probe_cli()
+            case ProbeMode.VERIFY:
+                return self.verify()
+            case _:
+                return self.probe()
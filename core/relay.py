@@ -0,0 +1,313 @@
+"""
+Optional instrumented TCP relays in front of each connection's SOCKS port and each local forward, plus a
+Prometheus text endpoint with their counters.
+
+A relay listens on the relayed port + `offset` and forwards to the real port unchanged. With the built-in PAC
+server, the PAC file points browsers at the SOCKS relays, so their traffic is counted without further setup.
+"""
+import asyncio
+import bisect
+import socket
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+
+SOCKS = "socks"
+LOCAL_FORWARD = "local_forward"
+
+# upper bounds in seconds of the connection setup histogram
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+CHUNK = 256 * 1024
+
+
+@dataclass(frozen=True)
+class RelaySpec:
+    tunnel: str  # connection tag
+    kind: str
+    name: str  # forward tag, or "socks"
+    listen_port: int
+    target_port: int
+    target_host: str = "127.0.0.1"
+
+
+class RelayMetrics:
+    """Fixed-size counters of one relay, only ever touched on the relay loop."""
+    __slots__ = ("bytes_in", "bytes_out", "active", "total", "failures", "buckets", "latency_sum")
+
+    def __init__(self):
+        self.bytes_in = 0  # from clients into the tunnel
+        self.bytes_out = 0  # from the tunnel back to clients
+        self.active = 0
+        self.total = 0
+        self.failures = 0
+        # one slot per bucket plus +Inf, not cumulative
+        self.buckets = array("Q", bytes(8 * (len(LATENCY_BUCKETS) + 1)))
+        self.latency_sum = 0.0
+
+    def observe(self, seconds: float):
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.latency_sum += seconds
+
+
+def relay_specs(data: dict, offset: int) -> list:
+    """A relay for every connection's SOCKS port and every local forward, at port + offset."""
+    specs = []
+    for conn in (data or {}).get("connections") or []:
+        if not isinstance(conn, dict) or not conn.get("tag"):
+            continue
+        tag = str(conn["tag"])
+        ports = [(SOCKS, SOCKS, conn.get("socks_proxy_port"), "127.0.0.1")]
+        forwards = conn.get("forwards") if isinstance(conn.get("forwards"), dict) else {}
+        for fwd in forwards.get("local") or []:
+            if not isinstance(fwd, dict):
+                continue
+            src = fwd.get("src_port", fwd.get("src"))
+            addr = fwd.get("src_addr") or "127.0.0.1"
+            ports.append((LOCAL_FORWARD, str(fwd.get("tag") or src), src, "127.0.0.1" if addr == "0.0.0.0" else addr))
+        for kind, name, port, host in ports:
+            try:
+                port = int(port or 0)
+            except (TypeError, ValueError):
+                continue
+            if port and port + offset <= 65535:
+                specs.append(RelaySpec(tag, kind, name, port + offset, port, host))
+    return specs
+
+
+class Relay:
+    def __init__(self, spec: RelaySpec):
+        self.spec = spec
+        self.metrics = RelayMetrics()
+        self.server = None
+        self.error = None
+        self.tasks = set()
+        # upstream bytes after which setup is complete: the SOCKS CONNECT reply follows the 2 byte method reply
+        self.setup_bytes = 3 if spec.kind == SOCKS else 1
+
+    async def start(self):
+        self.error = None
+        try:
+            self.server = await asyncio.start_server(self.handle, "127.0.0.1", self.spec.listen_port,
+                                                     reuse_address=True, backlog=1024, limit=CHUNK)
+        except OSError as e:
+            self.error = e
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        for task in list(self.tasks):
+            task.cancel()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self.tasks.add(task)
+        metrics = self.metrics
+        metrics.total += 1
+        metrics.active += 1
+        accepted = time.perf_counter()
+        upstream = None
+        try:
+            up_reader, upstream = await asyncio.open_connection(self.spec.target_host, self.spec.target_port,
+                                                                limit=CHUNK)
+        except OSError:
+            metrics.failures += 1
+        try:
+            if upstream:
+                for stream in (writer, upstream):
+                    stream.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                await asyncio.gather(self.pipe(reader, upstream, None), self.pipe(up_reader, writer, accepted))
+        except (OSError, asyncio.CancelledError):
+            pass
+        finally:
+            metrics.active -= 1
+            self.tasks.discard(task)
+            for stream in (writer, upstream):
+                if stream:
+                    stream.close()
+
+    async def pipe(self, src: asyncio.StreamReader, dst: asyncio.StreamWriter, accepted):
+        """Copy one direction. `accepted` is set for the upstream to client side, which also times the setup."""
+        metrics = self.metrics
+        received = 0
+        try:
+            while data := await src.read(CHUNK):
+                dst.write(data)
+                if accepted is None:
+                    metrics.bytes_in += len(data)
+                else:
+                    metrics.bytes_out += len(data)
+                    if received < self.setup_bytes <= received + len(data):
+                        metrics.observe(time.perf_counter() - accepted)
+                    received += len(data)
+                await dst.drain()
+            if dst.can_write_eof():
+                dst.write_eof()
+        except OSError:
+            pass
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(spec: RelaySpec, **extra) -> str:
+    labels = {"tunnel": spec.tunnel, "kind": spec.kind, "name": spec.name, "port": spec.target_port, **extra}
+    return ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+
+
+class RelayServer:
+    """All relays and the /metrics endpoint on one asyncio loop in a daemon thread, like PacServer."""
+
+    def __init__(self, metrics_port: int = 9105, offset: int = 10000, host: str = "127.0.0.1"):
+        self.host = host
+        self.metrics_port = metrics_port
+        self.offset = offset
+        self.relays = {}
+        self.scrapes = 0
+        # callables returning more metrics as [(name, type, help, value)], called on the relay thread per scrape
+        self.collectors = []
+        self._source = None
+        self._loop = None
+        self._thread = None
+        self._server = None
+        self._ready = threading.Event()
+        self._error = None
+        self._sync_lock = None
+
+    # --- relays ---
+
+    def sync(self, data: dict, callback=None):
+        """
+        Start relays for new SOCKS ports and local forwards, stop the ones that are gone, without waiting for it.
+        callback(changed or exception) is called on the relay loop once done. Relays that could not bind are retried
+        on the next sync, even for the same data. Returns the concurrent.futures.Future, None if nothing to do.
+        """
+        if data is self._source and not any(r.error for r in list(self.relays.values())):
+            return None
+        self._source = data
+        future = asyncio.run_coroutine_threadsafe(self._sync(relay_specs(data, self.offset)), self._loop)
+        if callback:
+            future.add_done_callback(lambda f: callback(f.exception() or f.result()))
+        return future
+
+    async def _sync(self, specs: list) -> bool:
+        async with self._sync_lock:
+            wanted = set(specs)
+            gone = [spec for spec in self.relays if spec not in wanted]
+            for spec in gone:
+                await self.relays.pop(spec).stop()
+            # relays whose port was taken keep their counters and try to bind again
+            new = [spec for spec in specs if spec not in self.relays or self.relays[spec].error]
+            for spec in new:
+                relay = self.relays.setdefault(spec, Relay(spec))
+                await relay.start()
+            return bool(gone or new)
+
+    @property
+    def socks_ports(self) -> dict:
+        """{connection tag: relay port} of the SOCKS relays that are listening."""
+        return {spec.tunnel: spec.listen_port for spec, relay in list(self.relays.items())
+                if spec.kind == SOCKS and relay.server}
+
+    # --- metrics ---
+
+    def render_metrics(self) -> str:
+        relays = list(self.relays.items())
+        lines = []
+
+        def family(name: str, kind: str, help_text: str, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+
+        family("susops_relay_up", "gauge", "1 if the relay is listening.",
+               (f"susops_relay_up{{{_labels(s)}}} {int(r.server is not None)}" for s, r in relays))
+        family("susops_relay_bytes_total", "counter", "Bytes relayed, in: from clients, out: to clients.",
+               (f"susops_relay_bytes_total{{{_labels(s, direction=d)}}} {v}" for s, r in relays
+                for d, v in (("in", r.metrics.bytes_in), ("out", r.metrics.bytes_out))))
+        family("susops_relay_connections_active", "gauge", "Open client connections.",
+               (f"susops_relay_connections_active{{{_labels(s)}}} {r.metrics.active}" for s, r in relays))
+        family("susops_relay_connections_total", "counter", "Accepted client connections.",
+               (f"susops_relay_connections_total{{{_labels(s)}}} {r.metrics.total}" for s, r in relays))
+        family("susops_relay_connection_failures_total", "counter", "Connections the relayed port refused.",
+               (f"susops_relay_connection_failures_total{{{_labels(s)}}} {r.metrics.failures}" for s, r in relays))
+
+        samples = []
+        for spec, relay in relays:
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), relay.metrics.buckets):
+                cumulative += count
+                samples.append(f"susops_relay_setup_seconds_bucket{{{_labels(spec, le=bound)}}} {cumulative}")
+            samples.append(f"susops_relay_setup_seconds_sum{{{_labels(spec)}}} {relay.metrics.latency_sum:.6f}")
+            samples.append(f"susops_relay_setup_seconds_count{{{_labels(spec)}}} {cumulative}")
+        family("susops_relay_setup_seconds", "histogram",
+               "Accept to SOCKS CONNECT reply, or to the first byte from a forward.", samples)
+        for collector in list(self.collectors):
+            for name, kind, help_text, value in collector():
+                family(name, kind, help_text, [f"{name} {value}"])
+        return "\n".join(lines) + "\n"
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = (await reader.readuntil(b"\r\n\r\n")).split(b"\r\n", 1)[0].split(b" ")
+            if len(request) == 3 and request[0] == b"GET" and request[1].split(b"?")[0] in (b"/metrics", b"/"):
+                self.scrapes += 1
+                body = self.render_metrics().encode()
+                head = "200 OK\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8"
+            else:
+                body, head = b"not found\n", "404 Not Found\r\nContent-Type: text/plain"
+            writer.write(f"HTTP/1.1 {head}\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+                         + body)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    # --- lifecycle ---
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._sync_lock = asyncio.Lock()
+        try:
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._client, self.host, self.metrics_port, reuse_address=True))
+            self.metrics_port = self._server.sockets[0].getsockname()[1]
+        except OSError as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            for relay in self.relays.values():
+                self._loop.run_until_complete(relay.stop())
+            self._server.close()
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+    def start(self):
+        """Bind the metrics endpoint and run the loop in a daemon thread. Raises OSError if the port is taken."""
+        self._ready.clear()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="susops-relay", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error:
+            raise self._error
+        return self
+
+    def stop(self):
+        if self._loop and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread:
+            self._thread.join(5)
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
@@ -0,0 +1,84 @@
+import time
+from collections import deque
+
+
+class PollScheduler:
+    """
+    Decides how long to wait before the next status poll.
+
+    While the state is stable the interval doubles from `base_interval` up to `max_interval`.
+    After a state-changing action (start/stop/restart/add forward) it polls every `fast_interval`
+    seconds for `fast_window` seconds, so the new state shows up almost immediately.
+    """
+
+    def __init__(self, base_interval: float = 5, max_interval: float = 60, backoff: float = 2.0,
+                 fast_interval: float = 0.5, fast_window: float = 15, clock=time.monotonic):
+        self.base_interval = base_interval
+        self.max_interval = max(max_interval, base_interval)
+        self.backoff = backoff
+        self.fast_interval = fast_interval
+        self.fast_window = fast_window
+        self.clock = clock
+
+        self.interval = base_interval
+        self.fast_until = 0.0
+        self.last_state = None
+        self._action_at = None
+
+        self.polls_total = 0
+        self.state_changes = 0
+        self._poll_times = deque()
+        self.detection_latencies = deque(maxlen=100)
+
+    def notify_action(self):
+        """Call when a state-changing action starts or completes."""
+        now = self.clock()
+        if self._action_at is None:
+            self._action_at = now
+        self.fast_until = now + self.fast_window
+        self.interval = self.base_interval
+
+    def record_poll(self, state) -> bool:
+        """Record a poll result, returns True if the state changed."""
+        now = self.clock()
+        self.polls_total += 1
+        self._poll_times.append(now)
+        while self._poll_times and self._poll_times[0] < now - 3600:
+            self._poll_times.popleft()
+
+        changed = state != self.last_state
+        self.last_state = state
+        if changed:
+            self.state_changes += 1
+            self.interval = self.base_interval
+            if self._action_at is not None:
+                self.detection_latencies.append(now - self._action_at)
+                self._action_at = None
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+            if now >= self.fast_until:
+                # the fast window ended without a change, don't attribute later changes to that action
+                self._action_at = None
+        return changed
+
+    def next_interval(self) -> float:
+        if self.clock() < self.fast_until:
+            return self.fast_interval
+        return self.interval
+
+    @property
+    def polls_per_hour(self) -> int:
+        cutoff = self.clock() - 3600
+        # a copy, the metrics endpoint reads this off the main loop
+        return sum(1 for t in list(self._poll_times) if t >= cutoff)
+
+    def stats(self) -> dict:
+        latencies = list(self.detection_latencies)
+        return {
+            "polls_total": self.polls_total,
+            "polls_per_hour": self.polls_per_hour,
+            "state_changes": self.state_changes,
+            "interval": self.next_interval(),
+            "detection_latency_last": latencies[-1] if latencies else None,
+            "detection_latency_mean": sum(latencies) / len(latencies) if latencies else None,
+        }
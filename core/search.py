@@ -0,0 +1,110 @@
+"""
+Search index behind the Remove panels: prefix and substring matching over hosts, tags, ports and addresses, returning
+the best `limit` matches of each keystroke without looking at every entry.
+
+Matches come in tiers: the item's name starts with the query (a host, a forward's or connection's tag), another of
+its terms does (a port, an address, the connection tag), a word inside a term does (`corp` in `svc.corp.example`),
+and last any substring. The prefix tiers are bisected from sorted term lists and come out alphabetically. Substrings
+come out in config order: only the items holding the query's rarest trigram are checked, so a query matching little
+costs as little as one matching a lot. Queries shorter than a trigram scan one string of all terms with str.find.
+"""
+import bisect
+from collections import defaultdict
+
+from core.model import Connection, Forward, PacHost
+
+DEFAULT_LIMIT = 50
+# a word starts after one of these, all mapped to "." to find them with str.find
+_WORD_BREAKS = str.maketrans("-_:/@ ", "......")
+# between an item's terms and between items in the substring haystack, never part of a query
+_TERM_SEP = "\x1f"
+_ITEM_SEP = "\x1e"
+
+
+def search_terms(item) -> tuple:
+    """The lowercased terms a core.model object is found by, its name first."""
+    if isinstance(item, PacHost):
+        terms = (item.host, item.connection)
+    elif isinstance(item, Forward):
+        terms = (item.tag, str(item.src_port or ""), str(item.dst_port or ""), item.src_addr, item.dst_addr,
+                 item.connection)
+    elif isinstance(item, Connection):
+        terms = (item.tag, item.ssh_host, str(item.socks_proxy_port or ""))
+    else:
+        terms = (str(item),)
+    return tuple(term.lower() for term in terms if term)
+
+
+def _sorted(pairs: list) -> tuple:
+    pairs.sort()
+    return [term for term, _ in pairs], [index for _, index in pairs]
+
+
+class SearchIndex:
+    """Immutable, built once per list, e.g. per ConfigModel snapshot. `terms(item)` gives an item's search terms."""
+
+    def __init__(self, items, terms=search_terms):
+        self.items = tuple(items)
+        names, others, words, texts = [], [], [], []
+        for index, item in enumerate(self.items):
+            item_terms = terms(item)
+            texts.append(_TERM_SEP.join(item_terms))
+            for position, term in enumerate(item_terms):
+                (others if position else names).append((term, index))
+                breaks = term.translate(_WORD_BREAKS)
+                at = breaks.find(".") + 1
+                while at:
+                    if at < len(term):
+                        words.append((term[at:], index))
+                    at = breaks.find(".", at) + 1
+        self._tiers = (_sorted(names), _sorted(others), _sorted(words))
+        self._texts = texts
+        grams = defaultdict(list)
+        for index, text in enumerate(texts):
+            for gram in {text[i:i + 3] for i in range(len(text) - 2)}:
+                grams[gram].append(index)
+        self._grams = dict(grams)
+        self._haystack = _ITEM_SEP.join(texts)
+        # offset of every item's text in the haystack, plus the end
+        self._starts = [0] * (len(texts) + 1)
+        offset = 0
+        for index, text in enumerate(texts):
+            self._starts[index] = offset
+            offset += len(text) + 1
+        self._starts[-1] = offset
+
+    def __len__(self):
+        return len(self.items)
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> list:
+        """The best `limit` items for `query`, all items in order for an empty one."""
+        query = query.strip().lower()
+        if not query:
+            return list(self.items[:limit])
+        found = {}  # index -> None, insertion ordered
+        for keys, indexes in self._tiers:
+            at = bisect.bisect_left(keys, query)
+            while at < len(keys) and len(found) < limit and keys[at].startswith(query):
+                found.setdefault(indexes[at])
+                at += 1
+        if len(found) < limit and _TERM_SEP not in query and _ITEM_SEP not in query:
+            self._substrings(query, found, limit)
+        return [self.items[index] for index in found]
+
+    def _substrings(self, query: str, found: dict, limit: int):
+        if len(query) >= 3:
+            postings = [self._grams.get(query[i:i + 3], ()) for i in range(len(query) - 2)]
+            texts = self._texts
+            for index in min(postings, key=len):
+                if query in texts[index]:
+                    found.setdefault(index)
+                    if len(found) >= limit:
+                        return
+            return
+        haystack, starts = self._haystack, self._starts
+        position = haystack.find(query)
+        while position != -1 and len(found) < limit:
+            index = bisect.bisect_right(starts, position) - 1
+            found.setdefault(index)
+            # on to the next item
+            position = haystack.find(query, starts[index + 1])
@@ -0,0 +1,256 @@
+"""
+Index of ~/.ssh/config with the effective HostName, Port, User and ProxyJump of every concrete host.
+
+Follows `Include` (globs, relative to ~/.ssh, conditional when inside a Host/Match block) and evaluates
+`Match` blocks the way ssh does, except `exec`, which is never run and counts as not matching.
+The index is cached and rebuilt only when one of the files or include directories involved changes.
+"""
+import fnmatch
+import getpass
+import glob
+import os
+import shlex
+import threading
+from dataclasses import dataclass, field
+
+MAX_INCLUDE_DEPTH = 16  # same limit as ssh
+DEFAULT_PORT = 22
+RESOLVED = ("hostname", "port", "user", "proxyjump")
+
+
+@dataclass
+class SshHost:
+    alias: str
+    hostname: str
+    port: int = DEFAULT_PORT
+    user: str = None
+    proxy_jump: str = None
+    source: str = None  # "path:line" of the Host line that defined the alias
+
+
+@dataclass
+class _Block:
+    conditions: tuple  # (kind, args) of every enclosing Host/Match line, all must match
+    options: list = field(default_factory=list)  # (keyword, value) of the resolved keywords, in order
+
+
+@dataclass
+class SshConfigIndex:
+    hosts: dict = field(default_factory=dict)  # alias -> SshHost, in config order
+    stamps: dict = field(default_factory=dict)  # every file and include directory read -> (mtime_ns, size)
+    errors: list = field(default_factory=list)
+
+    @property
+    def aliases(self) -> list:
+        return list(self.hosts)
+
+    def get(self, alias: str):
+        return self.hosts.get(alias)
+
+
+def _stamp(path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _split_line(line: str):
+    """keyword and arguments of one config line, `Key value`, `Key=value` and quoted arguments allowed."""
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None, []
+    keyword, *rest = line.split(None, 1)
+    rest = rest[0] if rest else ""
+    if "=" in keyword:
+        keyword, _, first = keyword.partition("=")
+        rest = f"{first} {rest}"
+    keyword, rest = keyword.strip().lower(), rest.strip()
+    rest = rest[1:].strip() if rest.startswith("=") else rest
+    if not any(c in rest for c in "\"'#\\"):
+        return keyword, rest.split()
+    try:
+        return keyword, shlex.split(rest, comments=True)
+    except ValueError:
+        return keyword, rest.split()
+
+
+def match_patterns(value: str, patterns) -> bool:
+    """ssh pattern-list semantics: any negated match fails, otherwise any positive match wins."""
+    value = value.lower()
+    matched = False
+    for pattern in patterns:
+        negated = pattern.startswith("!")
+        if fnmatch.fnmatchcase(value, pattern.lstrip("!").lower()):
+            if negated:
+                return False
+            matched = True
+    return matched
+
+
+def is_concrete(pattern: str) -> bool:
+    return not any(c in pattern for c in "*?!")
+
+
+class SshConfigParser:
+    """Reads a config file and its includes into a flat list of blocks."""
+
+    def __init__(self, base_dir: str = None):
+        self.base_dir = base_dir or os.path.expanduser("~/.ssh")
+        self.blocks = []
+        self.aliases = {}  # alias -> "path:line"
+        self.stamps = {}
+        self.errors = []
+
+    def parse(self, path: str, outer: tuple = (), depth: int = 0):
+        self.stamps[path] = _stamp(path)
+        if depth > MAX_INCLUDE_DEPTH:
+            self.errors.append(f"{path}: include nested too deeply")
+            return self
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                lines = f.readlines()
+        except OSError as e:
+            if depth == 0 or not isinstance(e, FileNotFoundError):
+                self.errors.append(f"{path}: {e.strerror}")
+            return self
+
+        conditions, block = outer, None
+        for number, line in enumerate(lines, 1):
+            keyword, args = _split_line(line)
+            if not keyword:
+                continue
+            if keyword in ("host", "match"):
+                conditions, block = outer + ((keyword, args),), None
+                if keyword == "host":
+                    for alias in args:
+                        if is_concrete(alias):
+                            self.aliases.setdefault(alias, f"{path}:{number}")
+            elif keyword == "include":
+                for pattern in args:
+                    self._include(pattern, conditions, depth)
+                # lines after the Include continue the block, after anything the included files added
+                block = None
+            elif keyword in RESOLVED and args:
+                if block is None:
+                    block = _Block(conditions)
+                    self.blocks.append(block)
+                block.options.append((keyword, args[0]))
+        return self
+
+    def _include(self, pattern: str, conditions: tuple, depth: int):
+        pattern = os.path.expanduser(pattern)
+        if not os.path.isabs(pattern):
+            pattern = os.path.join(self.base_dir, pattern)
+        # new files matching the glob change the directory's mtime
+        directory = os.path.dirname(pattern)
+        self.stamps[directory] = _stamp(directory)
+        for path in sorted(glob.glob(pattern)):
+            if os.path.isfile(path):
+                self.parse(path, conditions, depth + 1)
+
+
+def _match_block(args: list, alias: str, options: dict) -> bool:
+    i = 0
+    while i < len(args):
+        criterion = args[i].lower()
+        negated = criterion.startswith("!")
+        criterion = criterion.lstrip("!")
+        if criterion in ("all", "canonical", "final"):
+            # the index is a final, non-canonicalized lookup
+            result = criterion != "canonical"
+            i += 1
+        else:
+            value = args[i + 1] if i + 1 < len(args) else ""
+            patterns = value.split(",")
+            i += 2
+            if criterion == "host":
+                result = match_patterns(options.get("hostname", alias).replace("%h", alias), patterns)
+            elif criterion == "originalhost":
+                result = match_patterns(alias, patterns)
+            elif criterion == "user":
+                result = match_patterns(options.get("user") or getpass.getuser(), patterns)
+            elif criterion == "localuser":
+                result = match_patterns(getpass.getuser(), patterns)
+            else:  # exec, localnetwork, tagged: never run commands from a menu-bar app
+                result = False
+        if result == negated:
+            return False
+    return True
+
+
+def _applies(block: _Block, alias: str, options: dict) -> bool:
+    return all(match_patterns(alias, args) if kind == "host" else _match_block(args, alias, options)
+               for kind, args in block.conditions)
+
+
+def resolve(blocks, alias: str) -> SshHost:
+    """First obtained value wins, like ssh."""
+    options = {}
+    for block in blocks:
+        if any(keyword not in options for keyword, _ in block.options) and _applies(block, alias, options):
+            for keyword, value in block.options:
+                options.setdefault(keyword, value)
+
+    hostname = options.get("hostname", alias).replace("%h", alias).replace("%%", "%")
+    try:
+        port = int(options.get("port", DEFAULT_PORT))
+    except ValueError:
+        port = DEFAULT_PORT
+    proxy_jump = options.get("proxyjump")
+    return SshHost(alias, hostname, port, options.get("user"), None if proxy_jump in (None, "none") else proxy_jump)
+
+
+def build_index(path: str, base_dir: str = None) -> SshConfigIndex:
+    parser = SshConfigParser(base_dir).parse(path)
+
+    # blocks under a plain `Host a b c` line only need checking for those aliases, the rest for every alias
+    by_alias, generic = {}, []
+    for position, block in enumerate(parser.blocks):
+        names = block.conditions[0][1] if len(block.conditions) == 1 and block.conditions[0][0] == "host" else None
+        if names and all(is_concrete(n) for n in names):
+            for name in {n.lower() for n in names}:
+                by_alias.setdefault(name, []).append((position, block))
+        else:
+            generic.append((position, block))
+
+    hosts = {}
+    for alias, source in parser.aliases.items():
+        candidates = sorted(by_alias.get(alias.lower(), []) + generic, key=lambda item: item[0])
+        hosts[alias] = resolve([block for _, block in candidates], alias)
+        hosts[alias].source = source
+    return SshConfigIndex(hosts, parser.stamps, parser.errors)
+
+
+class SshConfigCache:
+    """Index of one ssh config, rebuilt only when a file or include directory it was built from changes."""
+
+    def __init__(self, path: str = None):
+        self.path = path or os.path.expanduser("~/.ssh/config")
+        self._lock = threading.Lock()
+        self._index = None
+        self.build_count = 0
+
+    def get(self) -> SshConfigIndex:
+        with self._lock:
+            index = self._index
+            if index is None or any(_stamp(p) != stamp for p, stamp in index.stamps.items()):
+                index = self._index = build_index(self.path, os.path.dirname(self.path))
+                self.build_count += 1
+            return index
+
+    def invalidate(self):
+        with self._lock:
+            self._index = None
+
+
+_default_cache = None
+
+
+def ssh_config() -> SshConfigIndex:
+    """Cached index of ~/.ssh/config."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = SshConfigCache()
+    return _default_cache.get()
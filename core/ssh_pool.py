@@ -0,0 +1,204 @@
+"""
+One multiplexed ssh master (ControlMaster) per connection in `.connections[]`, so tests, checks and forward changes
+reuse an authenticated session instead of paying TCP connect + key exchange + auth every time.
+
+Control sockets live in ~/.susops/cm/. A master outlives the app if it crashes and is picked up again on the next
+start; SshPool.reap() shuts masters down when the proxy is stopped.
+"""
+import hashlib
+import os
+import re
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+
+from core.config import ConfigHelper
+
+SSH_OPTIONS = ("-o", "BatchMode=yes", "-o", "ConnectTimeout=10", "-o", "ServerAliveInterval=30")
+
+
+def control_path(directory: str, tag: str) -> str:
+    # sun_path is limited to 104 bytes on macOS, odd or long tags get a short hash instead
+    name = tag if re.fullmatch(r"[\w.-]{1,32}", tag) else hashlib.sha1(tag.encode()).hexdigest()[:16]
+    return os.path.join(directory, f"{name}.sock")
+
+
+@dataclass
+class ControlMaster:
+    tag: str
+    host: str
+    path: str
+    ssh: str = "ssh"
+    started_at: float = None
+    # forwards added with -O forward, as (flag, spec)
+    forwards: set = field(default_factory=set)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def args(self, *extra) -> list:
+        return [self.ssh, *SSH_OPTIONS, "-o", f"ControlPath={self.path}", *extra]
+
+    def alive(self) -> bool:
+        """Cheap health check without spawning ssh: the master accepts connections on its control socket."""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(0.5)
+        try:
+            sock.connect(self.path)
+            return True
+        except OSError:
+            return False
+        finally:
+            sock.close()
+
+    def check(self, timeout: float = 5) -> bool:
+        """Ask the master itself (`ssh -O check`)."""
+        return self._control("check", timeout=timeout)[1] == 0
+
+    def start(self, timeout: float = 20) -> tuple[str, int]:
+        """Start the master unless one is already listening, returns (error output, exit code)."""
+        with self._lock:
+            if self.alive():
+                return "", 0
+            self._unlink()
+            os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+            # -f backgrounds the master once it is authenticated. stderr goes to a file, a pipe would be held open
+            # by the background process
+            with tempfile.TemporaryFile("w+", encoding="utf-8", errors="ignore") as err:
+                try:
+                    result = subprocess.run(
+                        self.args("-o", "ControlMaster=yes", "-o", "ControlPersist=yes", "-N", "-f", self.host),
+                        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=err, timeout=timeout)
+                    returncode = result.returncode
+                except subprocess.TimeoutExpired:
+                    returncode = -1
+                err.seek(0)
+                output = err.read().strip()
+            if returncode == 0:
+                self.started_at = time.time()
+                self.forwards.clear()
+            return output, returncode
+
+    def stop(self):
+        with self._lock:
+            if os.path.exists(self.path):
+                self._control("exit")
+            self._unlink()
+            self.started_at = None
+            self.forwards.clear()
+
+    def run(self, command: str, timeout: float = 30) -> tuple[str, int]:
+        """Run a remote command over the master, or over a new session if there is none."""
+        try:
+            result = subprocess.run(self.args("-o", "ControlMaster=no", self.host, command), stdin=subprocess.DEVNULL,
+                                    capture_output=True, encoding="utf-8", errors="ignore", timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return f"timed out after {timeout:g}s", -1
+        return (result.stdout or result.stderr).strip(), result.returncode
+
+    def forward(self, flag: str, spec: str) -> tuple[str, int]:
+        """Add a -L/-R forward to the running master, live without restarting the tunnel."""
+        output, returncode = self._control("forward", flag, spec)
+        if returncode == 0:
+            self.forwards.add((flag, spec))
+        return output, returncode
+
+    def cancel(self, flag: str, spec: str) -> tuple[str, int]:
+        output, returncode = self._control("cancel", flag, spec)
+        self.forwards.discard((flag, spec))
+        return output, returncode
+
+    def _control(self, command: str, *extra, timeout: float = 10) -> tuple[str, int]:
+        try:
+            result = subprocess.run(self.args("-O", command, *extra, self.host), stdin=subprocess.DEVNULL,
+                                    capture_output=True, encoding="utf-8", errors="ignore", timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return f"ssh -O {command} timed out", -1
+        return (result.stderr or result.stdout).strip(), result.returncode
+
+    def _unlink(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class SshPool:
+    """Masters by connection tag, kept in sync with the config."""
+
+    def __init__(self, directory: str = None, ssh: str = "ssh"):
+        self.directory = directory or os.path.join(ConfigHelper.workspace_path, "cm")
+        self.ssh = ssh
+        self.masters = {}
+        self._lock = threading.Lock()
+
+    def sync(self, data: dict = None) -> dict:
+        """Add masters for new connections, reap the ones whose connection is gone or whose ssh_host changed."""
+        data = ConfigHelper.load() if data is None else data
+        hosts = {str(c["tag"]): str(c["ssh_host"]) for c in (data or {}).get("connections") or []
+                 if isinstance(c, dict) and c.get("tag") and c.get("ssh_host")}
+        with self._lock:
+            stale = [m for tag, m in self.masters.items() if hosts.get(tag) != m.host]
+            for master in stale:
+                del self.masters[master.tag]
+            for tag, host in hosts.items():
+                if tag not in self.masters:
+                    self.masters[tag] = ControlMaster(tag, host, control_path(self.directory, tag), self.ssh)
+        for master in stale:
+            master.stop()
+        return dict(self.masters)
+
+    def get(self, tag: str):
+        if tag not in self.masters:
+            self.sync()
+        return self.masters.get(tag)
+
+    def ensure(self, tag: str):
+        """The connection's master, started if it isn't up. None for unknown tags."""
+        master = self.get(tag)
+        if master is None:
+            return None
+        master.start()
+        return master
+
+    def start_all(self) -> dict:
+        """Start every master concurrently, returns {tag: (error output, exit code)}."""
+        masters = list(self.sync().values())
+        results = {}
+
+        def start(master):
+            results[master.tag] = master.start()
+
+        threads = [threading.Thread(target=start, args=(m,), daemon=True) for m in masters]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def health(self) -> dict:
+        """{tag: alive} for every known master."""
+        return {tag: master.alive() for tag, master in list(self.masters.items())}
+
+    def run(self, tag: str, command: str, timeout: float = 30) -> tuple[str, int]:
+        master = self.ensure(tag)
+        if master is None:
+            return f"unknown connection {tag}", -1
+        return master.run(command, timeout)
+
+    def reap(self):
+        """Shut down every master concurrently, including ones left behind by an earlier run."""
+        with self._lock:
+            masters = list(self.masters.values())
+        known = {m.path for m in masters}
+        try:
+            orphans = [os.path.join(self.directory, n) for n in os.listdir(self.directory) if n.endswith(".sock")]
+        except FileNotFoundError:
+            orphans = []
+        masters += [ControlMaster("", "orphan", path, self.ssh) for path in orphans if path not in known]
+        threads = [threading.Thread(target=m.stop, daemon=True) for m in masters]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
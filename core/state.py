@@ -0,0 +1,115 @@
+import time
+from dataclasses import dataclass
+from enum import Enum
+
+
+class ProcessState(Enum):
+    INITIAL = "INITIAL"
+    RUNNING = "RUNNING"
+    STOPPED_PARTIALLY = "STOPPED_PARTIALLY"
+    STOPPED = "STOPPED"
+    ERROR = "ERROR"
+
+
+# exit codes of `susops ps`
+RETURNCODE_STATES = {
+    0: ProcessState.RUNNING,
+    2: ProcessState.STOPPED_PARTIALLY,
+    3: ProcessState.STOPPED,
+}
+
+STATE_RETURNCODES = {state: code for code, state in RETURNCODE_STATES.items()}
+
+
+def state_from_returncode(returncode: int) -> ProcessState:
+    return RETURNCODE_STATES.get(returncode, ProcessState.ERROR)
+
+
+def returncode_from_state(state: ProcessState) -> int:
+    return STATE_RETURNCODES.get(state, 1)
+
+
+def aggregate_state(up: list) -> ProcessState:
+    """Overall state from whether each tunnel (and the PAC server) is up."""
+    if up and all(up):
+        return ProcessState.RUNNING
+    if any(up):
+        return ProcessState.STOPPED_PARTIALLY
+    return ProcessState.STOPPED
+
+
+@dataclass
+class ConnectionState:
+    tag: str
+    state: ProcessState = ProcessState.INITIAL
+    socks_port: int = 0
+    pid: int = None
+    up_since: float = None  # epoch seconds, from the pidfile
+    latency: float = None  # last SOCKS5 handshake in seconds
+    failures: int = 0  # probes that found it unresponsive or dropped since the previous probe
+    last_probe: float = None
+
+    def uptime(self, now: float = None) -> float:
+        if self.state != ProcessState.RUNNING or self.up_since is None:
+            return None
+        return max((now or time.time()) - self.up_since, 0.0)
+
+
+class ConnectionStates:
+    """Per-tag state, in config order, updated from each poll's core.prober.ConnectionProbe list."""
+
+    def __init__(self):
+        self.by_tag = {}
+        self.pac_running = None
+
+    def __iter__(self):
+        return iter(self.by_tag.values())
+
+    def __len__(self):
+        return len(self.by_tag)
+
+    def get(self, tag: str):
+        return self.by_tag.get(tag)
+
+    def update(self, probes: list, pac_running: bool, now: float = None) -> bool:
+        """Returns True if a tag was added or removed or a connection changed state."""
+        now = now or time.time()
+        changed = [p.tag for p in probes] != list(self.by_tag) or pac_running != self.pac_running
+        by_tag = {}
+        for probe in probes:
+            conn = self.by_tag.get(probe.tag) or ConnectionState(probe.tag)
+            if probe.running:
+                state = ProcessState.RUNNING
+            elif probe.alive:
+                # the process is there but its SOCKS port doesn't answer
+                state = ProcessState.ERROR
+            else:
+                state = ProcessState.STOPPED
+            if state == ProcessState.ERROR or (conn.state == ProcessState.RUNNING and state != ProcessState.RUNNING):
+                conn.failures += 1
+            changed = changed or state != conn.state
+            conn.state = state
+            conn.socks_port, conn.pid, conn.latency = probe.socks_port, probe.pid, probe.latency
+            conn.up_since = probe.started if probe.alive else None
+            conn.last_probe = now
+            by_tag[probe.tag] = conn
+        self.by_tag = by_tag
+        self.pac_running = pac_running
+        return changed
+
+    def apply(self, tag: str, up: bool, pid: int = None, now: float = None) -> bool:
+        """A tunnel_up/tunnel_down pushed by core.bus, ahead of the next probe. True if the tunnel changed state."""
+        conn = self.by_tag.get(tag)
+        state = ProcessState.RUNNING if up else ProcessState.STOPPED
+        if conn is None or conn.state == state:
+            # unknown tags wait for the next probe to appear
+            return False
+        if conn.state == ProcessState.RUNNING:
+            conn.failures += 1
+        conn.state = state
+        conn.pid = pid if up else None
+        conn.up_since = (now or time.time()) if up else None
+        return True
+
+    def aggregate(self) -> ProcessState:
+        return aggregate_state([c.state == ProcessState.RUNNING for c in self] + [bool(self.pac_running)])
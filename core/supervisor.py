@@ -0,0 +1,498 @@
+"""
+Native tunnel supervisor, in place of the CLI's autossh: one `ssh -N -D` child per connection, health-checked with
+real SOCKS5 handshakes and restarted with jittered exponential backoff.
+
+autossh only notices a dead tunnel once ssh exits (or its monitor port times out) and then keeps to its own poll
+interval. Here a child's exit wakes the supervisor at once, a child that is alive but stops answering on its SOCKS
+port is killed after `failures` missed handshakes, and the first retry follows within FIRST_RETRY. Every outage is
+kept as a Reconnect with the time it took.
+
+The supervisor keeps pids/susops-ssh-<tag>.pid current, so StateProber sees its children like the CLI's tunnels.
+Children it finds already running from an earlier app run are adopted and watched by pid.
+
+A connection with `pool: N` gets N children, see core.pool. The first one carries the forwards and stands for the
+connection in events and its pidfile, the others are <tag>#<n>.
+"""
+import os
+import random
+import signal
+import socket
+import subprocess
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field, replace
+
+from core.config import ConfigHelper
+from core.prober import pid_alive, read_pidfile, socks5_handshake
+
+FIRST_RETRY = 0.1
+BASE_DELAY = 1.0
+MAX_DELAY = 30.0
+# a tunnel that stayed up this long starts over at the fast first retry
+STABLE_AFTER = 5.0
+MAX_POOL = 16
+# ssh itself gives up on a dead server after ServerAliveInterval * ServerAliveCountMax
+SSH_OPTIONS = ("-o", "BatchMode=yes", "-o", "ConnectTimeout=10", "-o", "ExitOnForwardFailure=yes",
+               "-o", "ServerAliveInterval=5", "-o", "ServerAliveCountMax=2")
+
+
+def backoff_delay(attempt: int, first: float = FIRST_RETRY, base: float = BASE_DELAY, cap: float = MAX_DELAY,
+                  rng=random.random) -> float:
+    """Seconds before retry `attempt` (1-based): `first`, then base * 2^(attempt - 2) up to `cap`, jittered to [d/2, d]."""
+    if attempt <= 1:
+        return first
+    delay = min(cap, base * 2 ** (attempt - 2))
+    return delay / 2 + rng() * delay / 2
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@dataclass
+class Reconnect:
+    tag: str
+    reason: str  # "exit 255", "unresponsive", "start timeout", ...
+    down_at: float  # time.monotonic() when the outage was detected
+    up_at: float = None
+    attempts: int = 0  # ssh children started until one answered
+
+    @property
+    def duration(self) -> float:
+        return None if self.up_at is None else self.up_at - self.down_at
+
+
+@dataclass(frozen=True)
+class TunnelSpec:
+    tag: str
+    host: str
+    socks_port: int
+    index: int = 0  # position in .connections[], to write back an assigned port
+    forwards: tuple = ()  # (flag, spec) pairs, e.g. ("-L", "127.0.0.1:8080:localhost:80")
+    pool: int = 1  # tunnels of the connection, more than one run behind a core.pool balancer
+    member: int = 0
+    pool_port: int = 0  # the connection's socks_proxy_port the balancer listens on, member ports are ephemeral
+
+    @property
+    def connection(self) -> str:
+        return self.tag.rsplit("#", 1)[0] if self.member else self.tag
+
+    def command(self, ssh: str = "ssh") -> list:
+        args = [ssh, "-N", *SSH_OPTIONS, "-D", f"127.0.0.1:{self.socks_port}"]
+        for flag, spec in self.forwards:
+            args += [flag, spec]
+        return args + [self.host]
+
+
+def tunnel_specs(data: dict) -> list:
+    """
+    One TunnelSpec per connection with an ssh_host, `pool` of them for a pooled one. A socks_proxy_port of 0 is left
+    for the supervisor to assign, a pool needs a fixed one.
+    """
+    specs = []
+    for index, conn in enumerate((data or {}).get("connections") or []):
+        if not isinstance(conn, dict) or not conn.get("tag") or not conn.get("ssh_host"):
+            continue
+        forwards = []
+        block = conn.get("forwards") if isinstance(conn.get("forwards"), dict) else {}
+        for fwd in block.get("local") or []:
+            if not isinstance(fwd, dict):
+                continue
+            src, dst = fwd.get("src_port", fwd.get("src")), fwd.get("dst_port", fwd.get("dst"))
+            if src and dst:
+                forwards.append(("-L", f"{fwd.get('src_addr') or '127.0.0.1'}:{src}:"
+                                       f"{fwd.get('dst_addr') or 'localhost'}:{dst}"))
+        for fwd in block.get("remote") or []:
+            if not isinstance(fwd, dict):
+                continue
+            # src is the port on the ssh host, dst the local service it exposes
+            src, dst = fwd.get("src_port", fwd.get("src")), fwd.get("dst_port", fwd.get("dst"))
+            if src and dst:
+                bind = f"{fwd['src_addr']}:" if fwd.get("src_addr") else ""
+                forwards.append(("-R", f"{bind}{src}:{fwd.get('dst_addr') or '127.0.0.1'}:{dst}"))
+        try:
+            port = int(conn.get("socks_proxy_port") or 0)
+        except (TypeError, ValueError):
+            port = 0
+        try:
+            pool = min(max(int(conn.get("pool") or 1), 1), MAX_POOL) if port else 1
+        except (TypeError, ValueError):
+            pool = 1
+        tag, host = str(conn["tag"]), str(conn["ssh_host"])
+        if pool == 1:
+            specs.append(TunnelSpec(tag, host, port, index, tuple(forwards)))
+            continue
+        for member in range(pool):
+            specs.append(TunnelSpec(f"{tag}#{member}" if member else tag, host, 0, index,
+                                    () if member else tuple(forwards), pool, member, port))
+    return specs
+
+
+@dataclass
+class Tunnel:
+    spec: TunnelSpec
+    process: subprocess.Popen = None
+    pid: int = None  # the child's pid, also set for adopted children without a Popen
+    up: bool = False
+    started_at: float = None  # monotonic, the current child's spawn
+    up_at: float = None
+    failures: int = 0  # consecutive missed handshakes
+    attempts: int = 0  # children started since the tunnel was last stable
+    next_attempt: float = 0.0  # monotonic, when to spawn if there is no child
+    outage: Reconnect = None
+    reconnects: deque = field(default_factory=lambda: deque(maxlen=100))
+
+    @property
+    def tag(self) -> str:
+        return self.spec.tag
+
+
+class TunnelSupervisor:
+    """
+    Keeps one ssh child per wanted connection on a daemon thread. on_event(event_type, tag, data) runs on that thread
+    with core.bus TUNNEL_UP / TUNNEL_DOWN, e.g. to publish them or hand them to the controller.
+    """
+
+    def __init__(self, ssh: str = "ssh", pid_dir: str = None, on_event=None, check_interval: float = 2.0,
+                 handshake_timeout: float = 1.0, failures: int = 2, start_timeout: float = 20.0):
+        self.ssh = ssh
+        self.pid_dir = pid_dir or os.path.join(ConfigHelper.workspace_path, "pids")
+        self.on_event = on_event
+        self.check_interval = check_interval
+        self.handshake_timeout = handshake_timeout
+        self.failures = failures
+        self.start_timeout = start_timeout
+        self.tunnels = {}
+        self.balancer = None  # core.pool.PoolBalancer, while there are pooled connections
+        self.wanted = False
+        self._lock = threading.RLock()
+        # serializes _sync_pools, which runs outside _lock; taken before _lock, never while holding it
+        self._pools_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._up = threading.Condition(self._lock)
+        self._thread = None
+        # children _kill signalled and ports _assign_port picked, handled outside the lock
+        self._dying = []
+        self._assigned = []
+
+    # --- public API, any thread ---
+
+    def start(self, data: dict = None):
+        """Adopt tunnels still running from an earlier run and start supervising. Spawns nothing until up()."""
+        self.sync(data)
+        with self._lock:
+            for tunnel in self.tunnels.values():
+                self._adopt(tunnel)
+            self.wanted = any(t.pid for t in self.tunnels.values())
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="susops-supervise", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, kill: bool = True):
+        """Stop supervising. With kill, the children go down too, otherwise they keep running to be adopted later."""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(5)
+            self._thread = None
+        if kill:
+            self.down()
+        with self._pools_lock:
+            if self.balancer:
+                self.balancer.stop()
+                self.balancer = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def sync(self, data: dict = None) -> bool:
+        """Follow the config: new connections are added, removed ones and ones whose ssh args changed restarted."""
+        if data is None:
+            try:
+                data = ConfigHelper.load()
+            except LookupError:
+                return False
+        specs = {spec.tag: spec for spec in tunnel_specs(data)}
+        changed = False
+        with self._lock:
+            for tag in list(self.tunnels):
+                tunnel = self.tunnels[tag]
+                spec = specs.get(tag)
+                # a port the supervisor assigned may not be in `data` yet
+                if spec is not None and replace(spec, socks_port=spec.socks_port or tunnel.spec.socks_port) == tunnel.spec:
+                    continue
+                self._kill(tunnel, "config changed" if spec else "removed")
+                self._remove_pidfile(tag)
+                del self.tunnels[tag]
+                changed = True
+            for tag, spec in specs.items():
+                if tag not in self.tunnels:
+                    self.tunnels[tag] = Tunnel(spec)
+                    changed = True
+        self._wait_killed()
+        self._sync_pools()
+        if changed:
+            self._wake.set()
+        return changed
+
+    def up(self, timeout: float = 30.0) -> tuple[str, int]:
+        """Bring every tunnel up and wait until all answer, returns (output, exit code) like a susops command."""
+        self.sync()
+        with self._lock:
+            self.wanted = True
+            now = time.monotonic()
+            for tunnel in self.tunnels.values():
+                tunnel.attempts, tunnel.next_attempt = 0, now
+            self._wake.set()
+            self._up.wait_for(lambda: all(t.up for t in self.tunnels.values()) or self._stopped.is_set(), timeout)
+            down = [t.tag for t in self.tunnels.values() if not t.up]
+        if not self.tunnels:
+            return "no connections with an ssh_host", 1
+        if down:
+            return f"not up after {timeout:g}s: {', '.join(down)}", 2 if len(down) < len(self.tunnels) else 3
+        return f"{len(self.tunnels)} tunnels up", 0
+
+    def down(self) -> tuple[str, int]:
+        with self._lock:
+            self.wanted = False
+            for tunnel in self.tunnels.values():
+                self._kill(tunnel, "stopped")
+                self._remove_pidfile(tunnel.tag)
+                tunnel.outage = None
+        self._wait_killed()
+        return "stopped", 0
+
+    def restart(self, timeout: float = 30.0) -> tuple[str, int]:
+        self.down()
+        return self.up(timeout)
+
+    def reconnects(self) -> list:
+        """Every recorded outage of every tunnel, oldest first."""
+        with self._lock:
+            return sorted((r for t in self.tunnels.values() for r in t.reconnects), key=lambda r: r.down_at)
+
+    # --- supervisor thread ---
+
+    def _run(self):
+        next_check = 0.0
+        while not self._stopped.is_set():
+            now = time.monotonic()
+            with self._lock:
+                if self.wanted:
+                    self._reap(now)
+                    self._spawn_due(now)
+                starting = any(t.pid and not t.up for t in self.tunnels.values())
+                deadlines = [t.next_attempt for t in self.tunnels.values() if self.wanted and not t.pid]
+            self._wait_killed()
+            self._save_ports()
+            if now >= next_check:
+                self._check()
+                next_check = now + self.check_interval
+            elif starting:
+                self._check(starting_only=True)
+            # starting children are polled every 50 ms so a reconnect is seen as soon as it answers
+            wait = 0.05 if starting else min([next_check] + deadlines) - time.monotonic()
+            self._wake.wait(max(wait, 0.0))
+            self._wake.clear()
+
+    def _reap(self, now: float):
+        for tunnel in self.tunnels.values():
+            if tunnel.process is not None:
+                code = tunnel.process.poll()
+                if code is not None:
+                    reason = f"killed by signal {-code}" if code < 0 else f"exit {code}"
+                    self._lost(tunnel, reason, now)
+            elif tunnel.pid and not pid_alive(tunnel.pid):
+                self._lost(tunnel, "exited", now)
+
+    def _spawn_due(self, now: float):
+        for tunnel in self.tunnels.values():
+            if tunnel.pid or now < tunnel.next_attempt:
+                continue
+            if not tunnel.spec.socks_port:
+                tunnel.spec = self._assign_port(tunnel.spec)
+            tunnel.attempts += 1
+            if tunnel.outage is not None:
+                tunnel.outage.attempts += 1
+            try:
+                tunnel.process = subprocess.Popen(tunnel.spec.command(self.ssh), stdin=subprocess.DEVNULL,
+                                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                                  start_new_session=True)
+            except OSError as e:
+                self._lost(tunnel, str(e), now)
+                continue
+            tunnel.pid, tunnel.started_at, tunnel.failures = tunnel.process.pid, now, 0
+            self._write_pidfile(tunnel.tag, tunnel.pid, tunnel.spec.socks_port if tunnel.spec.pool > 1 else None)
+            # wake the loop the moment the child exits instead of at the next check
+            threading.Thread(target=self._wait_child, args=(tunnel.process,), daemon=True).start()
+
+    def _wait_child(self, process: subprocess.Popen):
+        process.wait()
+        self._wake.set()
+
+    def _check(self, starting_only: bool = False):
+        with self._lock:
+            tunnels = [t for t in self.tunnels.values()
+                       if t.pid and t.spec.socks_port and not (starting_only and t.up)]
+        if not tunnels:
+            return
+        results = socks5_handshake([t.spec.socks_port for t in tunnels], timeout=self.handshake_timeout)
+        checked = time.monotonic()
+        with self._lock:
+            for tunnel in tunnels:
+                if not tunnel.pid:
+                    continue
+                if results.get(tunnel.spec.socks_port) is not None:
+                    if not tunnel.up:
+                        self._came_up(tunnel, checked)
+                    tunnel.failures = 0
+                elif tunnel.up:
+                    tunnel.failures += 1
+                    if tunnel.failures >= self.failures:
+                        self._lost(tunnel, "unresponsive", checked)
+                elif checked - tunnel.started_at > self.start_timeout:
+                    self._lost(tunnel, "start timeout", checked)
+        self._wait_killed()
+
+    def _came_up(self, tunnel: Tunnel, now: float):
+        tunnel.up, tunnel.up_at, tunnel.failures = True, now, 0
+        if tunnel.outage is None:
+            # the first start, retries before it don't count against the next outage
+            tunnel.attempts = 0
+        else:
+            tunnel.outage.up_at = now
+            tunnel.reconnects.append(tunnel.outage)
+            tunnel.outage = None
+        self._up.notify_all()
+        if tunnel.spec.pool > 1:
+            self._pool_changed(tunnel.spec.connection)
+        self._emit(tunnel, "tunnel_up", pid=tunnel.pid, socks_port=tunnel.spec.pool_port or tunnel.spec.socks_port,
+                   source="supervisor")
+
+    def _lost(self, tunnel: Tunnel, reason: str, now: float):
+        was_up = tunnel.up
+        if was_up and now - tunnel.up_at >= STABLE_AFTER:
+            tunnel.attempts = 0
+        self._kill(tunnel, reason)
+        if was_up and tunnel.outage is None:
+            tunnel.outage = Reconnect(tunnel.tag, reason, now)
+        tunnel.next_attempt = now + backoff_delay(tunnel.attempts + 1)
+        if was_up:
+            self._emit(tunnel, "tunnel_down", reason=reason, source="supervisor")
+
+    # --- pools ---
+
+    def _sync_pools(self):
+        """Without the lock held: PoolBalancer.sync() waits, up to seconds, for the pool ports to be bound."""
+        with self._pools_lock:
+            with self._lock:
+                pools = {t.spec.connection: t.spec.pool_port for t in self.tunnels.values() if t.spec.pool > 1}
+            if not pools and self.balancer is None:
+                return
+            if self.balancer is None:
+                from core.pool import PoolBalancer
+                self.balancer = PoolBalancer().start()
+            self.balancer.sync(pools)
+            with self._lock:
+                for tag in pools:
+                    self._pool_changed(tag)
+
+    def _pool_changed(self, tag: str):
+        """Hand the balancer the member ports of connection `tag` that are up."""
+        if self.balancer:
+            self.balancer.set_members(tag, [t.spec.socks_port for t in self.tunnels.values()
+                                            if t.spec.pool > 1 and t.spec.connection == tag and t.up])
+
+    def _kill(self, tunnel: Tunnel, reason: str):
+        """Signal the child, under the lock. _wait_killed() waits for it once the lock is released."""
+        # SIGTERM lets ssh close the session, a stopped or wedged child only goes with SIGKILL
+        sig = signal.SIGKILL if reason == "unresponsive" else signal.SIGTERM
+        try:
+            if tunnel.process is not None:
+                os.killpg(tunnel.pid, sig)
+                self._dying.append(tunnel.process)
+            elif tunnel.pid:
+                os.kill(tunnel.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+        was_up = tunnel.up
+        tunnel.process, tunnel.pid, tunnel.up, tunnel.failures = None, None, False, 0
+        if was_up and tunnel.spec.pool > 1:
+            self._pool_changed(tunnel.spec.connection)
+
+    def _wait_killed(self):
+        """Give the children _kill signalled 2 s to exit, then SIGKILL their group. Called without the lock."""
+        with self._lock:
+            dying, self._dying = self._dying, []
+        deadline = time.monotonic() + 2
+        for process in dying:
+            try:
+                process.wait(max(deadline - time.monotonic(), 0))
+            except subprocess.TimeoutExpired:
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                    process.wait(2)
+                except (ProcessLookupError, PermissionError, subprocess.TimeoutExpired):
+                    pass
+
+    def _adopt(self, tunnel: Tunnel):
+        path = os.path.join(self.pid_dir, f"susops-ssh-{tunnel.tag}.pid")
+        pid, port = read_pidfile(path), tunnel.spec.socks_port
+        if tunnel.spec.pool > 1:
+            # a pool member's ephemeral port follows its pid
+            try:
+                with open(path) as f:
+                    port = int(f.read().split()[1])
+            except (OSError, ValueError, IndexError):
+                return
+        if pid_alive(pid) and port and socks5_handshake([port])[port] is not None:
+            tunnel.spec = replace(tunnel.spec, socks_port=port)
+            tunnel.pid, tunnel.up, tunnel.started_at = pid, True, time.monotonic()
+            tunnel.up_at = tunnel.started_at
+            if tunnel.spec.pool > 1:
+                self._pool_changed(tunnel.spec.connection)
+
+    def _assign_port(self, spec: TunnelSpec) -> TunnelSpec:
+        spec = replace(spec, socks_port=free_port())
+        if spec.pool == 1:
+            self._assigned.append(spec)
+        return spec
+
+    def _save_ports(self):
+        """Write the ports _assign_port picked back to the config. Called without the lock, it takes the config's."""
+        with self._lock:
+            assigned, self._assigned = self._assigned, []
+        if not assigned:
+            return
+        try:
+            with ConfigHelper.transaction() as tx:
+                for spec in assigned:
+                    tx.set(f".connections[{spec.index}].socks_proxy_port", spec.socks_port)
+        except (OSError, LookupError):
+            pass
+
+    def _emit(self, tunnel: Tunnel, event_type: str, **data):
+        # the other members of a pool are internal
+        if self.on_event and not tunnel.spec.member:
+            self.on_event(event_type, tunnel.tag, data)
+
+    # --- pidfiles ---
+
+    def _write_pidfile(self, tag: str, pid: int, port: int = None):
+        os.makedirs(self.pid_dir, exist_ok=True)
+        path = os.path.join(self.pid_dir, f"susops-ssh-{tag}.pid")
+        with open(path + ".tmp", "w") as f:
+            f.write(f"{pid}\n" if port is None else f"{pid} {port}\n")
+        os.replace(path + ".tmp", path)
+
+    def _remove_pidfile(self, tag: str):
+        try:
+            os.unlink(os.path.join(self.pid_dir, f"susops-ssh-{tag}.pid"))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,255 @@
+import asyncio
+import ipaddress
+import json
+import os
+import struct
+import time
+from dataclasses import asdict, dataclass
+
+from core.config import ConfigHelper
+
+SOCKS5_ERRORS = {
+    1: "general SOCKS server failure",
+    2: "connection not allowed by ruleset",
+    3: "network unreachable",
+    4: "host unreachable",
+    5: "connection refused",
+    6: "TTL expired",
+    7: "command not supported",
+    8: "address type not supported",
+}
+
+
+class ProbeKind:
+    PAC_HOST = "pac_host"
+    LOCAL_FORWARD = "local_forward"
+    REMOTE_FORWARD = "remote_forward"
+    SSH = "ssh"
+    RTT = "rtt"  # round trip through a tunnel, see core.failover
+
+
+@dataclass
+class TestTarget:
+    kind: str
+    connection: str
+    target: str  # host as configured, or the forward's tag
+    host: str  # what actually gets connected to
+    port: int
+    socks_port: int = 0  # 0 = connect directly
+
+
+@dataclass
+class TestResult:
+    kind: str
+    connection: str
+    target: str
+    port: int
+    ok: bool
+    connect_ms: float = None
+    first_byte_ms: float = None
+    error: str = None
+
+
+def normalize_pac_host(entry: str):
+    """Map a pac_hosts entry onto something connectable, or None for CIDR ranges."""
+    entry = entry.strip()
+    if entry.startswith("*."):
+        entry = entry[2:]
+    entry = entry.lstrip(".")
+    if "/" in entry:
+        try:
+            network = ipaddress.ip_network(entry, strict=False)
+        except ValueError:
+            return None
+        return str(network.network_address) if network.num_addresses == 1 else None
+    return entry or None
+
+
+def collect_targets(data: dict, port: int = 443) -> tuple[list, list]:
+    """Build probe targets from a parsed config. Returns (targets, skipped results)."""
+    targets, skipped = [], []
+    for conn in (data or {}).get("connections") or []:
+        if not isinstance(conn, dict):
+            continue
+        tag = str(conn.get("tag", ""))
+        try:
+            socks_port = int(conn.get("socks_proxy_port") or 0)
+        except (TypeError, ValueError):
+            socks_port = 0
+
+        for entry in conn.get("pac_hosts") or []:
+            host = normalize_pac_host(str(entry))
+            if host is None:
+                skipped.append(TestResult(ProbeKind.PAC_HOST, tag, str(entry), port, True, error="range, not probed"))
+            elif not socks_port:
+                skipped.append(TestResult(ProbeKind.PAC_HOST, tag, str(entry), port, False, error="no SOCKS port"))
+            else:
+                targets.append(TestTarget(ProbeKind.PAC_HOST, tag, str(entry), host, port, socks_port))
+
+        forwards = conn.get("forwards") if isinstance(conn.get("forwards"), dict) else {}
+        # the local forward listens on this machine; the remote side is only reachable over ssh, check that the
+        # local service it exposes is up
+        for kind, fwds, port_key, addr_key in ((ProbeKind.LOCAL_FORWARD, forwards.get("local"), "src", "src_addr"),
+                                               (ProbeKind.REMOTE_FORWARD, forwards.get("remote"), "dst", "dst_addr")):
+            for fwd in fwds or []:
+                if not isinstance(fwd, dict):
+                    skipped.append(TestResult(kind, tag, str(fwd), 0, False, error="invalid forward"))
+                    continue
+                value = fwd.get(f"{port_key}_port", fwd.get(port_key))
+                if not value:
+                    continue
+                name = str(fwd.get("tag") or value)
+                try:
+                    fwd_port = int(value)
+                except (TypeError, ValueError):
+                    fwd_port = 0
+                if not 0 < fwd_port < 65536:
+                    skipped.append(TestResult(kind, tag, name, 0, False, error="invalid port"))
+                    continue
+                targets.append(TestTarget(kind, tag, name, fwd.get(addr_key) or "127.0.0.1", fwd_port))
+    return targets, skipped
+
+
+def _socks5_request(host: str, port: int) -> bytes:
+    try:
+        addr = ipaddress.ip_address(host)
+    except ValueError:
+        encoded = host.encode("idna")
+        dst = b"\x03" + bytes([len(encoded)]) + encoded
+    else:
+        dst = (b"\x01" if addr.version == 4 else b"\x04") + addr.packed
+    return b"\x05\x01\x00" + dst + struct.pack("!H", port)
+
+
+async def _socks5_connect(reader, writer, host: str, port: int):
+    writer.write(b"\x05\x01\x00")
+    await writer.drain()
+    version, method = await reader.readexactly(2)
+    if version != 5 or method != 0:
+        raise ConnectionError("SOCKS5 handshake rejected")
+
+    writer.write(_socks5_request(host, port))
+    await writer.drain()
+    _, reply, _, atyp = await reader.readexactly(4)
+    if reply != 0:
+        raise ConnectionError(SOCKS5_ERRORS.get(reply, f"SOCKS5 error {reply}"))
+    # skip the bound address
+    if atyp == 1:
+        await reader.readexactly(4 + 2)
+    elif atyp == 4:
+        await reader.readexactly(16 + 2)
+    else:
+        await reader.readexactly((await reader.readexactly(1))[0] + 2)
+
+
+async def probe_target(target: TestTarget, http: bool = False, proxy_host: str = "127.0.0.1") -> TestResult:
+    result = TestResult(target.kind, target.connection, target.target, target.port, False)
+    writer = None
+    started = time.perf_counter()
+    try:
+        if target.socks_port:
+            reader, writer = await asyncio.open_connection(proxy_host, target.socks_port)
+            await _socks5_connect(reader, writer, target.host, target.port)
+        else:
+            reader, writer = await asyncio.open_connection(target.host, target.port)
+        result.connect_ms = (time.perf_counter() - started) * 1000
+
+        if http:
+            writer.write(f"HEAD / HTTP/1.1\r\nHost: {target.host}\r\nConnection: close\r\n\r\n".encode())
+            await writer.drain()
+            if not await reader.read(1):
+                raise ConnectionError("connection closed before response")
+            result.first_byte_ms = (time.perf_counter() - started) * 1000
+        result.ok = True
+    except (OSError, ConnectionError, asyncio.IncompleteReadError, UnicodeError) as e:
+        result.error = str(e) or e.__class__.__name__
+    finally:
+        if writer:
+            writer.close()
+    return result
+
+
+async def run_tests(targets: list, concurrency: int = 64, timeout: float = 5.0, http: bool = False) -> list:
+    """Probe all targets concurrently, at most `concurrency` at a time, each bounded by `timeout` seconds."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(target: TestTarget) -> TestResult:
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(probe_target(target, http), timeout)
+            except asyncio.TimeoutError:
+                return TestResult(target.kind, target.connection, target.target, target.port, False,
+                                  error=f"timed out after {timeout:g}s")
+
+    return list(await asyncio.gather(*(bounded(t) for t in targets)))
+
+
+async def probe_sessions(pool, data: dict, timeout: float = 5.0) -> list:
+    """Round trip of a remote `true` per connection over its ssh master (core.ssh_pool.SshPool)."""
+    from core.ssh_config import ssh_config
+    index = ssh_config()
+
+    async def session(master) -> TestResult:
+        entry = index.get(master.host)
+        result = TestResult(ProbeKind.SSH, master.tag, master.host, entry.port if entry else 22, False)
+        # the first call may have to start the master, that is not what this measures
+        await asyncio.to_thread(master.start)
+        started = time.perf_counter()
+        output, returncode = await asyncio.to_thread(master.run, "true", timeout)
+        result.connect_ms = (time.perf_counter() - started) * 1000
+        result.ok = returncode == 0
+        if not result.ok:
+            result.error = output.splitlines()[-1] if output else f"ssh exited with {returncode}"
+        return result
+
+    return list(await asyncio.gather(*(session(m) for m in pool.sync(data).values())))
+
+
+def test_all(data: dict = None, concurrency: int = 64, timeout: float = 5.0, http: bool = False,
+             port: int = None, pool=None) -> list:
+    """
+    Test every pac_hosts entry and forward in the config, results sorted failures first, then by latency.
+    With an ssh pool, every connection's ssh session is checked as well.
+    """
+    if data is None:
+        data = ConfigHelper.load()
+    port = port or (80 if http else 443)
+    targets, skipped = collect_targets(data, port)
+
+    async def run() -> list:
+        sessions = probe_sessions(pool, data, timeout) if pool else asyncio.sleep(0, [])
+        tests, checks = await asyncio.gather(run_tests(targets, concurrency, timeout, http), sessions)
+        return tests + checks
+
+    return sort_results(asyncio.run(run()) + skipped)
+
+
+def sort_results(results: list) -> list:
+    return sorted(results, key=lambda r: (r.ok, -(r.first_byte_ms or r.connect_ms or 0), r.connection, r.target))
+
+
+def results_to_json(results: list) -> str:
+    return json.dumps([asdict(r) for r in results], indent=2)
+
+
+def save_results(results: list, path: str = None) -> str:
+    path = path or os.path.join(ConfigHelper.workspace_path, "test-results.json")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(results_to_json(results))
+    return path
+
+
+def format_table(results: list, limit: int = None) -> str:
+    """One line per result: connect / first-byte latency, or the error."""
+    def ms(value):
+        return f"{value:.0f} ms" if value is not None else "-"
+
+    failed = sum(1 for r in results if not r.ok)
+    lines = [f"{len(results) - failed}/{len(results)} reachable"]
+    for r in results[:limit]:
+        status = "✅" if r.ok else "❌"
+        detail = r.error or f"{ms(r.connect_ms)} / {ms(r.first_byte_ms)}"
+        lines.append(f"{status} [{r.connection}] {r.target}:{r.port}  {detail}")
+    if limit is not None and len(results) > limit:
+        lines.append(f"… {len(results) - limit} more")
+    return "\n".join(lines)
@@ -0,0 +1,255 @@
+"""
+Watch files for changes and report each settled change once.
+
+Backends: inotify on Linux (through libc, no extra package), kqueue on macOS and the BSDs, stat polling everywhere
+else. They watch the file's directory too, since editors, yq and ConfigHelper.commit() replace the file by renaming
+a new one over it. Bursts of writes are debounced; a change is reported only if mtime, size or inode differ from
+the last report.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+
+def file_stamp(path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+@dataclass(frozen=True)
+class FileChanged:
+    path: str
+    stamp: tuple  # (mtime_ns, size, inode), None if the file was removed
+    backend: str
+    detected: float  # time.monotonic() of the first event of the burst
+
+
+class Backend:
+    """wait(timeout) blocks until something that may concern the watched paths happened, False on timeout."""
+    name = ""
+
+    def __init__(self, paths: list):
+        self.paths = paths
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+
+    def wait(self, timeout: float) -> bool:
+        raise NotImplementedError
+
+    def interrupt(self):
+        os.write(self._wake_w, b"x")
+
+    def close(self):
+        for fd in (self._wake_r, self._wake_w):
+            os.close(fd)
+
+    def _drain_wake(self):
+        try:
+            while os.read(self._wake_r, 512):
+                pass
+        except BlockingIOError:
+            pass
+
+
+class InotifyBackend(Backend):
+    name = "inotify"
+    # IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    MASK = 0x002 | 0x004 | 0x008 | 0x040 | 0x080 | 0x100 | 0x200
+    HEADER = struct.Struct("iIII")
+
+    def __init__(self, paths: list):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.names = {os.fsencode(os.path.basename(p)) for p in paths}
+        for directory in {os.path.dirname(os.path.abspath(p)) for p in paths}:
+            if libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK) < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), f"cannot watch {directory}")
+        super().__init__(paths)
+
+    def wait(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while True:
+            readable, _, _ = select.select([self.fd, self._wake_r], [], [], max(deadline - time.monotonic(), 0))
+            if self._wake_r in readable:
+                self._drain_wake()
+                return False
+            if self.fd not in readable:
+                return False
+            if self._read():
+                return True
+
+    def _read(self) -> bool:
+        relevant = False
+        try:
+            while data := os.read(self.fd, 65536):
+                offset = 0
+                while offset < len(data):
+                    _, _, _, length = self.HEADER.unpack_from(data, offset)
+                    offset += self.HEADER.size
+                    name = data[offset:offset + length].rstrip(b"\0")
+                    offset += length
+                    # pidfiles, the lock file and temp files share the directory
+                    relevant = relevant or name in self.names
+        except BlockingIOError:
+            pass
+        return relevant
+
+    def close(self):
+        os.close(self.fd)
+        super().close()
+
+
+class KqueueBackend(Backend):
+    name = "kqueue"
+
+    def __init__(self, paths: list):
+        if not hasattr(select, "kqueue"):
+            raise OSError("kqueue is not available")
+        self.kq = select.kqueue()
+        self.fds = {}
+        super().__init__(paths)
+        self.kq.control([select.kevent(self._wake_r, filter=select.KQ_FILTER_READ, flags=select.KQ_EV_ADD)], 0)
+        self._register()
+
+    def _register(self):
+        # a replaced file is a new inode, so (re)open the files after every event. Closing a descriptor drops its
+        # kevents
+        targets = {os.path.dirname(os.path.abspath(p)) for p in self.paths} | set(self.paths)
+        flags = getattr(os, "O_EVTONLY", 0) or os.O_RDONLY
+        fflags = (select.KQ_NOTE_WRITE | select.KQ_NOTE_EXTEND | select.KQ_NOTE_ATTRIB | select.KQ_NOTE_DELETE
+                  | select.KQ_NOTE_RENAME)
+        events = []
+        for path in targets:
+            old = self.fds.pop(path, None)
+            if old is not None:
+                os.close(old)
+            try:
+                fd = self.fds[path] = os.open(path, flags)
+            except OSError:
+                continue
+            events.append(select.kevent(fd, filter=select.KQ_FILTER_VNODE,
+                                        flags=select.KQ_EV_ADD | select.KQ_EV_CLEAR, fflags=fflags))
+        self.kq.control(events, 0)
+
+    def wait(self, timeout: float) -> bool:
+        events = self.kq.control(None, 16, timeout)
+        if any(e.ident == self._wake_r for e in events):
+            self._drain_wake()
+        changed = any(e.ident != self._wake_r for e in events)
+        if changed:
+            self._register()
+        return changed
+
+    def close(self):
+        for fd in self.fds.values():
+            os.close(fd)
+        self.kq.close()
+        super().close()
+
+
+class PollingBackend(Backend):
+    name = "polling"
+
+    def __init__(self, paths: list, interval: float = 1.0):
+        self.interval = interval
+        self.stamps = {p: file_stamp(p) for p in paths}
+        super().__init__(paths)
+
+    def wait(self, timeout: float) -> bool:
+        readable, _, _ = select.select([self._wake_r], [], [], min(timeout, self.interval))
+        if readable:
+            self._drain_wake()
+        stamps = {p: file_stamp(p) for p in self.paths}
+        changed = stamps != self.stamps
+        self.stamps = stamps
+        return changed
+
+
+BACKENDS = {"inotify": InotifyBackend, "kqueue": KqueueBackend, "polling": PollingBackend}
+
+
+def create_backend(paths: list, name: str = "auto") -> Backend:
+    """The named backend, or for "auto" the platform's native one with polling as the fallback."""
+    if name != "auto":
+        return BACKENDS[name](paths)
+    native = InotifyBackend if sys.platform.startswith("linux") else KqueueBackend
+    try:
+        return native(paths)
+    except (OSError, AttributeError):
+        return PollingBackend(paths)
+
+
+class FileWatcher:
+    """
+    Calls callback(FileChanged) on its own thread once a burst of writes to one of `paths` has been quiet for
+    `debounce` seconds, or after `max_delay` if the writes don't stop.
+    """
+
+    def __init__(self, paths: list, callback, backend: str = "auto", debounce: float = 0.02, max_delay: float = 1.0):
+        self.paths = [os.path.abspath(p) for p in paths]
+        self.callback = callback
+        self.backend_name = backend
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.backend = None
+        self.stamps = {}
+        self.events = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.backend = create_backend(self.paths, self.backend_name)
+        self.stamps = {p: file_stamp(p) for p in self.paths}
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="susops-watch", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self.backend:
+            self.backend.interrupt()
+        if self._thread:
+            self._thread.join(5)
+            self._thread = None
+        if self.backend:
+            self.backend.close()
+            self.backend = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        backend = self.backend
+        while not self._stopped.is_set():
+            if not backend.wait(3600):
+                continue
+            detected = time.monotonic()
+            deadline = detected + self.max_delay
+            while not self._stopped.is_set() and time.monotonic() < deadline and backend.wait(self.debounce):
+                pass
+            if not self._stopped.is_set():
+                self._check(backend.name, detected)
+
+    def _check(self, backend: str, detected: float):
+        for path in self.paths:
+            stamp = file_stamp(path)
+            if stamp != self.stamps.get(path):
+                self.stamps[path] = stamp
+                self.events += 1
+                self.callback(FileChanged(path, stamp, backend, detected))
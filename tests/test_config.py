@@ -0,0 +1,151 @@
+"""ConfigHelper transactions through both writers: `yq -i` with the patch, and the PyYAML rewrite without bin/yq."""
+import json
+import os
+import shutil
+import subprocess
+import threading
+
+import pytest
+import yaml
+
+from core.config import ConfigHelper, ConfigTransaction, resource_path
+
+CONFIG = """\
+# kept by yq
+pac_server_port: 1081
+connections:
+  - tag: work
+    ssh_host: work.example
+    pac_hosts: [a.example, B.example, 10.0.0.0/24]
+  - tag: lab
+    ssh_host: lab.example
+    pac_hosts: [a.example]
+  - tag: work  # a duplicated tag
+    ssh_host: other.example
+    pac_hosts: [c.example]
+"""
+
+
+def mikefarah_yq():
+    """bin/yq or a yq on PATH, if it is mikefarah's yq (the jq wrapper of the same name can't -i)."""
+    for path in (resource_path(os.path.join("bin", "yq")), shutil.which("yq")):
+        if path and os.access(path, os.X_OK):
+            try:
+                version = subprocess.run([path, "--version"], capture_output=True, text=True).stdout
+            except OSError:
+                continue
+            if "mikefarah" in version:
+                return path
+    return None
+
+
+@pytest.fixture(params=["rewrite", "yq"])
+def config(request, tmp_path, monkeypatch):
+    path = tmp_path / "config.yaml"
+    path.write_text(CONFIG)
+    if request.param == "yq":
+        yq = mikefarah_yq()
+        if yq is None:
+            pytest.skip("needs mikefarah/yq")
+        monkeypatch.setattr(ConfigHelper, "yq_path", yq)
+    else:
+        monkeypatch.setattr(ConfigHelper, "yq_path", str(tmp_path / "no-yq"))
+    monkeypatch.setattr(ConfigHelper, "workspace_path", str(tmp_path))
+    monkeypatch.setattr(ConfigHelper, "config_path", str(path))
+    return path
+
+
+def hosts(path) -> list:
+    return [conn.get("pac_hosts") for conn in yaml.safe_load(path.read_text())["connections"]]
+
+
+def test_set(config):
+    with ConfigHelper.transaction() as tx:
+        tx.set(".pac_server_port", 1082)
+        tx.set(".susops_app.logo_style", "GEAR")
+    data = yaml.safe_load(config.read_text())
+    assert data["pac_server_port"] == 1082 and data["susops_app"] == {"logo_style": "GEAR"}
+    assert ConfigHelper.load() == data
+
+
+def test_add_and_remove(config):
+    with ConfigHelper.transaction() as tx:
+        tx.add_pac_hosts("lab", ["A.example", "new.example", "new.example"])
+        tx.remove_pac_hosts(None, ["b.example", "A.EXAMPLE"])
+    assert hosts(config) == [["10.0.0.0/24"], ["new.example"], ["c.example"]]
+    assert tx.added == {"lab": ["new.example"]}
+    assert tx.removed == {"work": ["a.example", "B.example"], "lab": ["a.example"]}
+
+
+def test_add_then_remove_in_one_transaction(config):
+    with ConfigHelper.transaction() as tx:
+        tx.add_pac_hosts("lab", ["x.example"])
+        tx.remove_pac_hosts("lab", ["x.example"])
+    assert hosts(config)[1] == ["a.example"]
+
+
+def test_import(config):
+    with ConfigHelper.transaction() as tx:
+        tx.import_pac_hosts("lab", ["x.a.example", "10.0.1.0/24", "10.0.0.0/24", "new.example", "new.example"])
+    assert hosts(config)[1] == ["a.example", "10.0.0.0/23", "new.example"]
+    assert tx.imports["lab"].duplicates == ["new.example"]
+
+
+def test_duplicate_tags_patch_each_connection(config):
+    with ConfigHelper.transaction() as tx:
+        tx.add_pac_hosts("work", ["c.example", "d.example"])
+        tx.remove_pac_hosts("work", ["a.example"])
+    assert hosts(config) == [["B.example", "10.0.0.0/24", "c.example", "d.example"], ["a.example"],
+                             ["c.example", "d.example"]]
+
+
+def test_patch_touches_only_the_changed_entries(config):
+    with ConfigHelper.transaction() as tx:
+        tx.set(".pac_server_port", 1082)
+        tx.add_pac_hosts("work", ["c.example"])
+        tx.remove_pac_hosts("lab", ["a.example"])
+    assert tx.yq_patch() == (
+        '.pac_server_port = 1082'
+        ' | (.connections[0] | .pac_hosts) |= ((. // []) + ["c.example"])'
+        ' | del(.connections[1] | .pac_hosts[] | select(. == "a.example"))')
+    if ConfigHelper.yq_path == mikefarah_yq():
+        assert config.read_text().startswith("# kept by yq\n")
+
+
+def test_nothing_is_written_if_the_block_raises(config):
+    with pytest.raises(RuntimeError):
+        with ConfigHelper.transaction() as tx:
+            tx.set(".pac_server_port", 1)
+            raise RuntimeError
+    assert config.read_text() == CONFIG
+
+
+def test_concurrent_transactions_are_serialized(config):
+    def add(n):
+        with ConfigHelper.transaction() as tx:
+            tx.add_pac_hosts("lab", [f"h{n}.example"])
+
+    threads = [threading.Thread(target=add, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(hosts(config)[1]) == ["a.example"] + [f"h{n}.example" for n in range(8)]
+    assert not [name for name in os.listdir(config.parent) if name.startswith(".config.")]
+
+
+@pytest.mark.skipif(shutil.which("jq") is None, reason="needs jq")
+@pytest.mark.parametrize("build", [
+    lambda tx: tx.add_pac_hosts("work", ["c.example", "d.example"]).remove_pac_hosts("work", ["a.example"]),
+    lambda tx: tx.add_pac_hosts("lab", ["x"]).remove_pac_hosts("lab", ["x"]).set(".susops_app.a", "1"),
+    lambda tx: tx.import_pac_hosts("lab", ["x.a.example", "10.0.1.0/24", "10.0.0.0/24", "new.example"]),
+    lambda tx: tx.remove_pac_hosts(None, ["A.example", "c.example"]),
+])
+def test_patch_leaves_what_apply_does(build):
+    """The patch's expressions are valid jq too, so jq checks them where there is no yq."""
+    tx = ConfigTransaction()
+    build(tx)
+    tx.result = tx.apply(yaml.safe_load(CONFIG))
+    patched = subprocess.run(["jq", "-c", tx.yq_patch() or "."], input=json.dumps(yaml.safe_load(CONFIG)),
+                             capture_output=True, text=True, check=True).stdout
+    assert json.loads(patched) == tx.result
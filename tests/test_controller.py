@@ -0,0 +1,100 @@
+import os
+import queue
+
+import yaml
+
+from core.bus import TUNNEL_UP, BusEvent
+from core.config import ConfigHelper
+from core.controller import DEFAULT_CONFIG, Event, SusOpsController
+from core.pac_server import PacServer
+
+
+def test_bus_slows_polling_only_once_tunnel_changes_are_published(tmp_path, monkeypatch):
+    monkeypatch.setattr(ConfigHelper, "workspace_path", str(tmp_path))
+    monkeypatch.setattr(ConfigHelper, "config_path", os.path.join(tmp_path, "config.yaml"))
+    controller = SusOpsController(lambda fn, *args: fn(*args), lambda delay, fn, *args: None)
+    controller.set_config(dict(DEFAULT_CONFIG))
+    base = controller.poll_scheduler.base_interval
+    try:
+        assert controller.start_bus()
+        assert controller.poll_scheduler.base_interval == base
+
+        controller.bus_event(BusEvent("forward_added", "a"))
+        assert controller.poll_scheduler.base_interval == base
+
+        controller.bus_event(BusEvent(TUNNEL_UP, "a", {"pid": 1}))
+        assert controller.poll_scheduler.base_interval == DEFAULT_CONFIG["bus_poll_interval"]
+        assert controller.poll_scheduler.interval >= DEFAULT_CONFIG["bus_poll_interval"]
+    finally:
+        controller.shutdown(stop_proxy=False)
+
+
+def test_invalid_numbers_fall_back_to_the_defaults(tmp_path, monkeypatch):
+    path = os.path.join(tmp_path, "config.yaml")
+    monkeypatch.setattr(ConfigHelper, "workspace_path", str(tmp_path))
+    monkeypatch.setattr(ConfigHelper, "config_path", path)
+    with open(path, "w") as f:
+        f.write("susops_app:\n  poll_max_interval: soon\n  relay_offset: '1.5'\n"
+                "  bus_poll_interval: '0'\n  failover_interval: '2.5'\n")
+    controller = SusOpsController(lambda fn, *args: fn(*args), lambda delay, fn, *args: None)
+    events = []
+    controller.subscribe(lambda event, payload: events.append((event, payload)))
+
+    config = controller.reload_config()
+    assert config["poll_max_interval"] == DEFAULT_CONFIG["poll_max_interval"]
+    assert config["relay_offset"] == DEFAULT_CONFIG["relay_offset"]
+    assert config["bus_poll_interval"] == DEFAULT_CONFIG["bus_poll_interval"]
+    assert config["failover_interval"] == 2.5
+    errors = [payload for event, payload in events if event == Event.ERROR]
+    assert len(errors) == 1
+    assert "poll_max_interval='soon'" in errors[0] and "failover_interval" not in errors[0]
+
+    # reported once, not on every reload
+    controller.reload_config()
+    assert len([event for event, _ in events if event == Event.ERROR]) == 1
+
+
+def write_hosts(path: str, hosts: list):
+    with open(path, "w") as f:
+        yaml.safe_dump({"connections": [{"tag": "a", "socks_proxy_port": 1080, "pac_hosts": hosts}]}, f)
+
+
+def test_config_changes_are_parsed_and_compiled_off_the_main_loop(tmp_path, monkeypatch):
+    path = os.path.join(tmp_path, "config.yaml")
+    monkeypatch.setattr(ConfigHelper, "workspace_path", str(tmp_path))
+    monkeypatch.setattr(ConfigHelper, "config_path", path)
+    write_hosts(path, ["example.com"])
+    main = queue.Queue()
+    controller = SusOpsController(lambda fn, *args: main.put((fn, args)), lambda delay, fn, *args: None)
+    controller.pac_server = PacServer(0)
+    events = []
+    controller.subscribe(lambda event, payload: events.append(event))
+    try:
+        assert controller.pac_server.refresh()
+        write_hosts(path, ["example.com", "example.org"])
+        controller.apply_config_change(None)
+        fn, args = main.get(timeout=10)
+        parses = ConfigHelper.cache().parse_count
+        fn(*args)
+        assert ConfigHelper.cache().parse_count == parses
+        assert b"example.org" in controller.pac_server.document.body
+        assert events == [Event.CONFIG, Event.CONFIG_CHANGED]
+    finally:
+        controller.shutdown(stop_proxy=False)
+
+
+def test_a_compile_overtaken_by_a_patch_is_dropped(tmp_path, monkeypatch):
+    path = os.path.join(tmp_path, "config.yaml")
+    monkeypatch.setattr(ConfigHelper, "config_path", path)
+    write_hosts(path, ["example.com"])
+    server = PacServer(0)
+    assert server.refresh()
+
+    write_hosts(path, ["example.com", "example.org"])
+    compiled = server.compile()
+    assert server.update("a", added=["example.net"])
+    assert not server.install(compiled)
+    assert b"example.net" in server.document.body and b"example.org" not in server.document.body
+    # the next refresh compiles the newer config again
+    assert server.refresh()
+    assert b"example.org" in server.document.body
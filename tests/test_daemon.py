@@ -0,0 +1,78 @@
+"""The headless daemon's budgets (benchmarks/bench_daemon.py, over a shorter idle period) and its --once mode."""
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from benchmarks.bench_daemon import ROOT, gui_imports, process_usage
+from benchmarks.fixtures import SIZES, generate_config, write_config
+from core.config import ConfigHelper
+from core.controller import SusOpsController
+from core.prober import ProbeResult
+from core.state import ProcessState
+from core.supervisor import free_port
+
+MAX_RSS_MB = 40
+MAX_IDLE_CPU = 0.5  # percent of one core
+IDLE = 5
+
+
+@pytest.fixture
+def env(tmp_path):
+    connections, pac_hosts, forwards, _ = SIZES["medium"]
+    write_config(str(tmp_path / ".susops" / "config.yaml"), generate_config(connections, pac_hosts, forwards))
+    return {**os.environ, "HOME": str(tmp_path), "SUSOPS_BIN": os.path.join(ROOT, "benchmarks", "bin", "susops"),
+            "SUSOPS_STANDIN_STATE": "stopped", "PYTHONUNBUFFERED": "1"}
+
+
+def test_no_gui_imports(env):
+    assert gui_imports(env) == []
+
+
+def test_idle_budget(env):
+    daemon = subprocess.Popen([sys.executable, "-m", "core.daemon"], cwd=ROOT, env=env, stdout=subprocess.PIPE,
+                              text=True)
+    try:
+        assert any(" started " in line for line in daemon.stdout), "the daemon exited before it started"
+        cpu_start, _ = process_usage(daemon.pid)
+        time.sleep(IDLE)
+        cpu_end, rss = process_usage(daemon.pid)
+    finally:
+        daemon.terminate()
+        daemon.wait(10)
+    assert rss <= MAX_RSS_MB
+    assert (cpu_end - cpu_start) / IDLE * 100 <= MAX_IDLE_CPU
+
+
+def test_once_starts_no_watcher_bus_or_servers(env, monkeypatch):
+    path = os.path.join(env["HOME"], ".susops", "config.yaml")
+    monkeypatch.setattr(ConfigHelper, "workspace_path", os.path.dirname(path))
+    monkeypatch.setattr(ConfigHelper, "config_path", path)
+    # the app already serves the PAC
+    app_pac = socket.create_server(("127.0.0.1", 0))
+    metrics_port = free_port()
+    connections, pac_hosts, forwards, _ = SIZES["small"]
+    data = generate_config(connections, pac_hosts, forwards)
+    data["pac_server_port"] = app_pac.getsockname()[1]
+    data["susops_app"].update(builtin_pac_server="1", supervisor="1", relay="1", metrics_port=str(metrics_port))
+    write_config(path, data)
+
+    controller = SusOpsController(lambda fn, *args: fn(*args), lambda delay, fn, *args: None, watch=False)
+    config = controller.load_config()
+    assert config["watch_config"] and config["event_bus"]
+    assert config["builtin_pac_server"] and config["supervisor"] and config["relay"]
+    try:
+        controller.startup_loaded((config, ProbeResult(ProcessState.STOPPED, "stopped", 3)))
+        assert controller.watcher is None and controller.bus is None
+        assert controller.pac_server is None and controller.relay_server is None
+        assert not controller.supervisor.running
+        assert controller.process_state == ProcessState.STOPPED
+        # the PAC counts as running, nothing of ours is bound
+        assert controller.prober.pac_check()
+        socket.create_server(("127.0.0.1", metrics_port)).close()
+    finally:
+        controller.shutdown(stop_proxy=False)
+        app_pac.close()
@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+from core.host_import import parse_entries, plan_import
+from core.pac import render_pac
+from test_pac_compiler import generate, linear_find_proxy
+
+
+def test_parse_entries():
+    text = """
+    # team inventory
+    a.example.com, b.example.com; c.example.com   # trailing comment
+    https://portal.example.com:8443/login  10.0.0.0/24
+    """
+    assert parse_entries(text) == ["a.example.com", "b.example.com", "c.example.com", "portal.example.com",
+                                   "10.0.0.0/24"]
+
+
+def test_duplicates_keep_the_existing_spelling():
+    plan = plan_import(["Example.com", "10.0.0.1"], ["example.com.", "EXAMPLE.COM", "10.0.0.1", "new.test"])
+    assert plan.hosts == ["Example.com", "10.0.0.1", "new.test"]
+    assert plan.duplicates == ["example.com.", "EXAMPLE.COM", "10.0.0.1"]
+    assert plan.added == ["new.test"] and plan.removed == []
+
+
+def test_domains_and_wildcards_cover_their_subdomains():
+    plan = plan_import(["a.example.com", "*.b.example.com"],
+                       ["example.com", "*.corp.test", "x.corp.test", "*.y.example.com", "*corp*"])
+    assert plan.hosts == ["example.com", "*.corp.test", "*corp*"]
+    assert plan.covered == [("a.example.com", "example.com"), ("*.b.example.com", "example.com"),
+                            ("x.corp.test", "*.corp.test"), ("*.y.example.com", "example.com")]
+    assert plan.removed == ["a.example.com", "*.b.example.com"]
+    # `*.corp.test` doesn't cover corp.test itself, corp.test covers `*.corp.test`
+    assert plan_import(["*.corp.test"], ["corp.test"]).hosts == ["corp.test"]
+    assert plan_import(["corp.test"], ["*.corp.test", "*corp*"]).hosts == ["corp.test", "*corp*"]
+    assert plan_import(["*.corp.test"], ["x.corp.test.", "notcorp.test"]).hosts == ["*.corp.test", "notcorp.test"]
+
+
+def test_networks_are_merged_and_ips_inside_them_kept():
+    plan = plan_import(["10.0.0.0/24"], ["10.0.1.0/24", "10.0.0.128/25", "10.0.0.7", "fd00::/65", "fd00:0:0:0:8000::/65"])
+    assert plan.hosts == ["10.0.0.0/23", "10.0.0.7", "fd00::/64"]
+    assert plan.merged == [(["10.0.0.0/24", "10.0.1.0/24", "10.0.0.128/25"], ["10.0.0.0/23"]),
+                           (["fd00::/65", "fd00:0:0:0:8000::/65"], ["fd00::/64"])]
+    assert plan.removed == ["10.0.0.0/24"]
+    # a network already there takes the ones inside it
+    plan = plan_import(["10.0.0.0/16"], ["10.0.3.0/24"])
+    assert plan.hosts == ["10.0.0.0/16"] and plan.covered == [("10.0.3.0/24", "10.0.0.0/16")]
+
+
+def test_invalid_entries_are_reported_and_existing_ones_kept():
+    plan = plan_import(["we!rd"], ["ok.test", "bad host", "<script>", "300.1.1.1/8"])
+    assert plan.hosts == ["we!rd", "ok.test"]
+    assert plan.invalid == ["bad host", "<script>", "300.1.1.1/8"]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_import_routes_like_appending_the_entries(seed):
+    """The PAC after an import sends every host where the PAC with the raw entries appended would."""
+    data, hosts, resolve = generate(seed)
+    rnd = random.Random(seed)
+    imported = generate(seed + 1000)[0]["connections"][rnd.randrange(6)]["pac_hosts"]
+    conn = rnd.choice(data["connections"])
+    appended = {"connections": [dict(c, pac_hosts=c["pac_hosts"] + imported) if c is conn else c
+                                for c in data["connections"]]}
+    plan = plan_import(conn["pac_hosts"], imported)
+    conn["pac_hosts"] = plan.hosts
+    before, after = render_pac(appended), render_pac(data)
+    for host in hosts:
+        assert linear_find_proxy(after, host, resolve) == linear_find_proxy(before, host, resolve), host
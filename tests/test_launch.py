@@ -0,0 +1,25 @@
+import os
+
+import pytest
+
+from core.launch import LaunchCache, LaunchState
+from core.state import ProcessState
+
+
+def test_save_and_load(tmp_path):
+    cache = LaunchCache(str(tmp_path / "app-launch.json"))
+    cache.save(ProcessState.RUNNING, {"logo_style": "GEAR"})
+    assert LaunchCache(cache.path).load() == LaunchState(ProcessState.RUNNING.value, {"logo_style": "GEAR"})
+
+
+@pytest.mark.parametrize("config, replace_fails", [({"a": 1}, True), ({"a": object()}, False)])
+def test_failed_save_leaves_no_temp_file(tmp_path, monkeypatch, config, replace_fails):
+    if replace_fails:
+        def replace(*_):
+            raise OSError("read-only")
+
+        monkeypatch.setattr(os, "replace", replace)
+    cache = LaunchCache(str(tmp_path / "app-launch.json"))
+    cache.save(ProcessState.RUNNING, config)
+    assert os.listdir(tmp_path) == []
+    assert cache.load() == LaunchState()
@@ -0,0 +1,20 @@
+from core.prober import MAX_MISMATCHES, ProbeResult, StateProber
+from core.state import ProcessState
+
+
+def test_verify_records_a_bounded_number_of_mismatches(monkeypatch):
+    prober = StateProber()
+    native = ProcessState.RUNNING
+    monkeypatch.setattr(prober, "probe", lambda: ProbeResult(native, "native", 0))
+    monkeypatch.setattr(prober, "probe_cli", lambda: ProbeResult(ProcessState.STOPPED, "cli", 3))
+
+    result = prober.verify()
+    assert result.output == "cli"
+    assert result.mismatch[1:] == (ProcessState.RUNNING, ProcessState.STOPPED)
+    for _ in range(MAX_MISMATCHES + 10):
+        prober.verify()
+    assert len(prober.mismatches) == MAX_MISMATCHES
+
+    native = ProcessState.STOPPED
+    assert prober.verify().mismatch is None
+    assert len(prober.mismatches) == MAX_MISMATCHES
@@ -0,0 +1,48 @@
+import socket
+
+from core.relay import LOCAL_FORWARD, SOCKS, RelayServer, relay_specs
+
+
+def config(port: int) -> dict:
+    return {"connections": [{"tag": "a", "socks_proxy_port": port}]}
+
+
+def test_sync_retries_a_relay_whose_port_was_taken():
+    server = RelayServer(metrics_port=0, offset=0).start()
+    taken = socket.socket()
+    try:
+        taken.bind(("127.0.0.1", 0))
+        taken.listen()
+        port = taken.getsockname()[1]
+        data = config(port)
+        results = []
+        assert server.sync(data, callback=results.append).result(10) is True
+        assert results == [True]
+        assert server.socks_ports == {}
+        assert "susops_relay_up{" in server.render_metrics() and "} 0\n" in server.render_metrics()
+
+        taken.close()
+        assert server.sync(data).result(10) is True
+        assert server.socks_ports == {"a": port}
+        # nothing failed, the same data is a no-op
+        assert server.sync(data) is None
+    finally:
+        taken.close()
+        server.stop()
+
+
+def test_collectors_are_rendered_with_the_relay_metrics():
+    server = RelayServer(metrics_port=0)
+    server.collectors.append(lambda: [("susops_polls_total", "counter", "Status polls since start.", 3)])
+    assert ("# HELP susops_polls_total Status polls since start.\n# TYPE susops_polls_total counter\n"
+            "susops_polls_total 3\n") in server.render_metrics()
+
+
+def test_malformed_forwards_are_skipped():
+    data = {"connections": [
+        {"tag": "a", "socks_proxy_port": 1080, "forwards": {"local": ["8080:db:5432", None, {"src_port": 8080}]}},
+        {"tag": "b", "socks_proxy_port": 1090, "forwards": ["8081"]},
+    ]}
+    specs = relay_specs(data, 10000)
+    assert [(spec.tunnel, spec.kind, spec.target_port) for spec in specs] == [
+        ("a", SOCKS, 1080), ("a", LOCAL_FORWARD, 8080), ("b", SOCKS, 1090)]
@@ -0,0 +1,64 @@
+from core.scheduler import PollScheduler
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_backoff_doubles_up_to_the_max_and_resets_on_change():
+    clock = Clock()
+    scheduler = PollScheduler(base_interval=5, max_interval=30, clock=clock)
+    scheduler.record_poll("running")
+    intervals = []
+    for _ in range(5):
+        scheduler.record_poll("running")
+        intervals.append(scheduler.next_interval())
+    assert intervals == [10, 20, 30, 30, 30]
+    scheduler.record_poll("stopped")
+    assert scheduler.next_interval() == 5
+    assert scheduler.stats()["state_changes"] == 2
+
+
+def test_fast_window_after_an_action_and_detection_latency():
+    clock = Clock()
+    scheduler = PollScheduler(base_interval=5, max_interval=60, fast_interval=0.5, fast_window=15, clock=clock)
+    scheduler.record_poll("stopped")
+    scheduler.record_poll("stopped")
+    scheduler.notify_action()
+    assert scheduler.next_interval() == 0.5
+    clock.now += 2.5
+    scheduler.record_poll("stopped")
+    assert scheduler.next_interval() == 0.5
+    clock.now += 0.5
+    assert scheduler.record_poll("running")
+    assert scheduler.stats()["detection_latency_last"] == 3.0
+    # after the window the backoff applies again
+    clock.now += 15
+    scheduler.record_poll("running")
+    assert scheduler.next_interval() == 10
+
+
+def test_an_action_without_a_change_in_its_window_is_not_attributed_later():
+    clock = Clock()
+    scheduler = PollScheduler(fast_window=15, clock=clock)
+    scheduler.record_poll("running")
+    scheduler.notify_action()
+    clock.now += 16
+    scheduler.record_poll("running")
+    clock.now += 60
+    scheduler.record_poll("stopped")
+    assert scheduler.stats()["detection_latency_last"] is None
+
+
+def test_polls_per_hour_is_a_sliding_window():
+    clock = Clock()
+    scheduler = PollScheduler(clock=clock)
+    for _ in range(10):
+        scheduler.record_poll("running")
+        clock.now += 600
+    assert scheduler.polls_per_hour == 6
+    assert scheduler.stats()["polls_total"] == 10
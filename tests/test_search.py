@@ -0,0 +1,98 @@
+"""SearchIndex against a brute-force ranking written from the tiers in core/search.py's docstring."""
+import random
+
+import pytest
+
+from core.model import Forward, PacHost
+from core.search import SearchIndex, search_terms
+
+BREAKS = "-_:/@ ."
+
+
+def brute_force(items: list, query: str, limit: int) -> list:
+    query = query.strip().lower()
+    if not query:
+        return items[:limit]
+    names, others, words = [], [], []
+    for index, item in enumerate(items):
+        for position, term in enumerate(search_terms(item)):
+            if term.startswith(query):
+                (others if position else names).append((term, index))
+            for at in range(1, len(term)):
+                if term[at - 1] in BREAKS and term[at:].startswith(query):
+                    words.append((term[at:], index))
+    found = {}
+    for tier in (names, others, words):
+        for _, index in sorted(tier):
+            found.setdefault(index)
+    for index, item in enumerate(items):
+        if any(query in term for term in search_terms(item)):
+            found.setdefault(index)
+    return [items[index] for index in found][:limit]
+
+
+def generate(seed: int) -> list:
+    rnd = random.Random(seed)
+    parts = ["svc", "corp", "db", "api", "team1", "team17", "eu", "example", "int", "x", "cor"]
+    items = []
+    for _ in range(300):
+        connection = rnd.choice(["work", "corp", "svc-eu", "lab"])
+        if rnd.random() < 0.7:
+            host = rnd.choice(["", "*.", "."]) + ".".join(rnd.choice(parts) for _ in range(rnd.randint(1, 4)))
+            items.append(PacHost(connection, rnd.choice([host, host.upper(), f"10.{rnd.randint(0, 42)}.0.0/16"])))
+        else:
+            items.append(Forward(connection, f"{rnd.choice(parts)}_{rnd.choice(parts)}", rnd.randint(1, 30000),
+                                 rnd.choice([80, 443, 5432]), rnd.choice(["", "127.0.0.1", "0.0.0.0"]), "db.int"))
+    return items
+
+
+def queries(items: list, seed: int) -> list:
+    rnd = random.Random(seed)
+    found = ["", " ", "nothing", "q", "."]
+    for item in rnd.sample(items, 40):
+        term = rnd.choice(search_terms(item))
+        start = rnd.randrange(len(term))
+        found.append(term[start:start + rnd.randint(1, 6)])
+    return found
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_matches_brute_force(seed):
+    items = generate(seed)
+    index = SearchIndex(items)
+    for query in queries(items, seed):
+        for limit in (1, 5, 50, len(items)):
+            assert index.search(query, limit) == brute_force(items, query, limit), (query, limit)
+
+
+def test_tiers():
+    items = [PacHost("work", "mysvc.test"),   # substring
+             PacHost("svc", "b.test"),         # another term starts with it
+             PacHost("work", "a.svc.test"),    # a word inside the name starts with it
+             PacHost("work", "svc2.test"),     # the name starts with it
+             PacHost("work", "svc1.test"),
+             PacHost("work", "other.test")]
+    assert [str(h) for h in SearchIndex(items).search("svc")] == [
+        "svc1.test", "svc2.test", "b.test", "a.svc.test", "mysvc.test"]
+    # below a trigram the substring tier scans instead, in config order
+    assert [str(h) for h in SearchIndex(items).search("Vc")] == [
+        "mysvc.test", "b.test", "a.svc.test", "svc2.test", "svc1.test"]
+
+
+def test_forwards_are_found_by_port_and_address():
+    items = [Forward("work", "web", 8080, 80), Forward("work", "db", 15432, 5432, dst_addr="db.internal")]
+    index = SearchIndex(items)
+    assert index.search("808") == [items[0]]
+    assert index.search("543") == [items[1]]
+    assert index.search("internal") == [items[1]]
+
+
+def test_empty_query_limit_and_separators():
+    items = [PacHost("work", f"h{i}.test") for i in range(10)]
+    index = SearchIndex(items)
+    assert index.search("", 3) == items[:3]
+    assert index.search("  ") == items
+    assert len(index.search("test", 4)) == 4
+    # the query can't span two terms
+    assert index.search("test\x1fwork") == []
+    assert len(SearchIndex([])) == 0 and SearchIndex([]).search("x") == []
@@ -0,0 +1,122 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from core.ssh_config import SshConfigCache, build_index
+
+CONFIG = """
+# defaults come last, the first value obtained wins
+Host bastion
+    HostName bastion.corp.example
+    User jump
+    Port 2222
+
+Host *.corp !bastion.corp
+    ProxyJump bastion
+    User=ops
+
+Host db db.corp
+    HostName "10.1.2.3"
+    Port=5432
+
+Host web
+    HostName %h.corp.example
+
+Match originalhost web
+    ProxyJump none
+    User deploy
+
+Match host *.corp.example !originalhost bastion
+    ProxyJump bastion
+
+Match exec "false"
+    User never
+
+Host *
+    User default
+    Port 22
+"""
+
+
+def write(path, text: str) -> str:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    return str(path)
+
+
+@pytest.fixture
+def config(tmp_path):
+    return write(tmp_path / "ssh" / "config", CONFIG)
+
+
+def resolved(index, alias):
+    host = index.get(alias)
+    return host.hostname, host.port, host.user, host.proxy_jump
+
+
+def test_first_value_wins_and_host_patterns(config):
+    index = build_index(config)
+    assert index.aliases == ["bastion", "db", "db.corp", "web"]
+    assert resolved(index, "bastion") == ("bastion.corp.example", 2222, "jump", None)
+    assert resolved(index, "db") == ("10.1.2.3", 5432, "default", None)
+    # `*.corp` matches db.corp, the quoted and `Key=value` forms parse
+    assert resolved(index, "db.corp") == ("10.1.2.3", 5432, "ops", "bastion")
+    assert index.get("bastion").source == f"{config}:3"
+
+
+def test_match_blocks(config):
+    index = build_index(config)
+    # %h expands, `Match host` sees the HostName; `Match originalhost web` came first and set ProxyJump none
+    assert resolved(index, "web") == ("web.corp.example", 22, "deploy", None)
+
+
+def test_include_is_conditional_inside_a_host_block(tmp_path):
+    base = tmp_path / "ssh"
+    write(base / "conf.d" / "10-a.conf", "Host a\n    HostName a.example\n")
+    write(base / "conf.d" / "20-b.conf", "Host b\n    HostName b.example\n")
+    write(base / "only-c.conf", "Port 2200\n")
+    config = write(base / "config", "Include conf.d/*.conf\nHost c d\n    Include only-c.conf\n    User me\n")
+    index = build_index(config, str(base))
+    assert index.aliases == ["a", "b", "c", "d"]
+    assert resolved(index, "a") == ("a.example", 22, None, None)
+    assert resolved(index, "c") == ("c", 2200, "me", None)
+    assert index.errors == []
+
+
+def test_include_loops_stop_at_the_depth_limit(tmp_path):
+    config = write(tmp_path / "config", f"Include {tmp_path / 'config'}\nHost x\n    Port 1\n")
+    index = build_index(config, str(tmp_path))
+    assert index.get("x").port == 1
+    assert any("nested too deeply" in error for error in index.errors)
+
+
+def test_cache_rebuilds_on_changes_to_included_files(tmp_path):
+    base = tmp_path / "ssh"
+    included = write(base / "conf.d" / "a.conf", "Host a\n    Port 1\n")
+    cache = SshConfigCache(write(base / "config", "Include conf.d/*\n"))
+    assert cache.get().get("a").port == 1
+    assert cache.get() is cache.get() and cache.build_count == 1
+
+    write(base / "conf.d" / "a.conf", "Host a\n    Port 22222\n")
+    os.utime(included, ns=(1, 1))
+    assert cache.get().get("a").port == 22222
+    # a new file in an include directory
+    write(base / "conf.d" / "b.conf", "Host b\n")
+    os.utime(base / "conf.d", ns=(2, 2))
+    assert cache.get().aliases == ["a", "b"]
+    assert cache.build_count == 3
+
+
+@pytest.mark.skipif(shutil.which("ssh") is None, reason="needs the OpenSSH client")
+def test_matches_ssh_G(config):
+    index = build_index(config)
+    for alias in index.aliases:
+        output = subprocess.run(["ssh", "-G", "-F", config, alias], capture_output=True, text=True, check=True).stdout
+        options = dict(line.split(" ", 1) for line in output.splitlines() if " " in line)
+        host = index.get(alias)
+        assert host.hostname.lower() == options["hostname"], alias
+        assert host.port == int(options["port"]), alias
+        assert host.user == options["user"], alias
+        assert host.proxy_jump == options.get("proxyjump"), alias
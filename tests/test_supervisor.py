@@ -0,0 +1,91 @@
+import subprocess
+import threading
+import time
+
+import yaml
+
+import core.pool
+from core.config import ConfigHelper
+from core.supervisor import Tunnel, TunnelSpec, TunnelSupervisor, tunnel_specs
+
+
+def test_kill_waits_outside_the_lock_and_escalates_to_sigkill(tmp_path):
+    supervisor = TunnelSupervisor(pid_dir=str(tmp_path))
+    # ignores SIGTERM, only goes with SIGKILL
+    process = subprocess.Popen(["sh", "-c", "trap '' TERM; while :; do sleep 0.1; done"], start_new_session=True)
+    tunnel = supervisor.tunnels["a"] = Tunnel(TunnelSpec("a", "host", 1080), process, process.pid, up=True)
+    time.sleep(0.2)
+
+    acquired = []
+    waiter = threading.Thread(target=supervisor.down)
+    waiter.start()
+    time.sleep(0.5)
+    # down() is waiting for the child, without holding the lock
+    acquired.append(supervisor._lock.acquire(timeout=0.5))
+    supervisor._lock.release()
+    waiter.join(5)
+    assert acquired == [True]
+    assert not waiter.is_alive()
+    assert process.poll() is not None
+    assert tunnel.pid is None and not tunnel.up
+    # the group is gone already, nothing left to signal
+    supervisor._wait_killed()
+
+
+def test_assigned_ports_are_written_outside_the_lock(tmp_path, monkeypatch):
+    config = tmp_path / "config.yaml"
+    config.write_text(yaml.safe_dump({"connections": [{"tag": "a", "ssh_host": "h", "socks_proxy_port": 0}]}))
+    monkeypatch.setattr(ConfigHelper, "workspace_path", str(tmp_path))
+    monkeypatch.setattr(ConfigHelper, "config_path", str(config))
+    supervisor = TunnelSupervisor(pid_dir=str(tmp_path / "pids"))
+
+    with supervisor._lock:
+        spec = supervisor._assign_port(TunnelSpec("a", "h", 0))
+    assert spec.socks_port
+    assert yaml.safe_load(config.read_text())["connections"][0]["socks_proxy_port"] == 0
+
+    supervisor._save_ports()
+    assert yaml.safe_load(config.read_text())["connections"][0]["socks_proxy_port"] == spec.socks_port
+    assert supervisor._assigned == []
+
+
+def test_malformed_forwards_are_skipped():
+    data = {"connections": [
+        {"tag": "a", "ssh_host": "a.example", "socks_proxy_port": 1080,
+         "forwards": {"local": ["8080:db:5432", {"src": 8080, "dst": 5432}], "remote": [None, 7]}},
+        {"tag": "b", "ssh_host": "b.example", "socks_proxy_port": 1090, "forwards": ["8081"]},
+    ]}
+    specs = tunnel_specs(data)
+    assert [(spec.tag, spec.forwards) for spec in specs] == [
+        ("a", (("-L", "127.0.0.1:8080:localhost:5432"),)), ("b", ())]
+
+
+def test_pool_ports_are_bound_outside_the_lock(tmp_path, monkeypatch):
+    supervisor = TunnelSupervisor(pid_dir=str(tmp_path / "pids"))
+    binding, release, synced = threading.Event(), threading.Event(), []
+
+    class Balancer:
+        def start(self):
+            return self
+
+        def sync(self, pools):
+            binding.set()
+            release.wait(10)
+            synced.append(pools)
+
+        def set_members(self, tag, ports):
+            pass
+
+    monkeypatch.setattr(core.pool, "PoolBalancer", Balancer)
+    data = {"connections": [{"tag": "a", "ssh_host": "h", "socks_proxy_port": 1080, "pool": 2}]}
+    thread = threading.Thread(target=supervisor.sync, args=(data,))
+    thread.start()
+    try:
+        assert binding.wait(10)
+        # the supervise loop and up()/down() are not held up meanwhile
+        assert supervisor._lock.acquire(timeout=1)
+        supervisor._lock.release()
+    finally:
+        release.set()
+        thread.join(10)
+    assert synced == [{"a": 1080}]